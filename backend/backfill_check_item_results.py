@@ -0,0 +1,25 @@
+"""
+安全检查项结果补写脚本
+为升级前已提交的检查历史补写规范化的检查项结果（safety_check_item_results），供合规统计使用
+用法：python backfill_check_item_results.py
+"""
+from database import SessionLocal, engine, Base
+from check_item_results import backfill_item_results
+
+
+def backfill_check_item_results():
+    """补写检查项结果"""
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        processed = backfill_item_results(db)
+        print(f"✓ 已为 {processed} 条检查历史补写检查项结果")
+    except Exception as e:
+        print(f"补写失败: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill_check_item_results()
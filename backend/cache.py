@@ -0,0 +1,276 @@
+"""
+进程内引用数据缓存
+缓存资产大类、仓库用户、安全检查类型等很少变化的小型引用数据（已解析好的结果）
+以及由检查类型编译出的检查结果校验器，
+写入方在提交后调用 invalidate 使缓存失效，并基于版本号生成ETag供前端协商缓存；
+另外按表维护数据版本号，会话提交时自动递增，供统计结果等派生数据缓存使用
+缓存和版本号都保存在进程内存中，只能感知本进程的写入，因此后端只支持单进程部署（uvicorn 不能使用多个 workers）：
+多进程时其他进程的写入不会使本进程的缓存失效，ETag 也不会变化，客户端会持续收到304或过期的结果
+"""
+import hashlib
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload
+from database import SessionLocal
+from models import AssetCategory, SafetyCheckType, User
+from schemas import AssetCategoryResponse, SafetyCheckTypeResponse
+
+# "仓库"用户的EHR号
+WAREHOUSE_EHR_NUMBER = "1000000"
+
+# 进程标识，保证进程重启后不会与旧ETag碰撞
+PROCESS_EPOCH = uuid.uuid4().hex[:8]
+
+
+@dataclass(frozen=True)
+class WarehouseUser:
+    """仓库用户快照（跨会话使用，不绑定ORM会话）"""
+    id: int
+    real_name: str
+    group: str
+
+
+# 检查结果和检查项结果允许的取值
+CHECK_RESULT_VALUES: FrozenSet[str] = frozenset({"yes", "no"})
+
+
+@dataclass(frozen=True)
+class CheckTypeValidator:
+    """由检查类型编译出的检查结果校验器（跨会话使用，不绑定ORM会话）"""
+    check_type_id: int
+    updated_at: Optional[datetime]
+    required_items: FrozenSet[str]
+    # 检查项按检查类型中定义的顺序排列
+    item_order: Tuple[str, ...]
+    allowed_results: FrozenSet[str] = CHECK_RESULT_VALUES
+    _positions: Dict[str, int] = field(default=None, init=False, repr=False, compare=False, hash=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_positions", {item: index for index, item in enumerate(self.item_order)})
+
+    def first_missing_item(self, submitted_items: Set[str]) -> Optional[str]:
+        """按定义顺序返回第一个未提交的必填检查项，全部已提交时返回None"""
+        if self.required_items <= submitted_items:
+            return None
+        for item in self.item_order:
+            if item in self.required_items and item not in submitted_items:
+                return item
+        return None
+
+    def sort_items(self, items_result: Iterable[dict]) -> List[dict]:
+        """按检查类型中定义的顺序排列检查项结果，未定义的检查项排在最后"""
+        last = len(self.item_order)
+        return sorted(items_result, key=lambda result: self._positions.get(result["item"], last))
+
+
+def compile_check_type_validator(check_type: SafetyCheckTypeResponse) -> CheckTypeValidator:
+    """编译检查类型的校验器"""
+    items = check_type.check_items or []
+    return CheckTypeValidator(
+        check_type_id=check_type.id,
+        updated_at=check_type.updated_at,
+        required_items=frozenset(item.item for item in items if item.required),
+        item_order=tuple(dict.fromkeys(item.item for item in items))
+    )
+
+
+def build_check_type_response(check_type: SafetyCheckType) -> SafetyCheckTypeResponse:
+    """构造检查类型响应，解析check_items JSON"""
+    return SafetyCheckTypeResponse(
+        id=check_type.id,
+        name=check_type.name,
+        description=check_type.description,
+        check_items=check_type.get_check_items(),
+        is_active=check_type.is_active,
+        created_at=check_type.created_at,
+        updated_at=check_type.updated_at,
+        created_by_id=check_type.created_by_id,
+        created_by=check_type.created_by
+    )
+
+
+class ReferenceCache:
+    """带版本号的引用数据缓存，线程安全"""
+
+    CATEGORIES = "categories"
+    WAREHOUSE_USER = "warehouse_user"
+    CHECK_TYPES = "check_types"
+    CHECK_TYPE_VALIDATORS = "check_type_validators"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, object] = {}
+        self._versions: Dict[str, int] = {}
+
+    def version(self, key: str) -> int:
+        """获取缓存项的当前版本号"""
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def etag(self, key: str) -> str:
+        """基于版本号生成弱ETag"""
+        return f'W/"{key}-{PROCESS_EPOCH}-{self.version(key)}"'
+
+    def invalidate(self, *keys: str):
+        """使缓存项失效（写入方应在提交事务后调用）"""
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+                self._values.pop(key, None)
+
+    def _get(self, key: str, loader: Callable[[], object]):
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+            version = self._versions.get(key, 0)
+        # 在锁外加载，加载期间如果发生失效则不写回，避免缓存旧数据
+        value = loader()
+        with self._lock:
+            if self._versions.get(key, 0) == version:
+                self._values[key] = value
+        return value
+
+    def get_categories(self, db: Session) -> List[AssetCategoryResponse]:
+        """获取所有资产大类"""
+        return self._get(
+            self.CATEGORIES,
+            lambda: [AssetCategoryResponse.model_validate(cat) for cat in db.query(AssetCategory).all()]
+        )
+
+    def get_warehouse_user(self, db: Session) -> Optional[WarehouseUser]:
+        """获取"仓库"用户，不存在时返回None（不缓存空结果）"""
+        def load():
+            user = db.query(User).filter(User.ehr_number == WAREHOUSE_EHR_NUMBER).first()
+            return WarehouseUser(id=user.id, real_name=user.real_name, group=user.group) if user else None
+
+        warehouse_user = self._get(self.WAREHOUSE_USER, load)
+        if warehouse_user is None:
+            self.invalidate(self.WAREHOUSE_USER)
+        return warehouse_user
+
+    def _get_check_types_by_id(self, db: Session) -> Dict[int, SafetyCheckTypeResponse]:
+        def load():
+            check_types = db.query(SafetyCheckType).options(
+                joinedload(SafetyCheckType.created_by)
+            ).order_by(SafetyCheckType.created_at.desc()).all()
+            return {ct.id: build_check_type_response(ct) for ct in check_types}
+
+        return self._get(self.CHECK_TYPES, load)
+
+    def get_check_types(self, db: Session) -> List[SafetyCheckTypeResponse]:
+        """获取所有检查类型（按创建时间倒序，check_items已解析）"""
+        return list(self._get_check_types_by_id(db).values())
+
+    def get_check_type(self, db: Session, check_type_id: int) -> Optional[SafetyCheckTypeResponse]:
+        """按ID获取检查类型"""
+        return self._get_check_types_by_id(db).get(check_type_id)
+
+    def get_check_type_validator(self, db: Session, check_type_id: int) -> Optional[CheckTypeValidator]:
+        """获取检查类型的校验器，按 (ID, 更新时间) 缓存，检查类型不存在时返回None"""
+        check_type = self.get_check_type(db, check_type_id)
+        if not check_type:
+            return None
+        validators: Dict[Tuple[int, Optional[datetime]], CheckTypeValidator] = self._get(self.CHECK_TYPE_VALIDATORS, dict)
+        key = (check_type.id, check_type.updated_at)
+        with self._lock:
+            validator = validators.get(key)
+        if validator is None:
+            validator = compile_check_type_validator(check_type)
+            with self._lock:
+                validator = validators.setdefault(key, validator)
+        return validator
+
+
+reference_cache = ReferenceCache()
+
+
+class TableVersions:
+    """按表名维护的数据版本号，包含该表写入的事务提交后递增，线程安全（仅记录本进程的写入）"""
+
+    # 会话info中记录本事务写入过的表
+    WRITTEN_TABLES = "written_tables"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+
+    def version(self, *tables: str) -> int:
+        """获取一张或多张表的版本号之和（任一表变化都会使结果变化）"""
+        with self._lock:
+            return sum(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, tables: Set[str]):
+        """递增各表的版本号"""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+
+table_versions = TableVersions()
+
+
+def _written_tables(session: Session) -> Set[str]:
+    return session.info.setdefault(TableVersions.WRITTEN_TABLES, set())
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _record_flushed_tables(session: Session, flush_context):
+    written = _written_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table and (obj not in session.dirty or session.is_modified(obj)):
+            written.add(table)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _record_bulk_tables(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        _written_tables(orm_execute_state.session).add(mapper.local_table.name)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _bump_table_versions(session: Session):
+    written = session.info.pop(TableVersions.WRITTEN_TABLES, None)
+    if written:
+        table_versions.bump(written)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_written_tables(session: Session, previous_transaction):
+    session.info.pop(TableVersions.WRITTEN_TABLES, None)
+
+
+def not_modified_response(request: Request, etag: str) -> Optional[Response]:
+    """如果请求的If-None-Match与ETag匹配，返回304响应"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    if "*" in candidates or etag in candidates:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def set_etag_headers(response: Response, etag: str):
+    """设置ETag响应头，要求客户端每次使用前重新验证"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+
+def table_etag(name: str, tables: Tuple[str, ...], request: Request, current_user: User) -> str:
+    """
+    基于相关表的数据版本号、查询参数和当前用户生成弱ETag
+    表版本号在写入事务提交后递增，因此无需查询数据库即可判断结果是否变化；
+    版本号是进程内的，其他进程或直接修改数据库的写入不会体现在ETag中（见模块说明）
+    """
+    params = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{params}|{current_user.id}|{current_user.role}".encode("utf-8")).hexdigest()[:16]
+    return f'W/"{name}-{PROCESS_EPOCH}-{table_versions.version(*tables)}-{digest}"'
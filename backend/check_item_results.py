@@ -0,0 +1,85 @@
+"""
+安全检查项结果规范化存储
+提交检查结果时把每个检查项的结果写入 safety_check_item_results 表（批量插入），
+合规统计直接对该表做带索引的 GROUP BY，无需逐行解析检查历史中的JSON
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional
+import json
+from sqlalchemy import select, insert, exists
+from sqlalchemy.orm import Session
+from models import SafetyCheckHistory, SafetyCheckItemResult, User
+
+# 补写历史数据时每批处理的检查历史记录数
+BACKFILL_BATCH_SIZE = 500
+
+
+def build_item_result_rows(
+    history_id: int,
+    task_id: int,
+    asset_id: int,
+    check_type_id: int,
+    checked_by_id: int,
+    user_group: Optional[str],
+    checked_at: datetime,
+    items_result: Iterable[dict]
+) -> List[dict]:
+    """把一条检查历史的检查项结果转换为待插入的行"""
+    return [
+        {
+            "history_id": history_id,
+            "task_id": task_id,
+            "asset_id": asset_id,
+            "check_type_id": check_type_id,
+            "checked_by_id": checked_by_id,
+            "user_group": user_group,
+            "item": item["item"],
+            "result": item["result"],
+            "check_date": checked_at.date(),
+            "checked_at": checked_at,
+        }
+        for item in items_result
+        if item.get("item") and item.get("result")
+    ]
+
+
+def write_item_results(db: Session, rows: List[dict]) -> int:
+    """批量插入检查项结果（在调用方的事务内执行），返回插入行数"""
+    if rows:
+        db.execute(insert(SafetyCheckItemResult), rows)
+    return len(rows)
+
+
+def backfill_item_results(db: Session) -> int:
+    """为尚未规范化的检查历史补写检查项结果（按批次提交），返回处理的检查历史记录数"""
+    missing = ~exists().where(SafetyCheckItemResult.history_id == SafetyCheckHistory.id)
+    processed = 0
+    last_id = 0
+    while True:
+        histories = db.execute(
+            select(SafetyCheckHistory, User.group)
+            .outerjoin(User, SafetyCheckHistory.checked_by_id == User.id)
+            .where(SafetyCheckHistory.id > last_id, SafetyCheckHistory.check_items_result.is_not(None), missing)
+            .order_by(SafetyCheckHistory.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not histories:
+            return processed
+
+        rows = []
+        for history, user_group in histories:
+            try:
+                items_result = json.loads(history.check_items_result)
+            except ValueError:
+                continue
+            if not isinstance(items_result, list):
+                continue
+            rows.extend(build_item_result_rows(
+                history.id, history.task_id, history.asset_id, history.check_type_id,
+                history.checked_by_id, user_group, history.checked_at,
+                [item for item in items_result if isinstance(item, dict)]
+            ))
+        write_item_results(db, rows)
+        db.commit()
+        processed += len(histories)
+        last_id = histories[-1][0].id
@@ -0,0 +1,189 @@
+"""
+首页统计计数器
+dashboard_counters 表保存各项统计值，用户、资产、交接/退回/编辑申请变化时
+由会话事件在同一事务内增量更新，首页统计只需读取一次计数器表；
+集合式UPDATE/DELETE等无法逐行跟踪的写入（以及取不到旧值的已过期对象）会在提交前触发全量重算，
+另有定时任务定期校准，修正可能出现的偏差
+"""
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy import event, inspect, select, func, update, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import User, Asset, TransferRequest, ReturnRequest, AssetEditRequest, DashboardCounter
+from logger import logger
+
+TOTAL_USERS = "total_users"
+TOTAL_ASSETS = "total_assets"
+IN_USE_ASSETS = "in_use_assets"
+PENDING_TRANSFERS = "pending_transfers"
+PENDING_RETURNS = "pending_returns"
+PENDING_EDITS = "pending_edits"
+
+# 计数器定义：名称 -> (模型, 参与判断的字段, 行级判断函数, 全量统计的过滤条件)
+COUNTER_DEFINITIONS: Dict[str, Tuple[type, Tuple[str, ...], Callable[[dict], bool], list]] = {
+    TOTAL_USERS: (User, (), lambda v: True, []),
+    TOTAL_ASSETS: (Asset, ("deleted_at",), lambda v: v["deleted_at"] is None, [Asset.deleted_at.is_(None)]),
+    IN_USE_ASSETS: (
+        Asset, ("deleted_at", "status"),
+        lambda v: v["deleted_at"] is None and v["status"] == "在用",
+        [Asset.deleted_at.is_(None), Asset.status == "在用"]
+    ),
+    PENDING_TRANSFERS: (TransferRequest, ("status",), lambda v: v["status"] == "pending", [TransferRequest.status == "pending"]),
+    PENDING_RETURNS: (ReturnRequest, ("status",), lambda v: v["status"] == "pending", [ReturnRequest.status == "pending"]),
+    PENDING_EDITS: (AssetEditRequest, ("status",), lambda v: v["status"] == "pending", [AssetEditRequest.status == "pending"]),
+}
+
+TRACKED_MODELS = {definition[0] for definition in COUNTER_DEFINITIONS.values()}
+
+# 会话info中的标记：本事务内有无法逐行跟踪的写入，提交前需要全量重算
+RECOUNT_FLAG = "dashboard_counters_recount"
+
+counter_table = DashboardCounter.__table__
+
+
+def _attribute_values(state, fields: Tuple[str, ...], old: bool) -> Optional[dict]:
+    """
+    从对象的属性历史中取字段的旧值或新值（不会触发数据库加载）
+    属性已过期或从未加载时历史中没有旧值，此时取旧值返回None
+    """
+    values = {}
+    for name in fields:
+        history = state.attrs[name].history
+        if old:
+            source = history.deleted or history.unchanged
+            if not source:
+                return None
+        else:
+            source = history.added or history.unchanged
+        values[name] = source[0] if source else None
+    return values
+
+
+def _collect_deltas(session: Session) -> Optional[Dict[str, int]]:
+    """根据本次flush的新增、修改、删除对象计算各计数器的增量，有对象取不到旧值时返回None"""
+    deltas: Dict[str, int] = {}
+    for name, (model, fields, predicate, _) in COUNTER_DEFINITIONS.items():
+        delta = 0
+        for obj in session.new:
+            if isinstance(obj, model):
+                delta += predicate(_attribute_values(inspect(obj), fields, old=False))
+        for obj in session.deleted:
+            if isinstance(obj, model):
+                old_values = _attribute_values(inspect(obj), fields, old=True)
+                if old_values is None:
+                    return None
+                delta -= predicate(old_values)
+        for obj in session.dirty:
+            if isinstance(obj, model) and fields:
+                state = inspect(obj)
+                if not any(state.attrs[f].history.has_changes() for f in fields):
+                    continue
+                old_values = _attribute_values(state, fields, old=True)
+                if old_values is None:
+                    return None
+                delta += predicate(_attribute_values(state, fields, old=False))
+                delta -= predicate(old_values)
+        if delta:
+            deltas[name] = delta
+    return deltas
+
+
+def count_all(connection: Connection) -> Dict[str, int]:
+    """全量统计所有计数器（一条查询，各计数器为标量子查询）"""
+    columns = []
+    for name, (model, _, _, criteria) in COUNTER_DEFINITIONS.items():
+        columns.append(select(func.count(model.id)).where(*criteria).scalar_subquery().label(name))
+    row = connection.execute(select(*columns)).mappings().one()
+    return {name: row[name] or 0 for name in COUNTER_DEFINITIONS}
+
+
+def write_counters(connection: Connection, values: Dict[str, int]):
+    """覆盖写入计数器值，缺失的计数器行会被创建"""
+    existing = set(connection.execute(select(counter_table.c.name)).scalars())
+    for name, value in values.items():
+        if name in existing:
+            connection.execute(
+                update(counter_table).where(counter_table.c.name == name).values(value=value, updated_at=func.now())
+            )
+        else:
+            connection.execute(insert(counter_table).values(name=name, value=value))
+
+
+def reconcile_counters(db: Session) -> Dict[str, int]:
+    """
+    按全量统计校准计数器（在调用方的事务内执行，由调用方提交）
+    返回存在偏差的计数器及偏差值
+    """
+    connection = db.connection()
+    actual = count_all(connection)
+    stored = dict(connection.execute(select(counter_table.c.name, counter_table.c.value)).all())
+    drift = {name: value - stored[name] for name, value in actual.items() if name in stored and stored[name] != value}
+    write_counters(connection, actual)
+    return drift
+
+
+def read_counters(db: Session) -> Dict[str, int]:
+    """读取计数器；计数器表尚未初始化时先全量统计一次"""
+    values = {row.name: row.value for row in db.query(DashboardCounter).all()}
+    if any(name not in values for name in COUNTER_DEFINITIONS):
+        reconcile_counters(db)
+        db.commit()
+        values = {row.name: row.value for row in db.query(DashboardCounter).all()}
+    return values
+
+
+def run_reconciliation() -> dict:
+    """定时校准任务"""
+    db = SessionLocal()
+    try:
+        drift = reconcile_counters(db)
+        db.commit()
+        if drift:
+            logger.warning(f"首页统计计数器存在偏差，已校准: {drift}")
+        return {"drift": drift}
+    finally:
+        db.close()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _apply_counter_deltas(session: Session, flush_context):
+    if session.info.get(RECOUNT_FLAG):
+        return
+    deltas = _collect_deltas(session)
+    if deltas is None:
+        # 无法确定旧值，提交前全量重算
+        session.info[RECOUNT_FLAG] = True
+        return
+    if not deltas:
+        return
+    connection = session.connection()
+    for name, delta in deltas.items():
+        connection.execute(
+            update(counter_table)
+            .where(counter_table.c.name == name)
+            .values(value=counter_table.c.value + delta, updated_at=func.now())
+        )
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _flag_bulk_writes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in TRACKED_MODELS:
+        orm_execute_state.session.info[RECOUNT_FLAG] = True
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _recount_after_bulk_writes(session: Session):
+    # 先把尚未flush的对象写入（flush时也可能发现需要重算），再在同一事务内全量重算
+    session.flush()
+    if not session.info.pop(RECOUNT_FLAG, None):
+        return
+    write_counters(session.connection(), count_all(session.connection()))
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _clear_recount_flag(session: Session, previous_transaction):
+    session.info.pop(RECOUNT_FLAG, None)
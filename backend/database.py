@@ -2,7 +2,8 @@
 数据库配置和会话管理
 """
 from pathlib import Path
-from sqlalchemy import create_engine
+from typing import List, Tuple
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -31,3 +32,40 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def add_missing_columns() -> List[Tuple[str, str]]:
+    """
+    为已存在的表补充模型中新增的字段（create_all 不会修改已存在的表）
+    可空字段直接添加；非空字段需有 server_default，按默认值添加（没有默认值的非空字段跳过）
+    返回新增的 (表名, 字段名) 列表，调用方据此初始化需要按数据计算的字段
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    ddl_compiler = engine.dialect.ddl_compiler(engine.dialect, None)
+    added = []
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                if column.nullable:
+                    definition = column_type
+                elif column.server_default is not None:
+                    definition = f"{column_type} NOT NULL DEFAULT {ddl_compiler.get_column_default_string(column)}"
+                else:
+                    continue
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {definition}'))
+                added.append((table.name, column.name))
+    return added
+
+
+def create_missing_indexes():
+    """为已存在的表补建模型中新增的索引（create_all 只会为新建的表创建索引）"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
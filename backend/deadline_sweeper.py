@@ -0,0 +1,69 @@
+"""
+安全检查任务逾期扫描
+定时任务按截止时间（deadline, status 索引）找出已过截止时间仍未完成的任务，
+用集合式UPDATE把任务及其待检查的任务资产标记为逾期，并同步调整任务进度计数器；
+管理员把逾期任务的截止时间延后时，任务及其逾期的任务资产恢复为待检查
+"""
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import SafetyCheckTask, TaskAsset
+from task_counters import shift_task_counters
+
+
+def mark_overdue_tasks(db: Session, now: datetime) -> dict:
+    """
+    把截止时间早于 now 的待检查任务标记为逾期（在调用方的事务内执行，由调用方提交）
+    返回更新的任务数和任务资产数
+    """
+    overdue_task_ids = select(SafetyCheckTask.id).where(
+        SafetyCheckTask.deadline.is_not(None),
+        SafetyCheckTask.deadline < now,
+        SafetyCheckTask.status == "pending"
+    )
+    task_ids = list(db.execute(overdue_task_ids).scalars())
+    if not task_ids:
+        return {"tasks": 0, "task_assets": 0}
+
+    # 先调整任务进度计数器，再更新任务资产状态
+    task_filter = TaskAsset.task_id.in_(task_ids)
+    shift_task_counters(db, "pending", "overdue", task_filter)
+    task_assets = db.execute(
+        update(TaskAsset)
+        .where(task_filter, TaskAsset.status == "pending")
+        .values(status="overdue")
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+    tasks = db.execute(
+        update(SafetyCheckTask)
+        .where(SafetyCheckTask.id.in_(task_ids), SafetyCheckTask.status == "pending")
+        .values(status="overdue")
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+    return {"tasks": tasks, "task_assets": task_assets}
+
+
+def reopen_overdue_task(db: Session, task: SafetyCheckTask) -> int:
+    """截止时间延后后，把逾期任务及其逾期的任务资产恢复为待检查，返回恢复的任务资产数"""
+    task_filter = TaskAsset.task_id == task.id
+    shift_task_counters(db, "overdue", "pending", task_filter)
+    reopened = db.execute(
+        update(TaskAsset)
+        .where(task_filter, TaskAsset.status == "overdue")
+        .values(status="pending")
+        .execution_options(synchronize_session="fetch")
+    ).rowcount or 0
+    task.status = "pending"
+    return reopened
+
+
+def run_deadline_sweep() -> dict:
+    """定时任务：标记逾期任务，返回本次更新的行数（耗时由调度器记录）"""
+    db = SessionLocal()
+    try:
+        result = mark_overdue_tasks(db, datetime.now())
+        db.commit()
+        return result
+    finally:
+        db.close()
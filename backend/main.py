@@ -1,19 +1,43 @@
 """
 FastAPI主应用入口
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import auth, users, assets, transfers, returns, approvals, categories, stats, asset_history, edit_requests, safety_check_types, safety_check_tasks, safety_check_results
+from database import engine, Base, add_missing_columns, create_missing_indexes
+from routers import auth, users, assets, transfers, returns, approvals, categories, stats, asset_history, edit_requests, safety_check_types, safety_check_tasks, safety_check_results, safety_check_schedules
+from scheduler import scheduler, get_interval_setting
+import counters
+import snapshots
+import deadline_sweeper
+import task_schedules
+from task_counters import rebuild_added_task_counters
+from serialization import ORJSONResponse
 import uvicorn
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
+# 旧数据库补充新增字段；新增任务进度计数器字段时按任务资产重建一次计数器
+rebuild_added_task_counters(add_missing_columns())
+create_missing_indexes()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时启动定时任务，关闭时停止定时任务（定时任务在下方注册）"""
+    scheduler.start()
+    yield
+    scheduler.stop()
+
 
 # 创建FastAPI应用
 app = FastAPI(
     title="固定资产管理系统",
     description="用于固定资产管理的系统，支持资产增删改查、交接、审批等功能",
-    version="1.0.0"
+    version="1.0.0",
+    # 未声明 response_model 的接口用 orjson 渲染；声明了的接口仍由 Pydantic 直接序列化为JSON
+    default_response_class=Default(ORJSONResponse),
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -39,6 +63,38 @@ app.include_router(edit_requests.router, prefix="/api/edit-requests", tags=["资
 app.include_router(safety_check_types.router, prefix="/api/safety-check-types", tags=["安全检查类型"])
 app.include_router(safety_check_tasks.router, prefix="/api/safety-check-tasks", tags=["安全检查任务"])
 app.include_router(safety_check_results.router, prefix="/api/safety-check-results", tags=["安全检查结果"])
+app.include_router(safety_check_schedules.router, prefix="/api/safety-check-schedules", tags=["周期性安全检查计划"])
+
+
+# 注册定时任务
+# 首页统计计数器校准，默认每小时一次，启动时先校准一次
+scheduler.register(
+    "reconcile_dashboard_counters",
+    counters.run_reconciliation,
+    get_interval_setting("DASHBOARD_RECONCILE_INTERVAL", 3600),
+    run_on_start=True
+)
+# 每日资产盘点快照，默认每小时更新一次当天快照并补算遗漏日期
+scheduler.register(
+    "inventory_snapshot",
+    snapshots.run_snapshot_job,
+    get_interval_setting("INVENTORY_SNAPSHOT_INTERVAL", 3600),
+    run_on_start=True
+)
+# 安全检查任务逾期扫描，默认每5分钟一次
+scheduler.register(
+    "deadline_sweeper",
+    deadline_sweeper.run_deadline_sweep,
+    get_interval_setting("DEADLINE_SWEEP_INTERVAL", 300),
+    run_on_start=True
+)
+# 周期性安全检查任务生成，默认每10分钟检查一次到期的计划
+scheduler.register(
+    "safety_check_schedules",
+    task_schedules.run_schedule_job,
+    get_interval_setting("SAFETY_CHECK_SCHEDULE_INTERVAL", 600),
+    run_on_start=True
+)
 
 
 @app.get("/")
@@ -2,7 +2,7 @@
 数据库模型定义
 包含用户、资产、审批流程等模型
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Text, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -73,7 +73,7 @@ class Asset(Base):
     category_id = Column(Integer, ForeignKey("asset_categories.id"), nullable=False, comment="所属大类ID")
     name = Column(String(200), nullable=False, comment="实物名称")
     specification = Column(String(200), nullable=True, comment="规格型号（可为空）")
-    status = Column(String(20), default=AssetStatus.IN_USE.value, nullable=False, comment="状态：在用或库存备用")
+    status = Column(String(20), default=AssetStatus.IN_USE.value, nullable=False, index=True, comment="状态：在用或库存备用")
     mac_address = Column(String(50), nullable=True, comment="MAC地址")
     ip_address = Column(String(50), nullable=True, comment="IP地址")
     
@@ -87,7 +87,7 @@ class Asset(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    deleted_at = Column(DateTime(timezone=True), nullable=True, comment="删除时间（软删除）")
+    deleted_at = Column(DateTime(timezone=True), nullable=True, index=True, comment="删除时间（软删除）")
     deleted_by_id = Column(Integer, ForeignKey("users.id"), nullable=True, comment="删除人ID")
     
     # 关系
@@ -106,7 +106,7 @@ class TransferRequest(Base):
     to_user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="转入用户ID")
     created_by_id = Column(Integer, ForeignKey("users.id"), nullable=True, comment="申请创建人ID（可能是管理员代为申请）")
     reason = Column(Text, nullable=True, comment="交接原因")
-    status = Column(String(20), default=ApprovalStatus.WAITING_CONFIRMATION.value, nullable=False, comment="审批状态")
+    status = Column(String(20), default=ApprovalStatus.WAITING_CONFIRMATION.value, nullable=False, index=True, comment="审批状态")
     approver_id = Column(Integer, ForeignKey("users.id"), nullable=True, comment="审批人ID")
     approval_comment = Column(Text, nullable=True, comment="审批意见")
     to_user_confirmed = Column(Integer, nullable=True, comment="转入人确认状态：1-已确认，0-已拒绝，NULL-待确认")
@@ -115,6 +115,7 @@ class TransferRequest(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     approved_at = Column(DateTime(timezone=True), nullable=True, comment="审批时间")
+    batch_id = Column(String(32), nullable=True, index=True, comment="批量交接批次号（批量交接时同一批申请相同）")
     
     # 关系
     asset = relationship("Asset")
@@ -132,7 +133,7 @@ class ReturnRequest(Base):
     asset_id = Column(Integer, ForeignKey("assets.id"), nullable=False, comment="资产ID")
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="退回用户ID")
     reason = Column(Text, nullable=True, comment="退回原因")
-    status = Column(String(20), default=ApprovalStatus.PENDING.value, nullable=False, comment="审批状态")
+    status = Column(String(20), default=ApprovalStatus.PENDING.value, nullable=False, index=True, comment="审批状态")
     approver_id = Column(Integer, ForeignKey("users.id"), nullable=True, comment="审批人ID")
     approval_comment = Column(Text, nullable=True, comment="审批意见")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -147,6 +148,7 @@ class ReturnRequest(Base):
     seat_number = Column(String(50), nullable=True, comment="申请人修改的座位号")
     new_user_id = Column(Integer, ForeignKey("users.id"), nullable=True, comment="申请人修改的保管人ID")
     remark = Column(Text, nullable=True, comment="申请人修改的备注说明")
+    batch_id = Column(String(32), nullable=True, index=True, comment="批量退回批次号（批量退回时同一批申请相同）")
     
     # 关系
     asset = relationship("Asset")
@@ -184,7 +186,7 @@ class AssetEditRequest(Base):
     id = Column(Integer, primary_key=True, index=True)
     asset_id = Column(Integer, ForeignKey("assets.id"), nullable=False, comment="资产ID")
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="申请人ID")
-    status = Column(String(20), default=ApprovalStatus.PENDING.value, nullable=False, comment="审批状态")
+    status = Column(String(20), default=ApprovalStatus.PENDING.value, nullable=False, index=True, comment="审批状态")
     approver_id = Column(Integer, ForeignKey("users.id"), nullable=True, comment="审批人ID")
     approval_comment = Column(Text, nullable=True, comment="审批意见")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -247,10 +249,22 @@ class SafetyCheckTask(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True, comment="完成时间")
     
+    # 进度计数器（任务资产状态变化时在同一事务内原子更新，可用 repair_task_counters.py 重建）
+    total_count = Column(Integer, default=0, server_default="0", nullable=False, comment="任务资产总数")
+    checked_count = Column(Integer, default=0, server_default="0", nullable=False, comment="已检查任务资产数")
+    pending_count = Column(Integer, default=0, server_default="0", nullable=False, comment="待检查任务资产数")
+    returned_count = Column(Integer, default=0, server_default="0", nullable=False, comment="已退库任务资产数")
+    overdue_count = Column(Integer, default=0, server_default="0", nullable=False, comment="已逾期任务资产数")
+    
     # 关系
     check_type = relationship("SafetyCheckType", back_populates="tasks")
     created_by = relationship("User", foreign_keys=[created_by_id])
     task_assets = relationship("TaskAsset", back_populates="task", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # 逾期扫描按截止时间和状态查找任务
+        Index("ix_safety_check_tasks_deadline_status", "deadline", "status"),
+    )
 
 
 class TaskAsset(Base):
@@ -320,6 +334,11 @@ class SafetyCheckHistory(Base):
     check_type = relationship("SafetyCheckType")
     checked_by = relationship("User", foreign_keys=[checked_by_id])
     
+    __table_args__ = (
+        # 资产检查历史分页和合规汇总按资产、检查时间查找
+        Index("ix_safety_check_history_asset_checked_at", "asset_id", "checked_at"),
+    )
+    
     def get_check_items_result(self):
         """获取检查项结果（解析JSON）"""
         if self.check_items_result:
@@ -332,3 +351,129 @@ class SafetyCheckHistory(Base):
     def set_check_items_result(self, items):
         """设置检查项结果（转换为JSON）"""
         self.check_items_result = json.dumps(items, ensure_ascii=False) if items else None
+
+
+class SafetyCheckItemResult(Base):
+    """安全检查项结果模型（检查历史中检查项结果的规范化存储，提交检查结果时写入，用于合规统计）"""
+    __tablename__ = "safety_check_item_results"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    history_id = Column(Integer, ForeignKey("safety_check_history.id"), nullable=False, index=True, comment="检查历史记录ID")
+    task_id = Column(Integer, ForeignKey("safety_check_tasks.id"), nullable=False, comment="任务ID")
+    asset_id = Column(Integer, ForeignKey("assets.id"), nullable=False, comment="资产ID")
+    check_type_id = Column(Integer, ForeignKey("safety_check_types.id"), nullable=False, comment="检查类型ID")
+    checked_by_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="检查人ID")
+    user_group = Column(String(50), nullable=True, comment="检查人组别（提交时）")
+    item = Column(String(200), nullable=False, comment="检查项内容")
+    result = Column(String(20), nullable=False, comment="检查项结果：yes/no")
+    check_date = Column(Date, nullable=False, comment="检查日期")
+    checked_at = Column(DateTime(timezone=True), nullable=False, comment="检查时间")
+    
+    __table_args__ = (
+        # 合规统计按日期范围筛选，再按检查类型、检查项或组别分组
+        Index("ix_check_item_results_date_type_item", "check_date", "check_type_id", "item", "result"),
+        Index("ix_check_item_results_date_group", "check_date", "user_group", "result"),
+    )
+
+
+class DashboardCounter(Base):
+    """首页统计计数器模型（由会话事件在写入时维护，定时任务校准）"""
+    __tablename__ = "dashboard_counters"
+    
+    name = Column(String(50), primary_key=True, comment="计数器名称")
+    value = Column(Integer, default=0, nullable=False, comment="计数值")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class InventorySnapshot(Base):
+    """每日资产盘点快照模型（定时任务生成，用于趋势图）"""
+    __tablename__ = "inventory_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    snapshot_date = Column(Date, unique=True, index=True, nullable=False, comment="快照日期（UTC）")
+    total_assets = Column(Integer, default=0, nullable=False, comment="资产总数（不含已删除资产）")
+    in_use_assets = Column(Integer, default=0, nullable=False, comment="在用资产数")
+    status_counts = Column(Text, nullable=True, comment="按状态统计（JSON格式）")
+    category_counts = Column(Text, nullable=True, comment="按资产大类ID统计（JSON格式）")
+    group_counts = Column(Text, nullable=True, comment="按使用人组别统计（JSON格式）")
+    pending_transfers = Column(Integer, default=0, nullable=False, comment="待审批交接申请数")
+    pending_returns = Column(Integer, default=0, nullable=False, comment="待审批退回申请数")
+    pending_edits = Column(Integer, default=0, nullable=False, comment="待审批编辑申请数")
+    source = Column(String(20), default="live", nullable=False, comment="数据来源：live-实时统计，backfill-根据流转记录补算")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    def get_counts(self, field):
+        """获取分组统计（解析JSON）"""
+        value = getattr(self, field)
+        if value:
+            try:
+                return json.loads(value)
+            except:
+                return {}
+        return {}
+    
+    def set_counts(self, field, counts):
+        """设置分组统计（转换为JSON）"""
+        setattr(self, field, json.dumps(counts, ensure_ascii=False) if counts else None)
+
+
+class TaskNumberSequence(Base):
+    """任务编号序列模型（按年份分配任务编号）"""
+    __tablename__ = "task_number_sequences"
+    
+    year = Column(Integer, primary_key=True, comment="年份")
+    last_number = Column(Integer, default=0, nullable=False, comment="已分配的最大序号")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SafetyCheckSchedule(Base):
+    """周期性安全检查计划模型（按周期自动生成安全检查任务）"""
+    __tablename__ = "safety_check_schedules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, nullable=False, comment="计划名称")
+    check_type_id = Column(Integer, ForeignKey("safety_check_types.id"), nullable=False, comment="检查类型ID")
+    title = Column(String(200), nullable=False, comment="任务标题（生成任务时追加周期）")
+    description = Column(Text, nullable=True, comment="任务描述")
+    criteria = Column(Text, nullable=False, comment="资产筛选条件（JSON格式）")
+    cadence = Column(String(20), nullable=False, comment="周期：daily/weekly/monthly/quarterly/yearly")
+    run_day = Column(Integer, default=1, nullable=False, comment="周期内的生成日：每周第几天(1-7)或每月/季/年首月第几天(1-28)")
+    deadline_days = Column(Integer, nullable=True, comment="截止时间：生成日之后的天数，为空表示不设截止时间")
+    is_active = Column(Boolean, default=True, nullable=False, comment="是否启用")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_by_id = Column(Integer, ForeignKey("users.id"), nullable=True, comment="创建人ID")
+    
+    # 关系
+    check_type = relationship("SafetyCheckType")
+    created_by = relationship("User", foreign_keys=[created_by_id])
+    
+    def get_criteria(self):
+        """获取资产筛选条件（解析JSON）"""
+        if self.criteria:
+            try:
+                return json.loads(self.criteria)
+            except:
+                return {}
+        return {}
+    
+    def set_criteria(self, criteria):
+        """设置资产筛选条件（转换为JSON）"""
+        self.criteria = json.dumps(criteria, ensure_ascii=False)
+
+
+class SafetyCheckScheduleRun(Base):
+    """周期性安全检查计划执行记录模型（每个计划每个周期一条，保证同一周期只生成一次任务）"""
+    __tablename__ = "safety_check_schedule_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    schedule_id = Column(Integer, ForeignKey("safety_check_schedules.id"), nullable=False, comment="计划ID")
+    period = Column(String(20), nullable=False, comment="周期，如 2026-10-19、2026-W42、2026-10、2026-Q4、2026")
+    task_id = Column(Integer, ForeignKey("safety_check_tasks.id"), nullable=True, comment="生成的任务ID（没有符合条件的资产时为空）")
+    asset_count = Column(Integer, default=0, nullable=False, comment="生成的任务资产数")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("schedule_id", "period", name="uq_safety_check_schedule_runs_schedule_period"),
+    )
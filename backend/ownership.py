@@ -0,0 +1,89 @@
+"""
+资产归属变更服务
+交接审批、退回审批、编辑审批以及管理员直接编辑资产时共用：
+收集一批资产的归属变更，用集合式UPDATE改派或退库未检查（待检查或已逾期）的任务资产，
+并一次性批量写入资产流转记录，查询次数与资产数量无关
+"""
+from typing import Dict, List, Set
+from sqlalchemy import update, case
+from sqlalchemy.orm import Session
+from models import TaskAsset
+from task_counters import shift_task_counters, OPEN_TASK_ASSET_STATUSES
+from logger import logger
+
+
+class OwnershipChangeSet:
+    """一批资产归属变更，调用 apply 统一落库"""
+
+    def __init__(self):
+        self.reassignments: Dict[int, int] = {}  # 资产ID -> 新使用人ID
+        self.returned_asset_ids: Set[int] = set()
+        self.history_records: List[dict] = []
+
+    def reassign(self, asset_id: int, new_user_id: int):
+        """资产改由新使用人保管，其待检查的任务资产改派给新使用人"""
+        self.reassignments[asset_id] = new_user_id
+
+    def mark_returned(self, asset_id: int):
+        """资产退库，其待检查的任务资产标记为已退库"""
+        self.returned_asset_ids.add(asset_id)
+
+    def add_history(self, **record):
+        """登记一条资产流转记录（参数同 create_history_record）"""
+        self.history_records.append(record)
+
+    def apply(self, db: Session) -> Dict[str, int]:
+        """
+        执行变更：最多一条改派UPDATE、一条退库UPDATE、一条流转记录INSERT
+        先改派后退库，与逐条处理时的顺序一致
+        """
+        reassigned_count = 0
+        returned_count = 0
+
+        if self.reassignments:
+            result = db.execute(
+                update(TaskAsset)
+                .where(
+                    TaskAsset.asset_id.in_(list(self.reassignments)),
+                    TaskAsset.status.in_(OPEN_TASK_ASSET_STATUSES)
+                )
+                .values(assigned_user_id=case(self.reassignments, value=TaskAsset.asset_id))
+                .execution_options(synchronize_session="fetch")
+            )
+            reassigned_count = result.rowcount or 0
+
+        if self.returned_asset_ids:
+            # 先调整任务进度计数器，再更新任务资产状态
+            returned_filter = TaskAsset.asset_id.in_(list(self.returned_asset_ids))
+            for from_status in OPEN_TASK_ASSET_STATUSES:
+                shift_task_counters(db, from_status, "returned", returned_filter)
+            result = db.execute(
+                update(TaskAsset)
+                .where(
+                    returned_filter,
+                    TaskAsset.status.in_(OPEN_TASK_ASSET_STATUSES)
+                )
+                .values(status="returned")
+                .execution_options(synchronize_session="fetch")
+            )
+            returned_count = result.rowcount or 0
+
+        if reassigned_count or returned_count:
+            logger.info(f"资产归属变更：{len(self.reassignments)} 项资产的 {reassigned_count} 条待检查任务资产已改派，{len(self.returned_asset_ids)} 项资产的 {returned_count} 条待检查任务资产已标记为已退库")
+
+        if self.history_records:
+            try:
+                from routers.asset_history import create_history_records
+                create_history_records(db, self.history_records)
+            except Exception as e:
+                logger.error(f"批量记录资产流转历史失败: {e}", exc_info=True)
+
+        applied = {
+            "reassigned_task_assets": reassigned_count,
+            "returned_task_assets": returned_count,
+            "history_records": len(self.history_records)
+        }
+        self.reassignments = {}
+        self.returned_asset_ids = set()
+        self.history_records = []
+        return applied
@@ -0,0 +1,42 @@
+"""
+安全检查任务进度计数器修复脚本
+为旧数据库补充计数器字段，并按任务资产实际状态重建所有任务的进度计数器
+用法：python repair_task_counters.py
+"""
+from sqlalchemy import inspect, text
+from database import SessionLocal, engine, Base
+from models import SafetyCheckTask
+from task_counters import rebuild_task_counters
+
+COUNTER_COLUMNS = ["total_count", "checked_count", "pending_count", "returned_count", "overdue_count"]
+
+
+def add_missing_counter_columns():
+    """为旧数据库的 safety_check_tasks 表补充计数器字段"""
+    table = SafetyCheckTask.__tablename__
+    existing = {column["name"] for column in inspect(engine).get_columns(table)}
+    with engine.begin() as connection:
+        for column in COUNTER_COLUMNS:
+            if column not in existing:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+                print(f"✓ 添加字段: {table}.{column}")
+
+
+def repair_task_counters():
+    """重建任务进度计数器"""
+    Base.metadata.create_all(bind=engine)
+    add_missing_counter_columns()
+
+    db = SessionLocal()
+    try:
+        updated = rebuild_task_counters(db)
+        db.commit()
+        print(f"✓ 已重建 {updated} 个任务的进度计数器")
+    except Exception as e:
+        print(f"修复失败: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    repair_task_counters()
@@ -2,21 +2,419 @@
 审批管理路由
 包括交接和退回申请的审批
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy import and_, select, update, func, literal, union_all
+from typing import Dict, List, Optional
+import base64
+import json
 from database import get_db
-from models import TransferRequest, ReturnRequest, AssetEditRequest, Asset, User, TaskAsset
-from schemas import ApprovalRequest
+from models import TransferRequest, ReturnRequest, AssetEditRequest, Asset, User
+from schemas import (
+    ApprovalRequest, BatchApprovalRequest, BatchApprovalResponse, BatchApprovalItemResult,
+    ApprovalInboxItem, ApprovalInboxResponse, TransferRequestResponse, ReturnRequestResponse,
+    ReturnBatchApprovalRequest, ReturnBatchResponse
+)
 from auth import get_current_admin_user
 from logger import logger
-# 延迟导入避免循环依赖
-def get_create_history_record():
-    from routers import asset_history
-    return asset_history.create_history_record
+from cache import reference_cache, WarehouseUser
+from ownership import OwnershipChangeSet
+from routers.transfers import TRANSFER_LOAD_OPTIONS
+from routers.returns import RETURN_LOAD_OPTIONS
+from routers.edit_requests import EDIT_REQUEST_LOAD_OPTIONS, build_edit_request_response
 from datetime import datetime
 
 router = APIRouter()
 
+REQUEST_MODELS = {
+    "transfer": TransferRequest,
+    "return": ReturnRequest,
+    "edit": AssetEditRequest,
+}
+
+NOT_FOUND_MESSAGES = {
+    "transfer": "交接申请不存在",
+    "return": "退回申请不存在",
+    "edit": "编辑申请不存在",
+}
+
+
+class ApprovalContext:
+    """
+    审批预加载数据
+    一次性用IN查询加载申请涉及的资产和用户，并收集资产归属变更和流转记录，
+    单条审批和批量审批共用
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.assets: Dict[int, Asset] = {}
+        self.users: Dict[int, User] = {}
+        self.warehouse_user: Optional[WarehouseUser] = None
+        self.changes = OwnershipChangeSet()
+
+    def get_user(self, user_id: Optional[int]) -> Optional[User]:
+        """获取用户，未预加载时回退到单独查询"""
+        if not user_id:
+            return None
+        if user_id not in self.users:
+            self.users[user_id] = self.db.query(User).filter(User.id == user_id).first()
+        return self.users[user_id]
+
+
+def load_approval_context(
+    db: Session,
+    transfer_requests: List[TransferRequest] = (),
+    return_requests: List[ReturnRequest] = (),
+    edit_requests: List[AssetEditRequest] = ()
+) -> ApprovalContext:
+    """按申请列表预加载审批所需数据（每类实体一次IN查询）"""
+    ctx = ApprovalContext(db)
+    requests = list(transfer_requests) + list(return_requests) + list(edit_requests)
+    if not requests:
+        return ctx
+
+    # 资产（包括已删除的，审批时需要判断）
+    asset_ids = {req.asset_id for req in requests}
+    ctx.assets = {asset.id: asset for asset in db.query(Asset).filter(Asset.id.in_(asset_ids)).all()}
+
+    # 涉及的用户：申请人、转出/转入人、新保管人、资产当前使用人、编辑申请中的新使用人
+    user_ids = {asset.user_id for asset in ctx.assets.values() if asset.user_id}
+    for req in transfer_requests:
+        user_ids.update([req.from_user_id, req.to_user_id, req.created_by_id])
+    for req in return_requests:
+        user_ids.update([req.user_id, req.new_user_id])
+    for req in edit_requests:
+        user_ids.add(req.user_id)
+        edit_data = json.loads(req.edit_data) if req.edit_data else {}
+        if isinstance(edit_data.get("user_id"), int):
+            user_ids.add(edit_data["user_id"])
+    user_ids.discard(None)
+    if user_ids:
+        ctx.users = {user.id: user for user in db.query(User).filter(User.id.in_(user_ids)).all()}
+
+    # 获取"仓库"用户（仅退回审批需要）
+    if return_requests:
+        ctx.warehouse_user = reference_cache.get_warehouse_user(db)
+
+    return ctx
+
+
+def approve_transfer(db: Session, request: TransferRequest, approved: bool, comment: Optional[str], current_user: User, ctx: ApprovalContext):
+    """审批交接申请"""
+    # 检查申请状态，必须是待审批状态
+    if request.status != "pending":
+        raise HTTPException(status_code=400, detail="该申请已处理或尚未确认")
+
+    # 检查转入人是否已确认
+    if request.to_user_confirmed is None or request.to_user_confirmed != 1:
+        raise HTTPException(status_code=400, detail="转入人尚未确认，无法审批")
+
+    # 更新申请状态
+    request.status = "approved" if approved else "rejected"
+    request.approver_id = current_user.id
+    request.approval_comment = comment
+    request.approved_at = datetime.utcnow()
+
+    # operator_id 应该是实际发起申请的用户，而不是转出用户
+    # 如果管理员代为申请，应该显示管理员；否则显示转出用户
+    operator_id = request.created_by_id if request.created_by_id else request.from_user_id
+
+    # 如果批准，更新资产信息
+    if approved:
+        # 审批时资产可能已被删除，但仍需要处理审批
+        asset = ctx.assets.get(request.asset_id)
+        if asset and asset.deleted_at is None:
+            old_user_id = asset.user_id
+            old_user = ctx.get_user(old_user_id)
+
+            asset.user_id = request.to_user_id
+            # 更新使用人组别
+            to_user = ctx.get_user(request.to_user_id)
+            if to_user:
+                asset.user_group = to_user.group
+
+            # 获取转出用户信息
+            from_user = ctx.get_user(request.from_user_id)
+
+            # 更新该资产未完成的安全检查任务到新接收人
+            ctx.changes.reassign(asset.id, request.to_user_id)
+
+            logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 审批通过资产交接申请: 资产ID {asset.id}({asset.asset_number}), 从 {from_user.real_name if from_user else ''} 转给 {to_user.real_name if to_user else ''}, 申请ID {request.id}")
+
+            # 记录审批通过历史
+            ctx.changes.add_history(
+                asset_id=request.asset_id,
+                action_type="approve",
+                action_description=f"审批通过资产交接：从 {from_user.real_name if from_user else ''} 转给 {to_user.real_name if to_user else ''}",
+                operator_id=operator_id,
+                approver_id=current_user.id,
+                old_value={"user_id": old_user_id, "user_name": old_user.real_name if old_user else ""},
+                new_value={"user_id": request.to_user_id, "user_name": to_user.real_name if to_user else ""},
+                related_request_id=request.id,
+                related_request_type="transfer"
+            )
+    else:
+        # 记录审批拒绝历史
+        logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 拒绝资产交接申请: 资产ID {request.asset_id}, 申请ID {request.id}")
+
+        ctx.changes.add_history(
+            asset_id=request.asset_id,
+            action_type="approve",
+            action_description="审批拒绝资产交接申请",
+            operator_id=operator_id,
+            approver_id=current_user.id,
+            related_request_id=request.id,
+            related_request_type="transfer"
+        )
+
+
+def approve_return(db: Session, request: ReturnRequest, approved: bool, comment: Optional[str], current_user: User, ctx: ApprovalContext):
+    """审批退回申请"""
+    if request.status != "pending":
+        raise HTTPException(status_code=400, detail="该申请已处理")
+
+    # 审批时资产可能已被删除，但仍需要处理审批
+    asset = ctx.assets.get(request.asset_id)
+    update_asset = approved and asset is not None and asset.deleted_at is None
+
+    # 先完成校验再修改数据，避免批量审批时留下部分修改
+    if update_asset:
+        if not ctx.warehouse_user:
+            raise HTTPException(status_code=500, detail="仓库用户不存在，请先初始化数据库")
+        if request.new_user_id is not None and not ctx.get_user(request.new_user_id):
+            raise HTTPException(status_code=404, detail="指定的保管人不存在")
+
+    # 更新申请状态
+    request.status = "approved" if approved else "rejected"
+    request.approver_id = current_user.id
+    request.approval_comment = comment
+    request.approved_at = datetime.utcnow()
+
+    # 如果批准，根据申请人修改的内容更新资产信息
+    if update_asset:
+        warehouse_user = ctx.warehouse_user
+        # 记录旧值
+        old_values = {
+            "user_id": asset.user_id,
+            "user_group": asset.user_group,
+            "status": asset.status,
+            "mac_address": asset.mac_address,
+            "ip_address": asset.ip_address,
+            "office_location": asset.office_location,
+            "floor": asset.floor,
+            "seat_number": asset.seat_number,
+            "remark": asset.remark
+        }
+
+        # 判断是否修改了保管人
+        changed_user = request.new_user_id is not None
+
+        # 判断申请人是否修改了其他字段（排除保管人）
+        has_changes = any([
+            request.mac_address is not None,
+            request.ip_address is not None,
+            request.office_location is not None,
+            request.floor is not None,
+            request.seat_number is not None,
+            request.remark is not None
+        ])
+
+        # 根据三种情况处理
+        # 注意：无论哪种情况，审批通过后资产状态都变为"库存备用"
+        if changed_user:
+            # 情况1：申请人修改了保管人
+            # 状态变为"库存备用"，其他字段按照申请人修改的内容修改
+            new_user = ctx.get_user(request.new_user_id)
+            asset.user_id = request.new_user_id
+            asset.user_group = new_user.group
+
+            # 更新其他字段（如果申请人提供了，包括null值）
+            asset.mac_address = request.mac_address
+            asset.ip_address = request.ip_address
+            asset.office_location = request.office_location
+            asset.floor = request.floor
+            asset.seat_number = request.seat_number
+            asset.remark = request.remark
+
+            # 状态变为"库存备用"
+            asset.status = "库存备用"
+
+        elif has_changes:
+            # 情况2：申请人未修改保管人但修改了其他信息
+            # 保管人改为"仓库"用户，其他内容按照申请人修改的内容修改
+            asset.user_id = warehouse_user.id
+            asset.user_group = warehouse_user.group
+            asset.status = "库存备用"
+
+            # 更新申请人修改的字段（包括null值）
+            asset.mac_address = request.mac_address
+            asset.ip_address = request.ip_address
+            asset.office_location = request.office_location
+            asset.floor = request.floor
+            asset.seat_number = request.seat_number
+            asset.remark = request.remark
+
+        else:
+            # 情况3：申请人没有修改任何字段
+            # 保管人改为"仓库"用户，除状态外其他内容不变
+            asset.user_id = warehouse_user.id
+            asset.user_group = warehouse_user.group
+            asset.status = "库存备用"
+            # 其他字段保持不变
+
+        # 将该资产未完成的安全检查任务标记为已退库
+        ctx.changes.mark_returned(asset.id)
+
+        # 记录审批通过历史
+        new_user_obj = ctx.get_user(asset.user_id)
+        logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 审批通过资产退回申请: 资产ID {asset.id}({asset.asset_number}), 申请ID {request.id}")
+
+        new_values = {
+            "user_id": asset.user_id,
+            "user_name": new_user_obj.real_name if new_user_obj else "仓库",
+            "user_group": asset.user_group,
+            "status": asset.status,
+            "mac_address": asset.mac_address,
+            "ip_address": asset.ip_address,
+            "office_location": asset.office_location,
+            "floor": asset.floor,
+            "seat_number": asset.seat_number,
+            "remark": asset.remark
+        }
+
+        # 构建描述
+        if changed_user:
+            desc = f"审批通过资产退回：保管人改为 {new_user_obj.real_name if new_user_obj else ''}，状态改为库存备用，其他字段按申请人修改"
+        elif has_changes:
+            desc = f"审批通过资产退回：资产退回仓库（{warehouse_user.real_name}），状态改为库存备用，字段按申请人修改"
+        else:
+            desc = f"审批通过资产退回：资产退回仓库（{warehouse_user.real_name}），状态改为库存备用"
+
+        ctx.changes.add_history(
+            asset_id=request.asset_id,
+            action_type="approve",
+            action_description=desc,
+            operator_id=request.user_id,
+            approver_id=current_user.id,
+            old_value=old_values,
+            new_value=new_values,
+            related_request_id=request.id,
+            related_request_type="return"
+        )
+    elif not approved:
+        # 记录审批拒绝历史
+        logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 拒绝资产退回申请: 资产ID {request.asset_id}({asset.asset_number if asset else 'N/A'}), 申请ID {request.id}")
+
+        ctx.changes.add_history(
+            asset_id=request.asset_id,
+            action_type="approve",
+            action_description="审批拒绝资产退回申请",
+            operator_id=request.user_id,
+            approver_id=current_user.id,
+            related_request_id=request.id,
+            related_request_type="return"
+        )
+
+
+def approve_edit(db: Session, request: AssetEditRequest, approved: bool, comment: Optional[str], current_user: User, ctx: ApprovalContext):
+    """审批编辑申请"""
+    if request.status != "pending":
+        raise HTTPException(status_code=400, detail="该申请已处理")
+
+    # 更新申请状态
+    request.status = "approved" if approved else "rejected"
+    request.approver_id = current_user.id
+    request.approval_comment = comment
+    request.approved_at = datetime.utcnow()
+
+    # 审批时资产可能已被删除，但仍需要处理审批
+    asset = ctx.assets.get(request.asset_id)
+
+    # 如果批准，更新资产信息
+    if approved:
+        if asset and asset.deleted_at is None:
+            # 解析编辑数据
+            edit_data = json.loads(request.edit_data) if request.edit_data else {}
+
+            # 记录旧值
+            old_values = {
+                "name": asset.name,
+                "specification": asset.specification,
+                "status": asset.status,
+                "mac_address": asset.mac_address,
+                "ip_address": asset.ip_address,
+                "office_location": asset.office_location,
+                "floor": asset.floor,
+                "seat_number": asset.seat_number,
+                "user_id": asset.user_id,
+                "user_group": asset.user_group,
+                "remark": asset.remark
+            }
+
+            # 更新字段
+            changed_fields = []
+            for field, value in edit_data.items():
+                old_val = getattr(asset, field, None)
+                if old_val != value:
+                    setattr(asset, field, value)
+                    changed_fields.append(field)
+
+            # 如果更新了使用人，自动更新组别
+            old_user_id = old_values.get("user_id")
+            if "user_id" in edit_data and edit_data["user_id"] is not None:
+                user = ctx.get_user(edit_data["user_id"])
+                if user:
+                    asset.user_group = user.group
+
+            # 处理安全检查任务
+            # 如果修改了使用人，更新未完成的安全检查任务到新接收人
+            if "user_id" in changed_fields and edit_data.get("user_id") is not None and edit_data.get("user_id") != old_user_id:
+                ctx.changes.reassign(asset.id, edit_data["user_id"])
+
+            # 如果状态改为"库存备用"，将未完成的安全检查任务标记为已退库
+            if "status" in changed_fields and asset.status == "库存备用":
+                ctx.changes.mark_returned(asset.id)
+
+            # 导入字段名映射函数
+            from routers.asset_history import get_field_label
+            field_labels = [get_field_label(field) for field in changed_fields] if changed_fields else []
+            logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 审批通过资产编辑申请: 资产ID {asset.id}({asset.asset_number}), 修改字段: {', '.join(field_labels) if field_labels else '无'}, 申请ID {request.id}")
+
+            # 记录审批通过历史
+            new_values = {field: getattr(asset, field) for field in changed_fields}
+            ctx.changes.add_history(
+                asset_id=request.asset_id,
+                action_type="edit_approve",
+                action_description=f"审批通过资产编辑：修改了 {', '.join(field_labels) if field_labels else '无变化'}",
+                operator_id=request.user_id,
+                approver_id=current_user.id,
+                old_value={k: old_values.get(k) for k in changed_fields if k in old_values},
+                new_value=new_values,
+                related_request_id=request.id,
+                related_request_type="edit"
+            )
+    else:
+        # 记录审批拒绝历史
+        logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 拒绝资产编辑申请: 资产ID {request.asset_id}({asset.asset_number if asset else 'N/A'}), 申请ID {request.id}")
+
+        ctx.changes.add_history(
+            asset_id=request.asset_id,
+            action_type="edit_approve",
+            action_description="审批拒绝资产编辑申请",
+            operator_id=request.user_id,
+            approver_id=current_user.id,
+            related_request_id=request.id,
+            related_request_type="edit"
+        )
+
+
+APPROVAL_HANDLERS = {
+    "transfer": approve_transfer,
+    "return": approve_return,
+    "edit": approve_edit,
+}
+
 
 @router.post("/approve")
 async def approve_request(
@@ -28,402 +426,296 @@ async def approve_request(
     审批申请（仅管理员）
     request_type: "transfer"、"return" 或 "edit"
     """
-    if approval_data.request_type == "transfer":
-        # 审批交接申请
-        request = db.query(TransferRequest).filter(
-            TransferRequest.id == approval_data.request_id
-        ).first()
-        if not request:
-            raise HTTPException(status_code=404, detail="交接申请不存在")
-        
-        # 检查申请状态，必须是待审批状态
-        if request.status != "pending":
-            raise HTTPException(status_code=400, detail="该申请已处理或尚未确认")
-        
-        # 检查转入人是否已确认
-        if request.to_user_confirmed is None or request.to_user_confirmed != 1:
-            raise HTTPException(status_code=400, detail="转入人尚未确认，无法审批")
-        
-        # 更新申请状态
-        request.status = "approved" if approval_data.approved else "rejected"
-        request.approver_id = current_user.id
-        request.approval_comment = approval_data.comment
-        request.approved_at = datetime.utcnow()
-        
-        # 如果批准，更新资产信息
-        if approval_data.approved:
-            # 查询资产，包括已删除的（因为审批时资产可能已被删除，但仍需要处理审批）
-            asset = db.query(Asset).filter(Asset.id == request.asset_id).first()
-            if asset and asset.deleted_at is None:
-                old_user_id = asset.user_id
-                old_user = db.query(User).filter(User.id == old_user_id).first() if old_user_id else None
-                
-                asset.user_id = request.to_user_id
-                # 更新使用人组别
-                to_user = db.query(User).filter(User.id == request.to_user_id).first()
-                if to_user:
-                    asset.user_group = to_user.group
-                
-                # 获取转出用户信息
-                from_user = db.query(User).filter(User.id == request.from_user_id).first()
-                
-                # 更新该资产未完成的安全检查任务到新接收人
-                pending_task_assets = db.query(TaskAsset).filter(
-                    TaskAsset.asset_id == asset.id,
-                    TaskAsset.status == "pending"
-                ).all()
-                
-                for task_asset in pending_task_assets:
-                    task_asset.assigned_user_id = request.to_user_id
-                    logger.info(f"资产交接：安全检查任务资产关联ID {task_asset.id} 已更新到新接收人 {to_user.real_name if to_user else ''}")
-                
-                logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 审批通过资产交接申请: 资产ID {asset.id}({asset.asset_number}), 从 {from_user.real_name if from_user else ''} 转给 {to_user.real_name if to_user else ''}, 申请ID {request.id}")
-                
-                # 记录审批通过历史
-                # operator_id 应该是实际发起申请的用户，而不是转出用户
-                # 如果管理员代为申请，应该显示管理员；否则显示转出用户
-                operator_id = request.created_by_id if request.created_by_id else request.from_user_id
-                
-                try:
-                    create_history = get_create_history_record()
-                    create_history(
-                        db=db,
-                        asset_id=request.asset_id,
-                        action_type="approve",
-                        action_description=f"审批通过资产交接：从 {from_user.real_name if from_user else ''} 转给 {to_user.real_name if to_user else ''}",
-                        operator_id=operator_id,
-                        approver_id=current_user.id,
-                        old_value={"user_id": old_user_id, "user_name": old_user.real_name if old_user else ""},
-                        new_value={"user_id": request.to_user_id, "user_name": to_user.real_name if to_user else ""},
-                        related_request_id=request.id,
-                        related_request_type="transfer"
-                    )
-                except Exception as e:
-                    logger.error(f"记录审批历史失败: {e}", exc_info=True)
-        else:
-            # 记录审批拒绝历史
-            # operator_id 应该是实际发起申请的用户
-            operator_id = request.created_by_id if request.created_by_id else request.from_user_id
-            
-            logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 拒绝资产交接申请: 资产ID {request.asset_id}, 申请ID {request.id}")
-            
-            try:
-                create_history = get_create_history_record()
-                create_history(
-                    db=db,
-                    asset_id=request.asset_id,
-                    action_type="approve",
-                    action_description="审批拒绝资产交接申请",
-                    operator_id=operator_id,
-                    approver_id=current_user.id,
-                    related_request_id=request.id,
-                    related_request_type="transfer"
-                )
-            except Exception as e:
-                logger.error(f"记录审批历史失败: {e}", exc_info=True)
-        
-        db.commit()
-        return {"message": "审批完成"}
-    
-    elif approval_data.request_type == "return":
-        # 审批退回申请
-        request = db.query(ReturnRequest).filter(
-            ReturnRequest.id == approval_data.request_id
-        ).first()
-        if not request:
-            raise HTTPException(status_code=404, detail="退回申请不存在")
-        
-        if request.status != "pending":
-            raise HTTPException(status_code=400, detail="该申请已处理")
-        
-        # 更新申请状态
-        request.status = "approved" if approval_data.approved else "rejected"
-        request.approver_id = current_user.id
-        request.approval_comment = approval_data.comment
-        request.approved_at = datetime.utcnow()
-        
-        # 如果批准，根据申请人修改的内容更新资产信息
-        if approval_data.approved:
-            # 查询资产，包括已删除的（因为审批时资产可能已被删除，但仍需要处理审批）
-            asset = db.query(Asset).filter(Asset.id == request.asset_id).first()
-            if asset and asset.deleted_at is None:
-                # 记录旧值
-                old_values = {
-                    "user_id": asset.user_id,
-                    "user_group": asset.user_group,
-                    "status": asset.status,
-                    "mac_address": asset.mac_address,
-                    "ip_address": asset.ip_address,
-                    "office_location": asset.office_location,
-                    "floor": asset.floor,
-                    "seat_number": asset.seat_number,
-                    "remark": asset.remark
-                }
-                old_user = db.query(User).filter(User.id == asset.user_id).first() if asset.user_id else None
-                
-                # 判断是否修改了保管人
-                changed_user = request.new_user_id is not None
-                
-                # 判断申请人是否修改了其他字段（排除保管人）
-                has_changes = any([
-                    request.mac_address is not None,
-                    request.ip_address is not None,
-                    request.office_location is not None,
-                    request.floor is not None,
-                    request.seat_number is not None,
-                    request.remark is not None
-                ])
-                
-                # 获取"仓库"用户
-                warehouse_user = db.query(User).filter(User.ehr_number == "1000000").first()
-                if not warehouse_user:
-                    raise HTTPException(status_code=500, detail="仓库用户不存在，请先初始化数据库")
-                
-                # 根据三种情况处理
-                # 注意：无论哪种情况，审批通过后资产状态都变为"库存备用"
-                if changed_user:
-                    # 情况1：申请人修改了保管人
-                    # 状态变为"库存备用"，其他字段按照申请人修改的内容修改
-                    new_user = db.query(User).filter(User.id == request.new_user_id).first()
-                    if new_user:
-                        asset.user_id = request.new_user_id
-                        asset.user_group = new_user.group
-                    else:
-                        raise HTTPException(status_code=404, detail="指定的保管人不存在")
-                    
-                    # 更新其他字段（如果申请人提供了，包括null值）
-                    asset.mac_address = request.mac_address
-                    asset.ip_address = request.ip_address
-                    asset.office_location = request.office_location
-                    asset.floor = request.floor
-                    asset.seat_number = request.seat_number
-                    asset.remark = request.remark
-                    
-                    # 状态变为"库存备用"
-                    asset.status = "库存备用"
-                    
-                elif has_changes:
-                    # 情况2：申请人未修改保管人但修改了其他信息
-                    # 保管人改为"仓库"用户，其他内容按照申请人修改的内容修改
-                    asset.user_id = warehouse_user.id
-                    asset.user_group = warehouse_user.group
-                    asset.status = "库存备用"
-                    
-                    # 更新申请人修改的字段（包括null值）
-                    asset.mac_address = request.mac_address
-                    asset.ip_address = request.ip_address
-                    asset.office_location = request.office_location
-                    asset.floor = request.floor
-                    asset.seat_number = request.seat_number
-                    asset.remark = request.remark
-                    
-                else:
-                    # 情况3：申请人没有修改任何字段
-                    # 保管人改为"仓库"用户，除状态外其他内容不变
-                    asset.user_id = warehouse_user.id
-                    asset.user_group = warehouse_user.group
-                    asset.status = "库存备用"
-                    # 其他字段保持不变
-                
-                # 将该资产未完成的安全检查任务标记为已退库
-                pending_task_assets = db.query(TaskAsset).filter(
-                    TaskAsset.asset_id == asset.id,
-                    TaskAsset.status == "pending"
-                ).all()
-                
-                for task_asset in pending_task_assets:
-                    task_asset.status = "returned"  # 标记为已退库
-                    logger.info(f"资产退回：安全检查任务资产关联ID {task_asset.id} 已标记为已退库")
-                
-                # 记录审批通过历史
-                new_user_obj = db.query(User).filter(User.id == asset.user_id).first() if asset.user_id else None
-                logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 审批通过资产退回申请: 资产ID {asset.id}({asset.asset_number}), 申请ID {request.id}")
-                
-                try:
-                    create_history = get_create_history_record()
-                    new_values = {
-                        "user_id": asset.user_id,
-                        "user_name": new_user_obj.real_name if new_user_obj else "仓库",
-                        "user_group": asset.user_group,
-                        "status": asset.status,
-                        "mac_address": asset.mac_address,
-                        "ip_address": asset.ip_address,
-                        "office_location": asset.office_location,
-                        "floor": asset.floor,
-                        "seat_number": asset.seat_number,
-                        "remark": asset.remark
-                    }
-                    
-                    # 构建描述
-                    if changed_user:
-                        desc = f"审批通过资产退回：保管人改为 {new_user_obj.real_name if new_user_obj else ''}，状态改为库存备用，其他字段按申请人修改"
-                    elif has_changes:
-                        desc = f"审批通过资产退回：资产退回仓库（{warehouse_user.real_name}），状态改为库存备用，字段按申请人修改"
-                    else:
-                        desc = f"审批通过资产退回：资产退回仓库（{warehouse_user.real_name}），状态改为库存备用"
-                    
-                    create_history(
-                        db=db,
-                        asset_id=request.asset_id,
-                        action_type="approve",
-                        action_description=desc,
-                        operator_id=request.user_id,
-                        approver_id=current_user.id,
-                        old_value=old_values,
-                        new_value=new_values,
-                        related_request_id=request.id,
-                        related_request_type="return"
-                    )
-                except Exception as e:
-                    logger.error(f"记录审批历史失败: {e}", exc_info=True)
-        else:
-            # 记录审批拒绝历史
-            asset = db.query(Asset).filter(Asset.id == request.asset_id).first()
-            logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 拒绝资产退回申请: 资产ID {request.asset_id}({asset.asset_number if asset else 'N/A'}), 申请ID {request.id}")
-            
-            try:
-                create_history = get_create_history_record()
-                create_history(
-                    db=db,
-                    asset_id=request.asset_id,
-                    action_type="approve",
-                    action_description="审批拒绝资产退回申请",
-                    operator_id=request.user_id,
-                    approver_id=current_user.id,
-                    related_request_id=request.id,
-                    related_request_type="return"
-                )
-            except Exception as e:
-                logger.error(f"记录审批历史失败: {e}", exc_info=True)
-        
-        db.commit()
-        return {"message": "审批完成"}
-    
-    elif approval_data.request_type == "edit":
-        # 审批编辑申请
-        request = db.query(AssetEditRequest).filter(
-            AssetEditRequest.id == approval_data.request_id
-        ).first()
+    model = REQUEST_MODELS.get(approval_data.request_type)
+    if model is None:
+        raise HTTPException(status_code=400, detail="无效的申请类型")
+
+    request = db.query(model).filter(model.id == approval_data.request_id).first()
+    if not request:
+        raise HTTPException(status_code=404, detail=NOT_FOUND_MESSAGES[approval_data.request_type])
+
+    ctx = load_approval_context(db, **{f"{approval_data.request_type}_requests": [request]})
+    handler = APPROVAL_HANDLERS[approval_data.request_type]
+    handler(db, request, approval_data.approved, approval_data.comment, current_user, ctx)
+    ctx.changes.apply(db)
+
+    db.commit()
+    return {"message": "审批完成"}
+
+
+@router.post("/batch-approve", response_model=BatchApprovalResponse)
+async def batch_approve_requests(
+    batch_data: BatchApprovalRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_admin_user)
+):
+    """
+    批量审批申请（仅管理员）
+    支持交接、退回、编辑申请混合提交，在同一事务中处理，逐条返回结果
+    """
+    # 按类型分组，每类申请一次IN查询
+    ids_by_type: Dict[str, set] = {request_type: set() for request_type in REQUEST_MODELS}
+    for item in batch_data.items:
+        if item.request_type in ids_by_type:
+            ids_by_type[item.request_type].add(item.request_id)
+
+    requests_by_type: Dict[str, Dict[int, object]] = {}
+    for request_type, request_ids in ids_by_type.items():
+        model = REQUEST_MODELS[request_type]
+        requests_by_type[request_type] = {
+            req.id: req for req in db.query(model).filter(model.id.in_(request_ids)).all()
+        } if request_ids else {}
+
+    ctx = load_approval_context(
+        db,
+        transfer_requests=list(requests_by_type["transfer"].values()),
+        return_requests=list(requests_by_type["return"].values()),
+        edit_requests=list(requests_by_type["edit"].values())
+    )
+
+    results = []
+    for item in batch_data.items:
+        if item.request_type not in REQUEST_MODELS:
+            results.append(BatchApprovalItemResult(
+                request_id=item.request_id, request_type=item.request_type, success=False, message="无效的申请类型"
+            ))
+            continue
+
+        request = requests_by_type[item.request_type].get(item.request_id)
         if not request:
-            raise HTTPException(status_code=404, detail="编辑申请不存在")
-        
-        if request.status != "pending":
-            raise HTTPException(status_code=400, detail="该申请已处理")
-        
-        # 更新申请状态
-        request.status = "approved" if approval_data.approved else "rejected"
-        request.approver_id = current_user.id
-        request.approval_comment = approval_data.comment
-        request.approved_at = datetime.utcnow()
-        
-        # 如果批准，更新资产信息
-        if approval_data.approved:
-            # 查询资产，包括已删除的（因为审批时资产可能已被删除，但仍需要处理审批）
-            asset = db.query(Asset).filter(Asset.id == request.asset_id).first()
-            if asset and asset.deleted_at is None:
-                # 解析编辑数据
-                import json
-                edit_data = json.loads(request.edit_data) if request.edit_data else {}
-                
-                # 记录旧值
-                old_values = {
-                    "name": asset.name,
-                    "specification": asset.specification,
-                    "status": asset.status,
-                    "mac_address": asset.mac_address,
-                    "ip_address": asset.ip_address,
-                    "office_location": asset.office_location,
-                    "floor": asset.floor,
-                    "seat_number": asset.seat_number,
-                    "user_id": asset.user_id,
-                    "user_group": asset.user_group,
-                    "remark": asset.remark
-                }
-                
-                # 更新字段
-                changed_fields = []
-                for field, value in edit_data.items():
-                    old_val = getattr(asset, field, None)
-                    if old_val != value:
-                        setattr(asset, field, value)
-                        changed_fields.append(field)
-                
-                # 如果更新了使用人，自动更新组别
-                old_user_id = old_values.get("user_id")
-                if "user_id" in edit_data and edit_data["user_id"] is not None:
-                    user = db.query(User).filter(User.id == edit_data["user_id"]).first()
-                    if user:
-                        asset.user_group = user.group
-                
-                # 处理安全检查任务
-                # 如果修改了使用人，更新未完成的安全检查任务到新接收人
-                if "user_id" in changed_fields and edit_data.get("user_id") is not None and edit_data.get("user_id") != old_user_id:
-                    pending_task_assets = db.query(TaskAsset).filter(
-                        TaskAsset.asset_id == asset.id,
-                        TaskAsset.status == "pending"
-                    ).all()
-                    
-                    new_user = db.query(User).filter(User.id == edit_data["user_id"]).first()
-                    for task_asset in pending_task_assets:
-                        task_asset.assigned_user_id = edit_data["user_id"]
-                        logger.info(f"资产编辑审批：安全检查任务资产关联ID {task_asset.id} 已更新到新接收人 {new_user.real_name if new_user else ''}")
-                
-                # 如果状态改为"库存备用"，将未完成的安全检查任务标记为已退库
-                if "status" in changed_fields and asset.status == "库存备用":
-                    pending_task_assets = db.query(TaskAsset).filter(
-                        TaskAsset.asset_id == asset.id,
-                        TaskAsset.status == "pending"
-                    ).all()
-                    
-                    for task_asset in pending_task_assets:
-                        task_asset.status = "returned"  # 标记为已退库
-                        logger.info(f"资产编辑审批：安全检查任务资产关联ID {task_asset.id} 已标记为已退库")
-                
-                # 导入字段名映射函数
-                from routers.asset_history import get_field_label
-                field_labels = [get_field_label(field) for field in changed_fields] if changed_fields else []
-                logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 审批通过资产编辑申请: 资产ID {asset.id}({asset.asset_number}), 修改字段: {', '.join(field_labels) if field_labels else '无'}, 申请ID {request.id}")
-                
-                # 记录审批通过历史
-                try:
-                    create_history = get_create_history_record()
-                    new_values = {field: getattr(asset, field) for field in changed_fields}
-                    create_history(
-                        db=db,
-                        asset_id=request.asset_id,
-                        action_type="edit_approve",
-                        action_description=f"审批通过资产编辑：修改了 {', '.join(field_labels) if field_labels else '无变化'}",
-                        operator_id=request.user_id,
-                        approver_id=current_user.id,
-                        old_value={k: old_values.get(k) for k in changed_fields if k in old_values},
-                        new_value=new_values,
-                        related_request_id=request.id,
-                        related_request_type="edit"
-                    )
-                except Exception as e:
-                    logger.error(f"记录审批历史失败: {e}", exc_info=True)
-        else:
-            # 记录审批拒绝历史
-            asset = db.query(Asset).filter(Asset.id == request.asset_id).first()
-            logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 拒绝资产编辑申请: 资产ID {request.asset_id}({asset.asset_number if asset else 'N/A'}), 申请ID {request.id}")
-            
-            try:
-                create_history = get_create_history_record()
-                create_history(
-                    db=db,
-                    asset_id=request.asset_id,
-                    action_type="edit_approve",
-                    action_description="审批拒绝资产编辑申请",
-                    operator_id=request.user_id,
-                    approver_id=current_user.id,
-                    related_request_id=request.id,
-                    related_request_type="edit"
-                )
-            except Exception as e:
-                logger.error(f"记录审批历史失败: {e}", exc_info=True)
-        
-        db.commit()
-        return {"message": "审批完成"}
-    
+            results.append(BatchApprovalItemResult(
+                request_id=item.request_id, request_type=item.request_type, success=False,
+                message=NOT_FOUND_MESSAGES[item.request_type]
+            ))
+            continue
+
+        # 各审批函数先校验后修改，校验失败不会留下部分修改，仅记录该条的失败原因
+        try:
+            APPROVAL_HANDLERS[item.request_type](db, request, item.approved, item.comment, current_user, ctx)
+        except HTTPException as e:
+            results.append(BatchApprovalItemResult(
+                request_id=item.request_id, request_type=item.request_type, success=False, message=str(e.detail)
+            ))
+            continue
+
+        results.append(BatchApprovalItemResult(
+            request_id=item.request_id, request_type=item.request_type, success=True, message="审批完成"
+        ))
+
+    # 所有审批项的任务资产变更和流转记录一次性落库
+    ctx.changes.apply(db)
+    db.commit()
+
+    success_count = len([r for r in results if r.success])
+    logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 批量审批申请: 共 {len(results)} 条, 成功 {success_count} 条, 失败 {len(results) - success_count} 条")
+
+    return BatchApprovalResponse(
+        success_count=success_count,
+        error_count=len(results) - success_count,
+        results=results
+    )
+
+
+@router.post("/return-batch/{batch_id}", response_model=ReturnBatchResponse)
+async def approve_return_batch(
+    batch_id: str,
+    approval_data: ReturnBatchApprovalRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_admin_user)
+):
+    """
+    整批审批批量退回申请（仅管理员，只处理批次中待审批的申请）
+    批准时用集合式UPDATE把未删除的资产退回仓库用户、状态改为库存备用，
+    未检查的任务资产标记为已退库，流转记录一次批量写入
+    """
+    rows = db.execute(
+        select(
+            ReturnRequest.id, ReturnRequest.asset_id, ReturnRequest.user_id, ReturnRequest.status,
+            Asset.asset_number, Asset.user_id.label("asset_user_id"), Asset.user_group,
+            Asset.status.label("asset_status"), Asset.deleted_at, User.real_name
+        )
+        .outerjoin(Asset, ReturnRequest.asset_id == Asset.id)
+        .outerjoin(User, Asset.user_id == User.id)
+        .where(ReturnRequest.batch_id == batch_id)
+        .order_by(ReturnRequest.id)
+    ).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="退回批次不存在")
+
+    pending = [row for row in rows if row.status == "pending"]
+    if not pending:
+        raise HTTPException(status_code=400, detail="该批次没有待审批的申请")
+
+    approved = approval_data.approved
+    warehouse_user = reference_cache.get_warehouse_user(db) if approved else None
+    if approved and not warehouse_user:
+        raise HTTPException(status_code=500, detail="仓库用户不存在，请先初始化数据库")
+
+    # 更新申请状态（一条UPDATE）
+    db.execute(
+        update(ReturnRequest)
+        .where(ReturnRequest.id.in_([row.id for row in pending]), ReturnRequest.status == "pending")
+        .values(
+            status="approved" if approved else "rejected",
+            approver_id=current_user.id,
+            approval_comment=approval_data.comment,
+            approved_at=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    changes = OwnershipChangeSet()
+    if approved:
+        # 审批时资产可能已被删除，已删除的资产只处理申请不修改资产
+        returned_asset_ids = [row.asset_id for row in pending if row.asset_number is not None and row.deleted_at is None]
+        if returned_asset_ids:
+            db.execute(
+                update(Asset)
+                .where(Asset.id.in_(returned_asset_ids))
+                .values(user_id=warehouse_user.id, user_group=warehouse_user.group, status="库存备用")
+                .execution_options(synchronize_session=False)
+            )
+        for row in pending:
+            if row.asset_number is None or row.deleted_at is not None:
+                continue
+            # 将该资产未完成的安全检查任务标记为已退库
+            changes.mark_returned(row.asset_id)
+            changes.add_history(
+                asset_id=row.asset_id,
+                action_type="approve",
+                action_description=f"审批通过资产退回：资产退回仓库（{warehouse_user.real_name}），状态改为库存备用",
+                operator_id=row.user_id,
+                approver_id=current_user.id,
+                old_value={
+                    "user_id": row.asset_user_id,
+                    "user_name": row.real_name or "",
+                    "user_group": row.user_group,
+                    "status": row.asset_status
+                },
+                new_value={
+                    "user_id": warehouse_user.id,
+                    "user_name": warehouse_user.real_name,
+                    "user_group": warehouse_user.group,
+                    "status": "库存备用"
+                },
+                related_request_id=row.id,
+                related_request_type="return"
+            )
     else:
-        raise HTTPException(status_code=400, detail="无效的申请类型")
+        for row in pending:
+            changes.add_history(
+                asset_id=row.asset_id,
+                action_type="approve",
+                action_description="审批拒绝资产退回申请",
+                operator_id=row.user_id,
+                approver_id=current_user.id,
+                related_request_id=row.id,
+                related_request_type="return"
+            )
+    applied = changes.apply(db)
+    db.commit()
+
+    logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) {'批准' if approved else '拒绝'}批量资产退回申请: 批次号 {batch_id}, {len(pending)} 项, 已退库任务资产 {applied['returned_task_assets']} 条")
+
+    requests = db.query(ReturnRequest).options(*RETURN_LOAD_OPTIONS).filter(
+        ReturnRequest.batch_id == batch_id
+    ).order_by(ReturnRequest.id).all()
+    return ReturnBatchResponse(
+        batch_id=batch_id,
+        count=len(requests),
+        requests=[ReturnRequestResponse.model_validate(req) for req in requests]
+    )
+
+
+# 收件箱中各类型的排序位次：同一创建时间下按 交接 -> 退回 -> 编辑 排列
+INBOX_TYPE_RANKS = {"transfer": 0, "return": 1, "edit": 2}
+
+INBOX_LOAD_OPTIONS = {
+    "transfer": TRANSFER_LOAD_OPTIONS,
+    "return": RETURN_LOAD_OPTIONS,
+    "edit": EDIT_REQUEST_LOAD_OPTIONS,
+}
+
+
+def encode_inbox_cursor(last_ids: Dict[str, Optional[int]]) -> str:
+    """编码收件箱游标（各类型已返回的最后一条申请ID）"""
+    payload = json.dumps(last_ids, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_inbox_cursor(cursor: str) -> Dict[str, Optional[int]]:
+    """解码收件箱游标"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        return {
+            request_type: int(payload[request_type]) if payload.get(request_type) is not None else None
+            for request_type in INBOX_TYPE_RANKS
+        }
+    except Exception:
+        raise HTTPException(status_code=400, detail="游标格式不正确")
+
+
+def pending_filter(model):
+    """待审批条件（交接申请还需转入人已确认，与审批接口的校验一致）"""
+    if model is TransferRequest:
+        return and_(model.status == "pending", model.to_user_confirmed == 1)
+    return model.status == "pending"
+
+
+@router.get("/inbox", response_model=ApprovalInboxResponse)
+async def get_approval_inbox(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_admin_user)
+):
+    """
+    审批收件箱（仅管理员）
+    一次返回交接、退回、编辑三类待审批申请，按创建时间倒序，游标分页
+    """
+    # 各类型待审批数量（一次查询）
+    count_query = union_all(*[
+        select(literal(request_type).label("request_type"), func.count(model.id).label("count")).where(pending_filter(model))
+        for request_type, model in REQUEST_MODELS.items()
+    ])
+    counts = {request_type: 0 for request_type in REQUEST_MODELS}
+    for request_type, count in db.execute(count_query).all():
+        counts[request_type] = count or 0
+
+    # 游标记录每类已返回的最后一条ID；同类申请的ID与创建时间同序，
+    # 因此每类按ID倒序续读即可，跨类型的合并排序在内存中完成
+    last_ids = decode_inbox_cursor(cursor) if cursor else {request_type: None for request_type in REQUEST_MODELS}
+
+    # 每类最多取 limit+1 条，合并排序后截取一页
+    rows = []
+    for request_type, model in REQUEST_MODELS.items():
+        query = db.query(model).options(*INBOX_LOAD_OPTIONS[request_type]).filter(pending_filter(model))
+        if last_ids[request_type] is not None:
+            query = query.filter(model.id < last_ids[request_type])
+        requests = query.order_by(model.id.desc()).limit(limit + 1).all()
+        rows.extend((request_type, req) for req in requests)
+
+    rows.sort(key=lambda row: (row[1].created_at, -INBOX_TYPE_RANKS[row[0]], row[1].id), reverse=True)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = []
+    for request_type, req in rows:
+        item = ApprovalInboxItem(request_type=request_type, request_id=req.id, created_at=req.created_at)
+        if request_type == "transfer":
+            item.transfer = TransferRequestResponse.model_validate(req)
+        elif request_type == "return":
+            item.return_request = ReturnRequestResponse.model_validate(req)
+        else:
+            item.edit_request = build_edit_request_response(req)
+        items.append(item)
+        last_ids[request_type] = req.id
+
+    next_cursor = encode_inbox_cursor(last_ids) if has_more else None
+
+    return ApprovalInboxResponse(
+        counts=counts,
+        total=sum(counts.values()),
+        items=items,
+        next_cursor=next_cursor
+    )
@@ -3,6 +3,7 @@
 """
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import insert
 from typing import List, Optional
 import json
 from database import get_db
@@ -62,6 +63,30 @@ def create_history_record(
     return history
 
 
+def create_history_records(db: Session, records: List[dict]):
+    """
+    批量创建资产流转记录（一条INSERT语句）
+    records中每项的键与create_history_record的参数相同
+    """
+    if not records:
+        return
+    rows = [
+        {
+            "asset_id": record["asset_id"],
+            "action_type": record["action_type"],
+            "action_description": record.get("action_description"),
+            "operator_id": record.get("operator_id"),
+            "approver_id": record.get("approver_id"),
+            "old_value": json.dumps(record["old_value"], ensure_ascii=False) if record.get("old_value") else None,
+            "new_value": json.dumps(record["new_value"], ensure_ascii=False) if record.get("new_value") else None,
+            "related_request_id": record.get("related_request_id"),
+            "related_request_type": record.get("related_request_type")
+        }
+        for record in records
+    ]
+    db.execute(insert(AssetHistory), rows)
+
+
 @router.get("/asset/{asset_id}", response_model=List[AssetHistoryResponse])
 async def get_asset_history(
     asset_id: int,
@@ -2,18 +2,21 @@
 资产管理路由
 包括资产的增删改查、批量导入等
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+from sqlalchemy import or_, select
+from typing import List, Optional, Tuple
 from database import get_db
-from models import Asset, AssetCategory, User, TaskAsset
-from schemas import AssetCreate, AssetUpdate, AssetResponse, ImportResponse
+from models import Asset, AssetCategory, User
+from ownership import OwnershipChangeSet
+from schemas import AssetCreate, AssetUpdate, AssetResponse, AssetListItem, ImportResponse
 from auth import get_current_user
 import pandas as pd
 import io
 from fastapi.responses import StreamingResponse
 from logger import logger
+from cache import reference_cache, table_etag, not_modified_response, set_etag_headers
+from serialization import list_response, partial_model
 # 延迟导入避免循环依赖
 def get_create_history_record():
     from routers import asset_history
@@ -22,39 +25,45 @@ from datetime import datetime
 
 router = APIRouter()
 
+# 资产列表精简行各字段对应的列（大类、使用人名称来自联表）
+ASSET_LIST_COLUMNS = {
+    name: getattr(Asset, name) for name in AssetListItem.model_fields
+    if name not in ("category_name", "user_name", "user_ehr")
+}
+ASSET_LIST_COLUMNS.update({
+    "category_name": AssetCategory.name,
+    "user_name": User.real_name,
+    "user_ehr": User.ehr_number,
+})
 
-@router.get("/", response_model=List[AssetResponse])
-async def get_assets(
-    skip: int = 0,
-    limit: int = 100,
+
+def asset_list_conditions(
+    current_user: User,
     asset_number: Optional[str] = None,
     category_id: Optional[int] = None,
     status: Optional[str] = None,
     user_id: Optional[int] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """获取资产列表，支持筛选"""
+    search: Optional[str] = None
+) -> list:
+    """资产列表的筛选条件（search 条件引用大类和使用人表，调用方需外连接这两张表）"""
     # 只查询未删除的资产
-    query = db.query(Asset).filter(Asset.deleted_at.is_(None))
+    conditions = [Asset.deleted_at.is_(None)]
     
     # 管理员可以筛选指定用户的资产
     if user_id is not None:
         if current_user.role != "admin":
             raise HTTPException(status_code=403, detail="仅管理员可按使用人筛选资产")
-        query = query.filter(Asset.user_id == user_id)
+        conditions.append(Asset.user_id == user_id)
     
     if asset_number:
-        query = query.filter(Asset.asset_number.contains(asset_number))
+        conditions.append(Asset.asset_number.contains(asset_number))
     if category_id:
-        query = query.filter(Asset.category_id == category_id)
+        conditions.append(Asset.category_id == category_id)
     if status:
-        query = query.filter(Asset.status == status)
+        conditions.append(Asset.status == status)
     if search:
-        query = query.outerjoin(AssetCategory, Asset.category).outerjoin(User, Asset.user)
         like_value = f"%{search}%"
-        query = query.filter(
+        conditions.append(
             or_(
                 Asset.asset_number.ilike(like_value),
                 Asset.name.ilike(like_value),
@@ -72,9 +81,91 @@ async def get_assets(
                 User.ehr_number.ilike(like_value)
             )
         )
+    return conditions
+
+
+def parse_asset_list_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """解析 fields 参数（逗号分隔），按精简行的字段顺序返回；为空时返回全部字段"""
+    all_fields = tuple(AssetListItem.model_fields)
+    requested = {field.strip() for field in (fields or "").split(",") if field.strip()}
+    if not requested:
+        return all_fields
+    unknown = sorted(requested.difference(all_fields))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支持的字段: {', '.join(unknown)}，可选字段: {', '.join(all_fields)}")
+    return tuple(field for field in all_fields if field in requested)
+
+
+@router.get("/", response_model=List[AssetResponse])
+async def get_assets(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    asset_number: Optional[str] = None,
+    category_id: Optional[int] = None,
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    search: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取资产列表，支持筛选和ETag协商缓存"""
+    # 资产列表包含大类和使用人信息，三张表任一变化都会使ETag变化
+    etag = table_etag("assets", ("assets", "asset_categories", "users"), request, current_user)
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    set_etag_headers(response, etag)
+
+    query = db.query(Asset)
+    if search:
+        query = query.outerjoin(AssetCategory, Asset.category).outerjoin(User, Asset.user)
+    query = query.filter(*asset_list_conditions(current_user, asset_number, category_id, status, user_id, search))
     
     assets = query.offset(skip).limit(limit).all()
-    return [AssetResponse.model_validate(asset) for asset in assets]
+    return list_response(AssetResponse, assets, response)
+
+
+@router.get("/list", response_model=List[AssetListItem])
+async def get_asset_list(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    asset_number: Optional[str] = None,
+    category_id: Optional[int] = None,
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    search: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="返回的字段，多个以逗号分隔；为空则返回全部字段"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取资产列表精简行（筛选条件同资产列表），支持ETag协商缓存
+    大类、使用人只返回名称和EHR号，一条联表select()只查询所需的列
+    """
+    selected = parse_asset_list_fields(fields)
+    etag = table_etag("assets_list", ("assets", "asset_categories", "users"), request, current_user)
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    set_etag_headers(response, etag)
+
+    stmt = select(*[ASSET_LIST_COLUMNS[field].label(field) for field in selected]).select_from(Asset)
+    # 只在需要大类、使用人的列或按关键词搜索时联表
+    if search or "category_name" in selected:
+        stmt = stmt.outerjoin(AssetCategory, Asset.category_id == AssetCategory.id)
+    if search or "user_name" in selected or "user_ehr" in selected:
+        stmt = stmt.outerjoin(User, Asset.user_id == User.id)
+    stmt = stmt.where(
+        *asset_list_conditions(current_user, asset_number, category_id, status, user_id, search)
+    ).order_by(Asset.id).offset(skip).limit(limit)
+
+    rows = db.execute(stmt).all()
+    model = AssetListItem if len(selected) == len(AssetListItem.model_fields) else partial_model(AssetListItem, selected)
+    return list_response(model, rows, response)
 
 
 @router.get("/export")
@@ -377,28 +468,14 @@ async def update_asset(
             asset.user_group = user.group
     
     # 处理安全检查任务
+    changes = OwnershipChangeSet()
     # 如果修改了使用人，更新未完成的安全检查任务到新接收人
     if "user_id" in changed_fields and asset_data.user_id is not None and asset_data.user_id != old_user_id:
-        pending_task_assets = db.query(TaskAsset).filter(
-            TaskAsset.asset_id == asset.id,
-            TaskAsset.status == "pending"
-        ).all()
-        
-        new_user = db.query(User).filter(User.id == asset_data.user_id).first()
-        for task_asset in pending_task_assets:
-            task_asset.assigned_user_id = asset_data.user_id
-            logger.info(f"资产编辑：安全检查任务资产关联ID {task_asset.id} 已更新到新接收人 {new_user.real_name if new_user else ''}")
+        changes.reassign(asset.id, asset_data.user_id)
     
     # 如果状态改为"库存备用"，将未完成的安全检查任务标记为已退库
     if "status" in changed_fields and asset.status == "库存备用":
-        pending_task_assets = db.query(TaskAsset).filter(
-            TaskAsset.asset_id == asset.id,
-            TaskAsset.status == "pending"
-        ).all()
-        
-        for task_asset in pending_task_assets:
-            task_asset.status = "returned"  # 标记为已退库
-            logger.info(f"资产编辑：安全检查任务资产关联ID {task_asset.id} 已标记为已退库")
+        changes.mark_returned(asset.id)
     
     # 记录编辑历史
     if changed_fields:
@@ -412,21 +489,17 @@ async def update_asset(
             field_labels = changed_fields
         
         logger.info(f"管理员 {current_user.ehr_number}({current_user.real_name}) 编辑资产: {asset.asset_number} - {asset.name}, 修改字段: {', '.join(field_labels)}")
-        try:
-            create_history = get_create_history_record()
-            new_values = {field: getattr(asset, field) for field in changed_fields}
-            create_history(
-                db=db,
-                asset_id=asset.id,
-                action_type="edit",
-                action_description=f"编辑资产：修改了 {', '.join(field_labels)}",
-                operator_id=current_user.id,
-                old_value={k: old_values.get(k) for k in changed_fields if k in old_values},
-                new_value=new_values
-            )
-        except Exception as e:
-            logger.error(f"记录编辑历史失败: {e}", exc_info=True)
+        new_values = {field: getattr(asset, field) for field in changed_fields}
+        changes.add_history(
+            asset_id=asset.id,
+            action_type="edit",
+            action_description=f"编辑资产：修改了 {', '.join(field_labels)}",
+            operator_id=current_user.id,
+            old_value={k: old_values.get(k) for k in changed_fields if k in old_values},
+            new_value=new_values
+        )
     
+    changes.apply(db)
     db.commit()
     db.refresh(asset)
     return AssetResponse.model_validate(asset)
@@ -641,6 +714,8 @@ async def import_assets(
                 })
         
         db.commit()
+        # 导入时可能自动创建了资产大类
+        reference_cache.invalidate(reference_cache.CATEGORIES)
         
         # 限制返回的错误数量
         max_errors = 100
@@ -1,25 +1,32 @@
 """
 资产大类管理路由
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
 from models import AssetCategory
 from schemas import AssetCategoryCreate, AssetCategoryResponse
 from auth import get_current_user
+from cache import reference_cache, not_modified_response, set_etag_headers
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[AssetCategoryResponse])
 async def get_categories(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """获取所有资产大类"""
-    categories = db.query(AssetCategory).all()
-    return [AssetCategoryResponse.model_validate(cat) for cat in categories]
+    """获取所有资产大类（进程内缓存，支持ETag协商缓存）"""
+    etag = reference_cache.etag(reference_cache.CATEGORIES)
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    set_etag_headers(response, etag)
+    return reference_cache.get_categories(db)
 
 
 @router.post("/", response_model=AssetCategoryResponse)
@@ -37,5 +44,6 @@ async def create_category(
     db_category = AssetCategory(name=category_data.name)
     db.add(db_category)
     db.commit()
+    reference_cache.invalidate(reference_cache.CATEGORIES)
     db.refresh(db_category)
     return AssetCategoryResponse.model_validate(db_category)
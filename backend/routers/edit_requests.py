@@ -2,7 +2,7 @@
 资产编辑申请路由
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import or_
 from typing import List, Optional
 import json
@@ -18,6 +18,33 @@ def get_create_history_record():
 
 router = APIRouter()
 
+# 编辑申请响应中嵌套对象（资产及其大类、使用人，申请人，审批人）的预加载策略
+EDIT_REQUEST_LOAD_OPTIONS = (
+    selectinload(AssetEditRequest.asset).selectinload(Asset.category),
+    selectinload(AssetEditRequest.asset).selectinload(Asset.user),
+    selectinload(AssetEditRequest.user),
+    selectinload(AssetEditRequest.approver),
+)
+
+
+def build_edit_request_response(req: AssetEditRequest) -> AssetEditRequestResponse:
+    """构造编辑申请响应，处理edit_data的JSON解析"""
+    return AssetEditRequestResponse(
+        id=req.id,
+        asset_id=req.asset_id,
+        user_id=req.user_id,
+        status=req.status,
+        approver_id=req.approver_id,
+        approval_comment=req.approval_comment,
+        created_at=req.created_at,
+        updated_at=req.updated_at,
+        approved_at=req.approved_at,
+        edit_data=json.loads(req.edit_data) if req.edit_data else {},
+        asset=req.asset,
+        user=req.user,
+        approver=req.approver
+    )
+
 
 @router.get("/", response_model=List[AssetEditRequestResponse])
 async def get_edit_requests(
@@ -38,66 +65,30 @@ async def get_edit_requests(
     if status:
         query = query.filter(AssetEditRequest.status == status)
     
-    # 支持模糊搜索
+    # 支持模糊搜索（资产、用户条件为EXISTS子查询，与申请列表在同一条SQL中完成）
     if search:
-        # 先获取所有相关的资产ID
-        asset_results = db.query(Asset.id).filter(
-            or_(
-                Asset.asset_number.contains(search),
-                Asset.name.contains(search),
-                Asset.specification.contains(search)
-            )
-        ).all()
-        asset_ids = [row[0] for row in asset_results]
-        
-        # 获取匹配的用户ID
-        user_results = db.query(User.id).filter(
+        query = query.filter(
             or_(
-                User.real_name.contains(search),
-                User.ehr_number.contains(search)
+                AssetEditRequest.asset.has(
+                    or_(
+                        Asset.asset_number.contains(search),
+                        Asset.name.contains(search),
+                        Asset.specification.contains(search)
+                    )
+                ),
+                AssetEditRequest.user.has(
+                    or_(
+                        User.real_name.contains(search),
+                        User.ehr_number.contains(search)
+                    )
+                )
             )
-        ).all()
-        user_ids = [row[0] for row in user_results]
-        
-        # 构建搜索条件
-        search_conditions = []
-        
-        if asset_ids:
-            search_conditions.append(AssetEditRequest.asset_id.in_(asset_ids))
-        if user_ids:
-            search_conditions.append(AssetEditRequest.user_id.in_(user_ids))
-        
-        if search_conditions:
-            query = query.filter(or_(*search_conditions))
-    
-    # 使用joinedload预加载关联数据
-    requests = query.options(
-        joinedload(AssetEditRequest.asset),
-        joinedload(AssetEditRequest.user),
-        joinedload(AssetEditRequest.approver)
-    ).order_by(AssetEditRequest.created_at.desc()).offset(skip).limit(limit).all()
+        )
     
-    # 手动构造响应，处理edit_data的JSON解析
-    result = []
-    for req in requests:
-        req_dict = {
-            "id": req.id,
-            "asset_id": req.asset_id,
-            "user_id": req.user_id,
-            "status": req.status,
-            "approver_id": req.approver_id,
-            "approval_comment": req.approval_comment,
-            "created_at": req.created_at,
-            "updated_at": req.updated_at,
-            "approved_at": req.approved_at,
-            "edit_data": json.loads(req.edit_data) if req.edit_data else {},
-            "asset": req.asset,
-            "user": req.user,
-            "approver": req.approver
-        }
-        result.append(AssetEditRequestResponse(**req_dict))
+    # 预加载嵌套的关联数据
+    requests = query.options(*EDIT_REQUEST_LOAD_OPTIONS).order_by(AssetEditRequest.created_at.desc()).offset(skip).limit(limit).all()
     
-    return result
+    return [build_edit_request_response(req) for req in requests]
 
 
 @router.delete("/{request_id}")
@@ -150,11 +141,7 @@ async def get_edit_request(
     current_user: User = Depends(get_current_user)
 ):
     """获取指定编辑申请"""
-    request = db.query(AssetEditRequest).options(
-        joinedload(AssetEditRequest.asset),
-        joinedload(AssetEditRequest.user),
-        joinedload(AssetEditRequest.approver)
-    ).filter(AssetEditRequest.id == request_id).first()
+    request = db.query(AssetEditRequest).options(*EDIT_REQUEST_LOAD_OPTIONS).filter(AssetEditRequest.id == request_id).first()
     if not request:
         raise HTTPException(status_code=404, detail="编辑申请不存在")
     
@@ -162,22 +149,7 @@ async def get_edit_request(
     if current_user.role != "admin" and request.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权查看此申请")
     
-    req_dict = {
-        "id": request.id,
-        "asset_id": request.asset_id,
-        "user_id": request.user_id,
-        "status": request.status,
-        "approver_id": request.approver_id,
-        "approval_comment": request.approval_comment,
-        "created_at": request.created_at,
-        "updated_at": request.updated_at,
-        "approved_at": request.approved_at,
-        "edit_data": json.loads(request.edit_data) if request.edit_data else {},
-        "asset": request.asset,
-        "user": request.user,
-        "approver": request.approver
-    }
-    return AssetEditRequestResponse(**req_dict)
+    return build_edit_request_response(request)
 
 
 @router.post("/", response_model=AssetEditRequestResponse)
@@ -277,28 +249,8 @@ async def create_edit_request(
         logger.error(f"记录编辑申请历史失败: {e}", exc_info=True)
     
     db.commit()
-    db.refresh(db_request)
     
     # 重新加载关联数据
-    db_request = db.query(AssetEditRequest).options(
-        joinedload(AssetEditRequest.asset),
-        joinedload(AssetEditRequest.user),
-        joinedload(AssetEditRequest.approver)
-    ).filter(AssetEditRequest.id == db_request.id).first()
+    db_request = db.query(AssetEditRequest).options(*EDIT_REQUEST_LOAD_OPTIONS).filter(AssetEditRequest.id == db_request.id).first()
     
-    req_dict = {
-        "id": db_request.id,
-        "asset_id": db_request.asset_id,
-        "user_id": db_request.user_id,
-        "status": db_request.status,
-        "approver_id": db_request.approver_id,
-        "approval_comment": db_request.approval_comment,
-        "created_at": db_request.created_at,
-        "updated_at": db_request.updated_at,
-        "approved_at": db_request.approved_at,
-        "edit_data": json.loads(db_request.edit_data) if db_request.edit_data else {},
-        "asset": db_request.asset,
-        "user": db_request.user,
-        "approver": db_request.approver
-    }
-    return AssetEditRequestResponse(**req_dict)
+    return build_edit_request_response(db_request)
@@ -2,20 +2,35 @@
 资产退回仓库路由
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import or_, insert, exists
 from typing import List, Optional
 from database import get_db
 from models import ReturnRequest, Asset, User
-from schemas import ReturnRequestCreate, ReturnRequestResponse
+from schemas import ReturnRequestCreate, ReturnRequestResponse, ReturnBatchCreate, ReturnBatchResponse
 from auth import get_current_user
+from logger import logger
+from serialization import list_response
+import uuid
 # 延迟导入避免循环依赖
 def get_create_history_record():
     from routers import asset_history
     return asset_history.create_history_record
 
+def get_create_history_records():
+    from routers import asset_history
+    return asset_history.create_history_records
+
 router = APIRouter()
 
+# 退回申请响应中嵌套对象（资产及其大类、使用人，退回人，新保管人）的预加载策略
+RETURN_LOAD_OPTIONS = (
+    selectinload(ReturnRequest.asset).selectinload(Asset.category),
+    selectinload(ReturnRequest.asset).selectinload(Asset.user),
+    selectinload(ReturnRequest.user),
+    selectinload(ReturnRequest.new_user),
+)
+
 
 @router.get("/", response_model=List[ReturnRequestResponse])
 async def get_return_requests(
@@ -23,6 +38,7 @@ async def get_return_requests(
     limit: int = 100,
     status: Optional[str] = None,
     search: Optional[str] = Query(None, description="搜索关键词,支持模糊搜索所有字段"),
+    batch_id: Optional[str] = Query(None, description="批量退回批次号"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -35,52 +51,36 @@ async def get_return_requests(
     
     if status:
         query = query.filter(ReturnRequest.status == status)
+    if batch_id:
+        query = query.filter(ReturnRequest.batch_id == batch_id)
     
-    # 支持模糊搜索所有字段
+    # 支持模糊搜索所有字段（资产、用户条件为EXISTS子查询，与申请列表在同一条SQL中完成）
     if search:
-        # 先获取所有相关的资产ID
-        asset_results = db.query(Asset.id).filter(
-            or_(
-                Asset.asset_number.contains(search),
-                Asset.name.contains(search),
-                Asset.specification.contains(search),
-                Asset.mac_address.contains(search),
-                Asset.ip_address.contains(search),
-                Asset.office_location.contains(search),
-                Asset.floor.contains(search)
-            )
-        ).all()
-        asset_ids = [row[0] for row in asset_results]
-        
-        # 获取匹配的用户ID
-        user_results = db.query(User.id).filter(
+        asset_matches = or_(
+            Asset.asset_number.contains(search),
+            Asset.name.contains(search),
+            Asset.specification.contains(search),
+            Asset.mac_address.contains(search),
+            Asset.ip_address.contains(search),
+            Asset.office_location.contains(search),
+            Asset.floor.contains(search)
+        )
+        user_matches = or_(
+            User.real_name.contains(search),
+            User.ehr_number.contains(search),
+            User.group.contains(search)
+        )
+        query = query.filter(
             or_(
-                User.real_name.contains(search),
-                User.ehr_number.contains(search),
-                User.group.contains(search)
+                ReturnRequest.reason.contains(search),
+                ReturnRequest.asset.has(asset_matches),
+                ReturnRequest.user.has(user_matches)
             )
-        ).all()
-        user_ids = [row[0] for row in user_results]
-        
-        # 构建搜索条件
-        search_conditions = [ReturnRequest.reason.contains(search)]
-        
-        if asset_ids:
-            search_conditions.append(ReturnRequest.asset_id.in_(asset_ids))
-        if user_ids:
-            search_conditions.append(ReturnRequest.user_id.in_(user_ids))
-        
-        if search_conditions:
-            query = query.filter(or_(*search_conditions))
-    
-    # 使用joinedload预加载关联数据
-    requests = query.options(
-        joinedload(ReturnRequest.asset),
-        joinedload(ReturnRequest.user),
-        joinedload(ReturnRequest.new_user),
-        joinedload(ReturnRequest.approver)
-    ).order_by(ReturnRequest.created_at.desc()).offset(skip).limit(limit).all()
-    return [ReturnRequestResponse.model_validate(req) for req in requests]
+        )
+    
+    # 预加载嵌套的关联数据
+    requests = query.options(*RETURN_LOAD_OPTIONS).order_by(ReturnRequest.created_at.desc()).offset(skip).limit(limit).all()
+    return list_response(ReturnRequestResponse, requests)
 
 
 @router.get("/{request_id}", response_model=ReturnRequestResponse)
@@ -90,12 +90,7 @@ async def get_return_request(
     current_user: User = Depends(get_current_user)
 ):
     """获取指定退回申请"""
-    request = db.query(ReturnRequest).options(
-        joinedload(ReturnRequest.asset),
-        joinedload(ReturnRequest.user),
-        joinedload(ReturnRequest.new_user),
-        joinedload(ReturnRequest.approver)
-    ).filter(ReturnRequest.id == request_id).first()
+    request = db.query(ReturnRequest).options(*RETURN_LOAD_OPTIONS).filter(ReturnRequest.id == request_id).first()
     if not request:
         raise HTTPException(status_code=404, detail="退回申请不存在")
     
@@ -216,12 +211,103 @@ async def create_return_request(
         logger.error(f"记录退回历史失败: {e}", exc_info=True)
     
     db.commit()
-    db.refresh(db_request)
     # 重新加载关联数据
-    db_request = db.query(ReturnRequest).options(
-        joinedload(ReturnRequest.asset),
-        joinedload(ReturnRequest.user),
-        joinedload(ReturnRequest.new_user),
-        joinedload(ReturnRequest.approver)
-    ).filter(ReturnRequest.id == db_request.id).first()
+    db_request = db.query(ReturnRequest).options(*RETURN_LOAD_OPTIONS).filter(ReturnRequest.id == db_request.id).first()
     return ReturnRequestResponse.model_validate(db_request)
+
+
+@router.post("/batch", response_model=ReturnBatchResponse)
+async def create_return_batch(
+    batch_data: ReturnBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量创建资产退回仓库申请（同一批次号）
+    资产、用户各用一条查询校验，任一资产不符合条件时整批不创建；
+    申请和流转记录批量插入，管理员可按批次号一次审批整批申请
+    """
+    asset_ids = list(dict.fromkeys(batch_data.asset_ids))
+    
+    # 一条查询加载所有资产，并标记是否已有待审批的退回申请
+    open_return = exists().where(
+        ReturnRequest.asset_id == Asset.id,
+        ReturnRequest.status == "pending"
+    )
+    rows = db.query(Asset, open_return.label("has_open_return")).filter(
+        Asset.id.in_(asset_ids),
+        Asset.deleted_at.is_(None)
+    ).all()
+    assets = {asset.id: (asset, has_open_return) for asset, has_open_return in rows}
+    
+    missing = [asset_id for asset_id in asset_ids if asset_id not in assets]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"资产不存在: {', '.join(map(str, missing))}")
+    
+    errors = []
+    for asset_id in asset_ids:
+        asset, has_open_return = assets[asset_id]
+        if asset.status != "在用":
+            errors.append(f"{asset.asset_number}: 只能退回在用状态的资产")
+        elif current_user.role != "admin" and asset.user_id != current_user.id:
+            errors.append(f"{asset.asset_number}: 只能退回自己名下的资产")
+        elif has_open_return:
+            errors.append(f"{asset.asset_number}: 已有待审批的退回申请")
+    if errors:
+        raise HTTPException(status_code=400, detail="；".join(errors))
+    
+    # 一条查询加载所有退回人
+    user_ids = {asset.user_id or current_user.id for asset, _ in assets.values()}
+    users = {user.id: user for user in db.query(User).filter(User.id.in_(user_ids)).all()}
+    
+    # 批量插入退回申请（不修改资产字段，审批通过后资产退回仓库用户）
+    batch_id = uuid.uuid4().hex
+    request_rows = [
+        {
+            "asset_id": asset_id,
+            "user_id": assets[asset_id][0].user_id or current_user.id,
+            "reason": batch_data.reason,
+            "status": "pending",
+            "batch_id": batch_id
+        }
+        for asset_id in asset_ids
+    ]
+    # 每项资产在批次中只有一条申请，按资产ID对应返回的申请ID
+    request_ids = dict(db.execute(
+        insert(ReturnRequest).returning(ReturnRequest.asset_id, ReturnRequest.id),
+        request_rows
+    ).all())
+    
+    logger.info(f"用户 {current_user.ehr_number}({current_user.real_name}) 批量创建资产退回申请: {len(request_ids)} 项资产, 批次号 {batch_id}")
+    
+    # 批量记录退回申请历史
+    try:
+        history_records = []
+        for row in request_rows:
+            asset, _ = assets[row["asset_id"]]
+            return_user = users.get(row["user_id"])
+            return_user_name = return_user.real_name if return_user else ""
+            history_records.append({
+                "asset_id": row["asset_id"],
+                "action_type": "return",
+                "action_description": f"申请资产退回仓库:退回人 {return_user_name},修改内容:无修改",
+                "operator_id": current_user.id,
+                "old_value": {"user_id": row["user_id"], "user_name": return_user_name, "status": asset.status},
+                "new_value": {"user_id": None, "status": "库存备用"},
+                "related_request_id": request_ids[row["asset_id"]],
+                "related_request_type": "return"
+            })
+        get_create_history_records()(db, history_records)
+    except Exception as e:
+        logger.error(f"记录退回历史失败: {e}", exc_info=True)
+    
+    db.commit()
+    
+    requests = db.query(ReturnRequest).options(*RETURN_LOAD_OPTIONS).filter(
+        ReturnRequest.batch_id == batch_id
+    ).order_by(ReturnRequest.id).all()
+    return ReturnBatchResponse(
+        batch_id=batch_id,
+        count=len(requests),
+        requests=[ReturnRequestResponse.model_validate(req) for req in requests]
+    )
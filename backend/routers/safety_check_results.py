@@ -3,16 +3,22 @@
 普通用户提交检查结果
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, update, insert, func, case
+from typing import Dict, List, Optional
 from datetime import datetime
 from database import get_db
 from models import (
-    TaskAsset, SafetyCheckTask, SafetyCheckType, SafetyCheckHistory, Asset, User
+    TaskAsset, SafetyCheckTask, SafetyCheckHistory, Asset, User
 )
 from schemas import (
-    SafetyCheckResultSubmit, SafetyCheckHistoryResponse, TaskAssetResponse
+    SafetyCheckResultSubmit, SafetyCheckHistoryResponse, TaskAssetResponse,
+    BatchSafetyCheckResultSubmit, BatchSafetyCheckResultItem, BatchSafetyCheckResultResponse,
+    AssetComplianceSummary, AssetResponse, UserResponse
 )
+from cache import reference_cache, CheckTypeValidator, CHECK_RESULT_VALUES
+from check_item_results import build_item_result_rows, write_item_results
+from task_counters import STATUS_COUNTER_COLUMNS, OPEN_TASK_ASSET_STATUSES, shift_task_counters
 from auth import get_current_user
 import json
 
@@ -22,60 +28,81 @@ router = APIRouter()
 @router.get("/my-tasks", response_model=dict)
 async def get_my_tasks(
     status: Optional[str] = Query(None, description="状态筛选：pending/checked"),
+    cursor: Optional[int] = Query(None, description="游标：上一页返回的next_cursor"),
+    limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取我的待检查任务"""
-    query = db.query(SafetyCheckTask).join(TaskAsset).filter(
+    """
+    获取我的待检查任务（按任务创建顺序倒序，游标分页）
+    一条聚合查询返回整页任务及当前用户在各任务中的待检查/已检查资产数（排除已退库的资产）
+    """
+    # 已逾期的资产仍需检查，计入待检查
+    pending_sum = func.sum(case((TaskAsset.status.in_(OPEN_TASK_ASSET_STATUSES), 1), else_=0))
+    checked_sum = func.sum(case((TaskAsset.status == "checked", 1), else_=0))
+    my_task_assets = (
         TaskAsset.assigned_user_id == current_user.id,
+        TaskAsset.status != "returned",  # 排除已退库的资产
         SafetyCheckTask.status != "cancelled"
-    ).distinct()
+    )
     
-    if status:
-        if status == "pending":
-            query = query.filter(TaskAsset.status == "pending")
-        elif status == "checked":
-            query = query.filter(TaskAsset.status == "checked")
+    query = db.query(
+        SafetyCheckTask.id,
+        SafetyCheckTask.task_number,
+        SafetyCheckTask.title,
+        SafetyCheckTask.check_type_id,
+        SafetyCheckTask.deadline,
+        pending_sum.label("pending_count"),
+        checked_sum.label("checked_count")
+    ).join(TaskAsset, TaskAsset.task_id == SafetyCheckTask.id).filter(*my_task_assets)
+    if cursor is not None:
+        query = query.filter(SafetyCheckTask.id < cursor)
+    query = query.group_by(SafetyCheckTask.id)
     
-    tasks = query.order_by(SafetyCheckTask.created_at.desc()).all()
+    if status == "pending":
+        query = query.having(pending_sum > 0)
+    elif status == "checked":
+        query = query.having(checked_sum > 0)
     
-    items = []
-    for task in tasks:
-        # 统计当前用户在此任务中的资产数量（排除已退库的）
-        my_assets = db.query(TaskAsset).filter(
-            TaskAsset.task_id == task.id,
-            TaskAsset.assigned_user_id == current_user.id,
-            TaskAsset.status != "returned"  # 排除已退库的资产
-        ).all()
-        
-        pending_count = len([ta for ta in my_assets if ta.status == "pending"])
-        
-        # 获取检查类型信息
-        check_type = db.query(SafetyCheckType).filter(SafetyCheckType.id == task.check_type_id).first()
-        check_type_dict = None
-        if check_type:
-            from schemas import SafetyCheckTypeResponse
-            check_type_dict = SafetyCheckTypeResponse.model_validate(check_type).model_dump()
-            if check_type.check_items:
-                try:
-                    check_type_dict["check_items"] = json.loads(check_type.check_items)
-                except:
-                    check_type_dict["check_items"] = []
-            else:
-                check_type_dict["check_items"] = []
-        
-        items.append({
-            "task_id": task.id,
-            "task_number": task.task_number,
-            "task_title": task.title,
-            "check_type": check_type_dict,
-            "pending_count": pending_count,
-            "deadline": task.deadline
-        })
+    # 任务ID与创建顺序一致，按ID倒序分页
+    rows = query.order_by(SafetyCheckTask.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    # 符合筛选条件的任务总数和全部待检查资产数（一条查询）
+    totals = db.query(
+        func.count(func.distinct(TaskAsset.task_id)).label("all_tasks"),
+        func.count(func.distinct(case((TaskAsset.status.in_(OPEN_TASK_ASSET_STATUSES), TaskAsset.task_id)))).label("pending_tasks"),
+        func.count(func.distinct(case((TaskAsset.status == "checked", TaskAsset.task_id)))).label("checked_tasks"),
+        pending_sum.label("pending_total")
+    ).join(SafetyCheckTask, TaskAsset.task_id == SafetyCheckTask.id).filter(*my_task_assets).one()
+    total = {"pending": totals.pending_tasks, "checked": totals.checked_tasks}.get(status, totals.all_tasks)
+    
+    # 检查类型信息（引用数据缓存，check_items已解析），每种类型只序列化一次
+    check_types = {}
+    for check_type_id in {row.check_type_id for row in rows}:
+        check_type = reference_cache.get_check_type(db, check_type_id)
+        check_types[check_type_id] = check_type.model_dump() if check_type else None
+    
+    items = [
+        {
+            "task_id": row.id,
+            "task_number": row.task_number,
+            "task_title": row.title,
+            "check_type": check_types[row.check_type_id],
+            "pending_count": int(row.pending_count or 0),
+            "checked_count": int(row.checked_count or 0),
+            "deadline": row.deadline
+        }
+        for row in rows
+    ]
     
     return {
-        "total": len(items),
-        "items": items
+        "total": total or 0,
+        "counts": {"pending": totals.pending_tasks or 0, "checked": totals.checked_tasks or 0},
+        "pending_total": int(totals.pending_total or 0),
+        "items": items,
+        "next_cursor": rows[-1].id if has_more else None
     }
 
 
@@ -132,19 +159,9 @@ async def get_task_assets_for_user(
             ta_dict["check_items_result"] = []
         assets.append(TaskAssetResponse(**ta_dict))
     
-    # 获取检查类型信息
-    check_type = db.query(SafetyCheckType).filter(SafetyCheckType.id == task.check_type_id).first()
-    check_type_dict = None
-    if check_type:
-        from schemas import SafetyCheckTypeResponse
-        check_type_dict = SafetyCheckTypeResponse.model_validate(check_type).model_dump()
-        if check_type.check_items:
-            try:
-                check_type_dict["check_items"] = json.loads(check_type.check_items)
-            except:
-                check_type_dict["check_items"] = []
-        else:
-            check_type_dict["check_items"] = []
+    # 获取检查类型信息（引用数据缓存，check_items已解析）
+    check_type = reference_cache.get_check_type(db, task.check_type_id)
+    check_type_dict = check_type.model_dump() if check_type else None
     
     return {
         "task": {
@@ -159,15 +176,15 @@ async def get_task_assets_for_user(
     }
 
 
-@router.post("/submit")
-async def submit_check_result(
+def validate_submission(
+    task_asset: Optional[TaskAsset],
+    task: Optional[SafetyCheckTask],
     result_data: SafetyCheckResultSubmit,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User,
+    validator: Optional[CheckTypeValidator]
 ):
-    """提交检查结果"""
+    """校验一条检查结果，不通过时抛出HTTPException，单条提交和批量提交共用"""
     # 验证任务资产关联是否存在
-    task_asset = db.query(TaskAsset).filter(TaskAsset.id == result_data.task_asset_id).first()
     if not task_asset:
         raise HTTPException(status_code=404, detail="任务资产关联不存在")
     
@@ -175,8 +192,10 @@ async def submit_check_result(
     if task_asset.assigned_user_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权提交此资产的检查结果")
     
+    if task_asset.status == "returned":
+        raise HTTPException(status_code=400, detail="资产已退库，无需提交检查结果")
+    
     # 验证任务状态
-    task = db.query(SafetyCheckTask).filter(SafetyCheckTask.id == task_asset.task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     
@@ -185,37 +204,26 @@ async def submit_check_result(
     if task.status == "cancelled":
         raise HTTPException(status_code=400, detail="任务已取消，无法提交检查结果")
     
+    allowed_results = validator.allowed_results if validator else CHECK_RESULT_VALUES
+    
     # 验证检查结果
-    if result_data.check_result not in ["yes", "no"]:
+    if result_data.check_result not in allowed_results:
         raise HTTPException(status_code=400, detail="检查结果必须是yes或no")
     
-    # 获取检查类型，验证必填项
-    check_type = db.query(SafetyCheckType).filter(SafetyCheckType.id == task.check_type_id).first()
-    if check_type and check_type.check_items:
-        try:
-            check_items = json.loads(check_type.check_items)
-            required_items = [item["item"] for item in check_items if item.get("required", False)]
-            submitted_items = [item.item for item in result_data.check_items_result]
-            
-            # 检查必填项是否都已提交
-            for required_item in required_items:
-                if required_item not in submitted_items:
-                    raise HTTPException(status_code=400, detail=f"必填检查项'{required_item}'未填写")
-        except json.JSONDecodeError:
-            pass
+    # 检查必填项是否都已提交
+    if validator:
+        missing_item = validator.first_missing_item({item.item for item in result_data.check_items_result})
+        if missing_item is not None:
+            raise HTTPException(status_code=400, detail=f"必填检查项'{missing_item}'未填写")
     
     # 验证检查项结果
     for item_result in result_data.check_items_result:
-        if item_result.result not in ["yes", "no"]:
+        if item_result.result not in allowed_results:
             raise HTTPException(status_code=400, detail="检查项结果必须是yes或no")
-    
-    # 更新任务资产关联记录
-    task_asset.status = "checked"
-    task_asset.check_result = result_data.check_result
-    task_asset.check_comment = result_data.check_comment
-    task_asset.checked_at = datetime.now()
-    
-    # 保存检查项结果
+
+
+def build_items_result(result_data: SafetyCheckResultSubmit, validator: Optional[CheckTypeValidator]) -> List[dict]:
+    """整理检查项结果（按检查类型中定义的顺序排列）"""
     items_result = [
         {
             "item": item.item,
@@ -224,6 +232,34 @@ async def submit_check_result(
         }
         for item in result_data.check_items_result
     ]
+    return validator.sort_items(items_result) if validator else items_result
+
+
+@router.post("/submit")
+async def submit_check_result(
+    result_data: SafetyCheckResultSubmit,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """提交检查结果"""
+    task_asset = db.query(TaskAsset).filter(TaskAsset.id == result_data.task_asset_id).first()
+    task = db.query(SafetyCheckTask).filter(SafetyCheckTask.id == task_asset.task_id).first() if task_asset else None
+    validator = reference_cache.get_check_type_validator(db, task.check_type_id) if task else None
+    validate_submission(task_asset, task, result_data, current_user, validator)
+    
+    # 更新任务资产关联记录，同时原子更新任务进度计数器
+    if task_asset.status != "checked":
+        if task_asset.status in STATUS_COUNTER_COLUMNS:
+            old_counter = STATUS_COUNTER_COLUMNS[task_asset.status]
+            setattr(task, old_counter, getattr(SafetyCheckTask, old_counter) - 1)
+        task.checked_count = SafetyCheckTask.checked_count + 1
+    task_asset.status = "checked"
+    task_asset.check_result = result_data.check_result
+    task_asset.check_comment = result_data.check_comment
+    task_asset.checked_at = datetime.now()
+    
+    # 保存检查项结果
+    items_result = build_items_result(result_data, validator)
     task_asset.set_check_items_result(items_result)
     
     db.flush()
@@ -241,15 +277,18 @@ async def submit_check_result(
     )
     history.set_check_items_result(items_result)
     db.add(history)
+    db.flush()
+    
+    # 规范化写入各检查项结果
+    write_item_results(db, build_item_result_rows(
+        history.id, task.id, task_asset.asset_id, task.check_type_id,
+        current_user.id, current_user.group, history.checked_at, items_result
+    ))
     
     # 检查任务是否全部完成（排除已退库的资产）
     # 只有当所有非退库的资产都完成时，任务才算完成
-    pending_count = db.query(TaskAsset).filter(
-        TaskAsset.task_id == task.id,
-        TaskAsset.status == "pending"
-    ).count()
-    
-    if pending_count == 0:
+    db.flush()
+    if task.pending_count == 0 and task.overdue_count == 0:
         task.status = "completed"
         task.completed_at = datetime.now()
     
@@ -258,6 +297,157 @@ async def submit_check_result(
     return {"message": "检查结果提交成功"}
 
 
+@router.post("/batch-submit", response_model=BatchSafetyCheckResultResponse)
+async def batch_submit_check_results(
+    batch_data: BatchSafetyCheckResultSubmit,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量提交检查结果
+    一次性加载任务资产和任务，使用缓存的检查类型校验器逐条校验（失败的条目不影响其他条目），
+    通过校验的条目批量更新任务资产、批量写入检查历史和检查项结果，并在整批结束后统一判断任务是否完成
+    """
+    task_asset_ids = {item.task_asset_id for item in batch_data.items}
+    task_assets = {
+        ta.id: ta for ta in db.query(TaskAsset).filter(TaskAsset.id.in_(task_asset_ids)).all()
+    }
+    task_ids = {ta.task_id for ta in task_assets.values()}
+    tasks = {
+        task.id: task for task in db.query(SafetyCheckTask).filter(SafetyCheckTask.id.in_(task_ids)).all()
+    } if task_ids else {}
+    validators: Dict[int, Optional[CheckTypeValidator]] = {}
+    
+    results = []
+    accepted = []
+    submitted_ids = set()
+    for item in batch_data.items:
+        task_asset = task_assets.get(item.task_asset_id)
+        task = tasks.get(task_asset.task_id) if task_asset else None
+        try:
+            if item.task_asset_id in submitted_ids:
+                raise HTTPException(status_code=400, detail="同一资产在本批中重复提交")
+            if task and task.check_type_id not in validators:
+                validators[task.check_type_id] = reference_cache.get_check_type_validator(db, task.check_type_id)
+            validate_submission(
+                task_asset, task, item, current_user,
+                validators[task.check_type_id] if task else None
+            )
+        except HTTPException as e:
+            results.append(BatchSafetyCheckResultItem(task_asset_id=item.task_asset_id, success=False, message=e.detail))
+            continue
+        submitted_ids.add(item.task_asset_id)
+        accepted.append((task_asset, task, item))
+        results.append(BatchSafetyCheckResultItem(task_asset_id=item.task_asset_id, success=True, message="检查结果提交成功"))
+    
+    completed_task_ids: List[int] = []
+    if accepted:
+        now = datetime.now()
+        accepted_filter = TaskAsset.id.in_([task_asset.id for task_asset, _, _ in accepted])
+        
+        # 先调整任务进度计数器，再批量更新任务资产
+        for from_status in OPEN_TASK_ASSET_STATUSES:
+            shift_task_counters(db, from_status, "checked", accepted_filter)
+        
+        task_asset_rows = []
+        history_rows = []
+        items_results = []
+        for task_asset, task, item in accepted:
+            items_result = build_items_result(item, validators[task.check_type_id])
+            items_results.append(items_result)
+            items_json = json.dumps(items_result, ensure_ascii=False) if items_result else None
+            task_asset_rows.append({
+                "id": task_asset.id,
+                "status": "checked",
+                "check_result": item.check_result,
+                "check_comment": item.check_comment,
+                "check_items_result": items_json,
+                "checked_at": now
+            })
+            history_rows.append({
+                "task_id": task.id,
+                "task_asset_id": task_asset.id,
+                "asset_id": task_asset.asset_id,
+                "check_type_id": task.check_type_id,
+                "checked_by_id": current_user.id,
+                "check_result": item.check_result,
+                "check_comment": item.check_comment,
+                "check_items_result": items_json,
+                "checked_at": now
+            })
+        db.execute(update(TaskAsset), task_asset_rows)
+        # 同一批中每个任务资产只有一条检查历史，按任务资产ID对应返回的历史记录ID
+        history_ids = dict(db.execute(
+            insert(SafetyCheckHistory).returning(SafetyCheckHistory.task_asset_id, SafetyCheckHistory.id),
+            history_rows
+        ).all())
+        
+        # 规范化写入各检查项结果
+        item_rows = []
+        for (task_asset, task, _), items_result in zip(accepted, items_results):
+            item_rows.extend(build_item_result_rows(
+                history_ids[task_asset.id], task.id, task_asset.asset_id, task.check_type_id,
+                current_user.id, current_user.group, now, items_result
+            ))
+        write_item_results(db, item_rows)
+        
+        # 整批结束后统一判断任务是否完成
+        touched_task_ids = {task.id for _, task, _ in accepted}
+        completed_task_ids = list(db.execute(
+            select(SafetyCheckTask.id).where(
+                SafetyCheckTask.id.in_(touched_task_ids),
+                SafetyCheckTask.pending_count == 0,
+                SafetyCheckTask.overdue_count == 0,
+                SafetyCheckTask.status.notin_(["completed", "cancelled"])
+            )
+        ).scalars())
+        if completed_task_ids:
+            db.execute(
+                update(SafetyCheckTask)
+                .where(SafetyCheckTask.id.in_(completed_task_ids))
+                .values(status="completed", completed_at=now)
+                .execution_options(synchronize_session="fetch")
+            )
+        db.commit()
+    
+    success_count = len(accepted)
+    return BatchSafetyCheckResultResponse(
+        success_count=success_count,
+        error_count=len(results) - success_count,
+        completed_task_ids=sorted(completed_task_ids),
+        results=results
+    )
+
+
+def get_asset_compliance_summary(db: Session, asset_id: int) -> AssetComplianceSummary:
+    """
+    资产合规汇总：一条聚合查询统计检查次数和合格次数，
+    再按 (asset_id, checked_at) 索引取最近一次检查的结果和不合格检查项数
+    """
+    totals = db.query(
+        func.count(SafetyCheckHistory.id).label("total_checks"),
+        func.sum(case((SafetyCheckHistory.check_result == "yes", 1), else_=0)).label("passed_checks")
+    ).filter(SafetyCheckHistory.asset_id == asset_id).one()
+    summary = AssetComplianceSummary(total_checks=totals.total_checks, passed_checks=totals.passed_checks or 0)
+    if not summary.total_checks:
+        return summary
+    
+    summary.pass_rate = round(summary.passed_checks / summary.total_checks, 4)
+    last = db.query(
+        SafetyCheckHistory.checked_at, SafetyCheckHistory.check_result, SafetyCheckHistory.check_items_result
+    ).filter(SafetyCheckHistory.asset_id == asset_id).order_by(
+        SafetyCheckHistory.checked_at.desc(), SafetyCheckHistory.id.desc()
+    ).first()
+    summary.last_checked_at = last.checked_at
+    summary.last_result = last.check_result
+    try:
+        last_items = json.loads(last.check_items_result) if last.check_items_result else []
+    except ValueError:
+        last_items = []
+    summary.failed_items_count = sum(1 for item in last_items if item.get("result") == "no")
+    return summary
+
+
 @router.get("/asset/{asset_id}/history", response_model=dict)
 async def get_asset_check_history(
     asset_id: int,
@@ -266,9 +456,14 @@ async def get_asset_check_history(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取资产检查历史"""
+    """
+    获取资产检查历史及合规汇总
+    整页检查记录连同任务编号、检查人用一条关联查询加载，检查类型取自引用数据缓存
+    """
     # 验证资产是否存在
-    asset = db.query(Asset).filter(Asset.id == asset_id).first()
+    asset = db.query(Asset).options(
+        joinedload(Asset.category), joinedload(Asset.user)
+    ).filter(Asset.id == asset_id).first()
     if not asset:
         raise HTTPException(status_code=404, detail="资产不存在")
     
@@ -276,44 +471,45 @@ async def get_asset_check_history(
     if current_user.role != "admin" and asset.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权查看此资产的检查历史")
     
-    # 查询检查历史
-    query = db.query(SafetyCheckHistory).filter(SafetyCheckHistory.asset_id == asset_id)
-    total = query.count()
+    summary = get_asset_compliance_summary(db, asset_id)
     
-    histories = query.order_by(SafetyCheckHistory.checked_at.desc()).offset((page - 1) * limit).limit(limit).all()
+    rows = db.query(SafetyCheckHistory, SafetyCheckTask.task_number).outerjoin(
+        SafetyCheckTask, SafetyCheckHistory.task_id == SafetyCheckTask.id
+    ).options(
+        joinedload(SafetyCheckHistory.checked_by)
+    ).filter(
+        SafetyCheckHistory.asset_id == asset_id
+    ).order_by(
+        SafetyCheckHistory.checked_at.desc(), SafetyCheckHistory.id.desc()
+    ).offset((page - 1) * limit).limit(limit).all()
     
+    asset_response = AssetResponse.model_validate(asset)
     items = []
-    for history in histories:
-        # 获取任务编号
-        task = db.query(SafetyCheckTask).filter(SafetyCheckTask.id == history.task_id).first()
-        task_number = task.task_number if task else None
-        
-        # 获取检查类型
-        check_type = db.query(SafetyCheckType).filter(SafetyCheckType.id == history.check_type_id).first()
-        check_type_dict = None
-        if check_type:
-            from schemas import SafetyCheckTypeResponse
-            check_type_dict = SafetyCheckTypeResponse.model_validate(check_type).model_dump()
-        
-        history_dict = SafetyCheckHistoryResponse.model_validate(history).model_dump()
-        history_dict["task_number"] = task_number
-        history_dict["check_type"] = check_type_dict
-        
-        # 解析检查项结果
-        if history.check_items_result:
-            try:
-                history_dict["check_items_result"] = json.loads(history.check_items_result)
-            except:
-                history_dict["check_items_result"] = []
-        else:
-            history_dict["check_items_result"] = []
-        
-        items.append(SafetyCheckHistoryResponse(**history_dict))
+    for history, task_number in rows:
+        items.append(SafetyCheckHistoryResponse(
+            id=history.id,
+            task_id=history.task_id,
+            task_asset_id=history.task_asset_id,
+            asset_id=history.asset_id,
+            check_type_id=history.check_type_id,
+            checked_by_id=history.checked_by_id,
+            check_result=history.check_result,
+            check_comment=history.check_comment,
+            check_items_result=history.get_check_items_result(),
+            checked_at=history.checked_at,
+            created_at=history.created_at,
+            task_number=task_number,
+            # 检查类型（引用数据缓存）
+            check_type=reference_cache.get_check_type(db, history.check_type_id),
+            asset=asset_response,
+            checked_by=UserResponse.model_validate(history.checked_by) if history.checked_by else None
+        ))
     
     return {
-        "total": total,
+        "total": summary.total_checks,
         "page": page,
         "limit": limit,
+        "summary": summary,
         "items": items
     }
 
@@ -0,0 +1,175 @@
+"""
+周期性安全检查计划管理路由
+仅管理员可以管理检查计划，任务由定时任务按计划自动生成
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import List, Optional
+from database import get_db
+from models import SafetyCheckSchedule, SafetyCheckScheduleRun, User
+from schemas import (
+    SafetyCheckScheduleCreate,
+    SafetyCheckScheduleUpdate,
+    SafetyCheckScheduleResponse,
+    TaskAssetCriteria
+)
+from auth import get_current_admin_user
+from cache import reference_cache
+from task_builder import criteria_is_empty
+from task_schedules import SCHEDULE_CADENCES, run_day_range
+
+router = APIRouter()
+
+
+def validate_schedule(db: Session, check_type_id: int, criteria: TaskAssetCriteria, cadence: str, run_day: int):
+    """校验检查计划的检查类型、资产筛选条件和周期"""
+    check_type = reference_cache.get_check_type(db, check_type_id)
+    if not check_type or not check_type.is_active:
+        raise HTTPException(status_code=404, detail="检查类型不存在或已停用")
+    if criteria_is_empty(criteria):
+        raise HTTPException(status_code=400, detail="请至少指定一个资产筛选条件")
+    if cadence not in SCHEDULE_CADENCES:
+        raise HTTPException(status_code=400, detail=f"不支持的周期: {cadence}，可选周期: {', '.join(SCHEDULE_CADENCES)}")
+    min_day, max_day = run_day_range(cadence)
+    if not min_day <= run_day <= max_day:
+        raise HTTPException(status_code=400, detail=f"生成日必须在{min_day}到{max_day}之间")
+
+
+def build_schedule_response(schedule: SafetyCheckSchedule, last_run: Optional[SafetyCheckScheduleRun] = None) -> SafetyCheckScheduleResponse:
+    """构造检查计划响应，解析criteria JSON"""
+    return SafetyCheckScheduleResponse(
+        id=schedule.id,
+        name=schedule.name,
+        check_type_id=schedule.check_type_id,
+        title=schedule.title,
+        description=schedule.description,
+        criteria=TaskAssetCriteria(**schedule.get_criteria()),
+        cadence=schedule.cadence,
+        run_day=schedule.run_day,
+        deadline_days=schedule.deadline_days,
+        is_active=schedule.is_active,
+        created_at=schedule.created_at,
+        updated_at=schedule.updated_at,
+        created_by_id=schedule.created_by_id,
+        last_period=last_run.period if last_run else None,
+        last_task_id=last_run.task_id if last_run else None
+    )
+
+
+@router.get("/", response_model=List[SafetyCheckScheduleResponse])
+async def get_schedules(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """获取所有检查计划（附带最近一次执行的周期和任务）"""
+    schedules = db.query(SafetyCheckSchedule).order_by(SafetyCheckSchedule.created_at.desc()).all()
+
+    # 各计划最近一次执行记录（一条查询）
+    latest_ids = db.query(func.max(SafetyCheckScheduleRun.id)).group_by(SafetyCheckScheduleRun.schedule_id)
+    last_runs = {
+        run.schedule_id: run
+        for run in db.query(SafetyCheckScheduleRun).filter(SafetyCheckScheduleRun.id.in_(latest_ids)).all()
+    }
+    return [build_schedule_response(schedule, last_runs.get(schedule.id)) for schedule in schedules]
+
+
+@router.post("/", response_model=SafetyCheckScheduleResponse)
+async def create_schedule(
+    schedule_data: SafetyCheckScheduleCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """创建检查计划"""
+    existing = db.query(SafetyCheckSchedule).filter(SafetyCheckSchedule.name == schedule_data.name).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="检查计划名称已存在")
+    validate_schedule(db, schedule_data.check_type_id, schedule_data.criteria, schedule_data.cadence, schedule_data.run_day)
+
+    schedule = SafetyCheckSchedule(
+        name=schedule_data.name,
+        check_type_id=schedule_data.check_type_id,
+        title=schedule_data.title,
+        description=schedule_data.description,
+        cadence=schedule_data.cadence,
+        run_day=schedule_data.run_day,
+        deadline_days=schedule_data.deadline_days,
+        is_active=schedule_data.is_active,
+        created_by_id=current_user.id
+    )
+    schedule.set_criteria(schedule_data.criteria.model_dump())
+    db.add(schedule)
+    db.commit()
+    db.refresh(schedule)
+
+    return build_schedule_response(schedule)
+
+
+@router.put("/{schedule_id}", response_model=SafetyCheckScheduleResponse)
+async def update_schedule(
+    schedule_id: int,
+    schedule_data: SafetyCheckScheduleUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """更新检查计划（已生成的任务不受影响）"""
+    schedule = db.query(SafetyCheckSchedule).filter(SafetyCheckSchedule.id == schedule_id).first()
+    if not schedule:
+        raise HTTPException(status_code=404, detail="检查计划不存在")
+
+    if schedule_data.name and schedule_data.name != schedule.name:
+        existing = db.query(SafetyCheckSchedule).filter(
+            SafetyCheckSchedule.name == schedule_data.name,
+            SafetyCheckSchedule.id != schedule_id
+        ).first()
+        if existing:
+            raise HTTPException(status_code=400, detail="检查计划名称已存在")
+        schedule.name = schedule_data.name
+
+    criteria = schedule_data.criteria or TaskAssetCriteria(**schedule.get_criteria())
+    validate_schedule(
+        db,
+        schedule_data.check_type_id or schedule.check_type_id,
+        criteria,
+        schedule_data.cadence or schedule.cadence,
+        schedule_data.run_day if schedule_data.run_day is not None else schedule.run_day
+    )
+
+    if schedule_data.check_type_id:
+        schedule.check_type_id = schedule_data.check_type_id
+    if schedule_data.title:
+        schedule.title = schedule_data.title
+    if schedule_data.description is not None:
+        schedule.description = schedule_data.description
+    if schedule_data.criteria is not None:
+        schedule.set_criteria(schedule_data.criteria.model_dump())
+    if schedule_data.cadence:
+        schedule.cadence = schedule_data.cadence
+    if schedule_data.run_day is not None:
+        schedule.run_day = schedule_data.run_day
+    if schedule_data.deadline_days is not None:
+        schedule.deadline_days = schedule_data.deadline_days
+    if schedule_data.is_active is not None:
+        schedule.is_active = schedule_data.is_active
+
+    db.commit()
+    db.refresh(schedule)
+
+    return build_schedule_response(schedule)
+
+
+@router.delete("/{schedule_id}")
+async def delete_schedule(
+    schedule_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """停用检查计划（保留执行记录，已生成的任务不受影响）"""
+    schedule = db.query(SafetyCheckSchedule).filter(SafetyCheckSchedule.id == schedule_id).first()
+    if not schedule:
+        raise HTTPException(status_code=404, detail="检查计划不存在")
+
+    schedule.is_active = False
+    db.commit()
+
+    return {"message": "检查计划已停用"}
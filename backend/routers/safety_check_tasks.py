@@ -3,33 +3,76 @@
 管理员可以创建和管理任务，普通用户可以查看分配给自己的任务
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
-from typing import List, Optional
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, and_, or_, case
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime
 from database import get_db
 from models import (
-    SafetyCheckTask, SafetyCheckType, TaskAsset, Asset, User
+    SafetyCheckTask, SafetyCheckType, TaskAsset, User
 )
 from schemas import (
     SafetyCheckTaskCreate, SafetyCheckTaskUpdate, SafetyCheckTaskResponse,
     TaskAssetResponse
 )
+from cache import reference_cache
+from task_numbers import next_task_number
+from task_builder import asset_selection_conditions, criteria_is_empty, count_selected_assets, materialize_task_assets
+from deadline_sweeper import reopen_overdue_task
 from auth import get_current_user, get_current_admin_user
 import json
 
 router = APIRouter()
 
+# 任务列表和详情的关联加载选项，避免逐条懒加载检查类型和创建人
+TASK_LOAD_OPTIONS = (
+    selectinload(SafetyCheckTask.check_type).selectinload(SafetyCheckType.created_by),
+    selectinload(SafetyCheckTask.created_by),
+)
+
+TASK_ASSET_STATUSES = ("pending", "checked", "overdue", "returned")
+
 
-def generate_task_number(db: Session) -> str:
-    """生成任务编号：SAFETY-YYYY-NNN"""
-    year = datetime.now().year
-    # 查询今年已有的任务数量
-    count = db.query(SafetyCheckTask).filter(
-        SafetyCheckTask.task_number.like(f"SAFETY-{year}-%")
-    ).count()
-    number = f"SAFETY-{year}-{str(count + 1).zfill(3)}"
-    return number
+def load_task_progress(db: Session, task_ids: Iterable[int], user_id: Optional[int] = None) -> Dict[int, Dict[str, int]]:
+    """
+    一条 GROUP BY task_id 查询统计一批任务中各状态的任务资产数量
+    指定user_id时只统计分配给该用户的任务资产
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return {}
+    query = db.query(
+        TaskAsset.task_id,
+        *[func.sum(case((TaskAsset.status == status, 1), else_=0)).label(status) for status in TASK_ASSET_STATUSES]
+    ).filter(TaskAsset.task_id.in_(task_ids))
+    if user_id is not None:
+        query = query.filter(TaskAsset.assigned_user_id == user_id)
+
+    progress = {task_id: {status: 0 for status in TASK_ASSET_STATUSES} for task_id in task_ids}
+    for row in query.group_by(TaskAsset.task_id).all():
+        progress[row.task_id] = {status: int(getattr(row, status) or 0) for status in TASK_ASSET_STATUSES}
+    return progress
+
+
+def apply_task_progress(task: SafetyCheckTask, task_dict: dict, progress: Optional[Dict[str, int]], is_admin: bool) -> bool:
+    """
+    将进度统计写入任务响应字典，返回任务是否已全部完成但状态尚未更新
+    管理员看全部资产统计（直接读取任务上的进度计数器），普通用户看自己的资产统计，
+    已退库的资产均不纳入进度统计
+    """
+    if is_admin:
+        # 总资产数 = 已完成 + 待检查（含已逾期，排除已退库的）
+        total_assets = task.checked_count + task.pending_count + task.overdue_count
+        task_dict["total_assets"] = total_assets
+        task_dict["completed_assets"] = task.checked_count
+        task_dict["pending_assets"] = task.pending_count + task.overdue_count
+        task_dict["overdue_assets"] = task.overdue_count
+        task_dict["returned_assets"] = task.returned_count
+        return total_assets > 0 and task.checked_count == total_assets and task.status != "completed"
+
+    task_dict["my_assets_count"] = progress["pending"] + progress["checked"] + progress["overdue"]
+    task_dict["my_completed_count"] = progress["checked"]
+    return False
 
 
 @router.post("/", response_model=SafetyCheckTaskResponse)
@@ -40,23 +83,29 @@ async def create_task(
 ):
     """创建安全检查任务（仅管理员）"""
     # 验证检查类型是否存在且启用
-    check_type = db.query(SafetyCheckType).filter(
-        SafetyCheckType.id == task_data.check_type_id,
-        SafetyCheckType.is_active == True
-    ).first()
-    if not check_type:
+    check_type = reference_cache.get_check_type(db, task_data.check_type_id)
+    if not check_type or not check_type.is_active:
         raise HTTPException(status_code=404, detail="检查类型不存在或已停用")
     
-    # 验证资产是否存在且未删除
-    assets = db.query(Asset).filter(
-        Asset.id.in_(task_data.asset_ids),
-        Asset.deleted_at.is_(None)
-    ).all()
-    if len(assets) != len(task_data.asset_ids):
+    # 资产选择：资产ID列表或服务端筛选条件，二选一
+    if (task_data.asset_ids is None) == (task_data.criteria is None):
+        raise HTTPException(status_code=400, detail="请提供资产ID列表或资产筛选条件（二选一）")
+    if task_data.criteria is not None and criteria_is_empty(task_data.criteria):
+        raise HTTPException(status_code=400, detail="请至少指定一个资产筛选条件")
+    conditions = asset_selection_conditions(task_data.asset_ids, task_data.criteria)
+    
+    # 验证资产是否存在且未删除，并统计有使用人的资产（一条查询）
+    matched_count, with_user_count = count_selected_assets(db, conditions)
+    if task_data.asset_ids is not None and matched_count != len(set(task_data.asset_ids)):
         raise HTTPException(status_code=400, detail="部分资产不存在或已删除")
+    if matched_count == 0:
+        raise HTTPException(status_code=400, detail="没有符合条件的资产")
+    # 没有使用人的资产会被跳过
+    if with_user_count == 0:
+        raise HTTPException(status_code=400, detail="所选资产都没有使用人，无法创建任务")
     
     # 生成任务编号
-    task_number = generate_task_number(db)
+    task_number = next_task_number(db)
     
     # 创建任务
     db_task = SafetyCheckTask(
@@ -71,34 +120,17 @@ async def create_task(
     db.add(db_task)
     db.flush()  # 获取任务ID
     
-    # 为每个资产创建任务资产关联记录
-    created_count = 0
-    skipped_count = 0
-    for asset in assets:
-        # 如果资产没有使用人，跳过该资产
-        if not asset.user_id:
-            skipped_count += 1
-            continue
-        
-        # 创建任务资产关联
-        task_asset = TaskAsset(
-            task_id=db_task.id,
-            asset_id=asset.id,
-            assigned_user_id=asset.user_id,
-            status="pending"
-        )
-        db.add(task_asset)
-        created_count += 1
-    
-    if created_count == 0:
-        db.rollback()
-        raise HTTPException(status_code=400, detail="所选资产都没有使用人，无法创建任务")
+    # 一条 INSERT ... SELECT 生成任务资产关联，并初始化进度计数器
+    created_count = materialize_task_assets(db, db_task, conditions)
+    skipped_count = matched_count - created_count
     
     db.commit()
     db.refresh(db_task)
     
-    # 返回任务详情
-    return await get_task_detail(db_task.id, db, current_user)
+    # 返回任务详情（附带跳过的资产数）
+    task_response = await get_task_detail(db_task.id, db, current_user)
+    task_response.skipped_assets = skipped_count
+    return task_response
 
 
 @router.get("/", response_model=dict)
@@ -127,7 +159,11 @@ async def get_tasks(
     total = query.count()
     
     # 分页
-    tasks = query.order_by(SafetyCheckTask.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
+    tasks = query.options(*TASK_LOAD_OPTIONS).order_by(SafetyCheckTask.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
+    
+    # 普通用户需要整页任务中自己名下资产的进度统计（一条查询），管理员直接读取进度计数器
+    is_admin = current_user.role == "admin"
+    progress_by_task = {} if is_admin else load_task_progress(db, [task.id for task in tasks], current_user.id)
     
     items = []
     tasks_to_update = []  # 需要更新状态的任务列表
@@ -135,47 +171,14 @@ async def get_tasks(
     for task in tasks:
         task_dict = SafetyCheckTaskResponse.model_validate(task).model_dump()
         
-        # 统计资产数量
-        if current_user.role == "admin":
-            # 管理员：显示所有资产统计（已退库的资产不纳入进度统计）
-            completed_assets = db.query(TaskAsset).filter(
-                TaskAsset.task_id == task.id,
-                TaskAsset.status == "checked"
-            ).count()
-            returned_assets = db.query(TaskAsset).filter(
-                TaskAsset.task_id == task.id,
-                TaskAsset.status == "returned"
-            ).count()
-            pending_assets = db.query(TaskAsset).filter(
-                TaskAsset.task_id == task.id,
-                TaskAsset.status == "pending"
-            ).count()
-            # 总资产数 = 已完成 + 待检查（排除已退库的）
-            total_assets = completed_assets + pending_assets
-            task_dict["total_assets"] = total_assets
-            task_dict["completed_assets"] = completed_assets
-            task_dict["pending_assets"] = pending_assets
-            task_dict["returned_assets"] = returned_assets
-            
-            # 如果进度为100%，标记需要更新任务状态为"已完成"
-            if total_assets > 0 and completed_assets == total_assets and task.status != "completed":
-                tasks_to_update.append(task)
-                task_dict["status"] = "completed"
-                if task.completed_at:
-                    task_dict["completed_at"] = task.completed_at
-                else:
-                    task_dict["completed_at"] = datetime.now()
-        else:
-            # 普通用户：显示自己的资产统计（排除已退库的）
-            my_assets = db.query(TaskAsset).filter(
-                TaskAsset.task_id == task.id,
-                TaskAsset.assigned_user_id == current_user.id,
-                TaskAsset.status != "returned"  # 排除已退库的资产
-            ).all()
-            my_assets_count = len(my_assets)
-            my_completed_count = len([ta for ta in my_assets if ta.status == "checked"])
-            task_dict["my_assets_count"] = my_assets_count
-            task_dict["my_completed_count"] = my_completed_count
+        # 如果进度为100%，标记需要更新任务状态为"已完成"
+        if apply_task_progress(task, task_dict, progress_by_task.get(task.id), is_admin):
+            tasks_to_update.append(task)
+            task_dict["status"] = "completed"
+            if task.completed_at:
+                task_dict["completed_at"] = task.completed_at
+            else:
+                task_dict["completed_at"] = datetime.now()
         
         items.append(SafetyCheckTaskResponse(**task_dict))
     
@@ -202,7 +205,7 @@ async def get_task_detail(
     current_user: User = Depends(get_current_user)
 ):
     """获取任务详情"""
-    task = db.query(SafetyCheckTask).filter(SafetyCheckTask.id == task_id).first()
+    task = db.query(SafetyCheckTask).options(*TASK_LOAD_OPTIONS).filter(SafetyCheckTask.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     
@@ -217,46 +220,18 @@ async def get_task_detail(
     
     task_dict = SafetyCheckTaskResponse.model_validate(task).model_dump()
     
-    # 统计资产数量
-    if current_user.role == "admin":
-        # 管理员：显示所有资产统计（已退库的资产不纳入进度统计）
-        completed_assets = db.query(TaskAsset).filter(
-            TaskAsset.task_id == task_id,
-            TaskAsset.status == "checked"
-        ).count()
-        returned_assets = db.query(TaskAsset).filter(
-            TaskAsset.task_id == task_id,
-            TaskAsset.status == "returned"
-        ).count()
-        pending_assets = db.query(TaskAsset).filter(
-            TaskAsset.task_id == task_id,
-            TaskAsset.status == "pending"
-        ).count()
-        # 总资产数 = 已完成 + 待检查（排除已退库的）
-        total_assets = completed_assets + pending_assets
-        task_dict["total_assets"] = total_assets
-        task_dict["completed_assets"] = completed_assets
-        task_dict["pending_assets"] = pending_assets
-        task_dict["returned_assets"] = returned_assets
-        
-        # 如果进度为100%，自动更新任务状态为"已完成"
-        if total_assets > 0 and completed_assets == total_assets and task.status != "completed":
-            task.status = "completed"
-            if not task.completed_at:
-                task.completed_at = datetime.now()
-            db.commit()
-            task_dict["status"] = "completed"
-            task_dict["completed_at"] = task.completed_at
-    else:
-        my_assets = db.query(TaskAsset).filter(
-            TaskAsset.task_id == task_id,
-            TaskAsset.assigned_user_id == current_user.id,
-            TaskAsset.status != "returned"  # 排除已退库的资产
-        ).all()
-        my_assets_count = len(my_assets)
-        my_completed_count = len([ta for ta in my_assets if ta.status == "checked"])
-        task_dict["my_assets_count"] = my_assets_count
-        task_dict["my_completed_count"] = my_completed_count
+    # 统计资产数量（普通用户一条查询，管理员直接读取进度计数器）
+    is_admin = current_user.role == "admin"
+    progress = None if is_admin else load_task_progress(db, [task_id], current_user.id)[task_id]
+    
+    # 如果进度为100%，自动更新任务状态为"已完成"
+    if apply_task_progress(task, task_dict, progress, is_admin):
+        task.status = "completed"
+        if not task.completed_at:
+            task.completed_at = datetime.now()
+        db.commit()
+        task_dict["status"] = "completed"
+        task_dict["completed_at"] = task.completed_at
     
     return SafetyCheckTaskResponse(**task_dict)
 
@@ -309,19 +284,9 @@ async def get_task_assets(
             ta_dict["check_items_result"] = []
         assets.append(TaskAssetResponse(**ta_dict))
     
-    # 获取检查类型信息
-    check_type = db.query(SafetyCheckType).filter(SafetyCheckType.id == task.check_type_id).first()
-    check_type_dict = None
-    if check_type:
-        from schemas import SafetyCheckTypeResponse
-        check_type_dict = SafetyCheckTypeResponse.model_validate(check_type).model_dump()
-        if check_type.check_items:
-            try:
-                check_type_dict["check_items"] = json.loads(check_type.check_items)
-            except:
-                check_type_dict["check_items"] = []
-        else:
-            check_type_dict["check_items"] = []
+    # 获取检查类型信息（引用数据缓存，check_items已解析）
+    check_type = reference_cache.get_check_type(db, task.check_type_id)
+    check_type_dict = check_type.model_dump() if check_type else None
     
     return {
         "task": SafetyCheckTaskResponse.model_validate(task).model_dump(),
@@ -348,6 +313,10 @@ async def update_task(
         task.description = task_data.description
     if task_data.deadline is not None:
         task.deadline = task_data.deadline
+        # 逾期任务的截止时间延后到未来时，恢复为待检查
+        if task.status == "overdue" and not task_data.status \
+                and task_data.deadline > datetime.now(task_data.deadline.tzinfo):
+            reopen_overdue_task(db, task)
     if task_data.status:
         task.status = task_data.status
         if task_data.status == "completed":
@@ -2,7 +2,7 @@
 安全检查类型管理路由
 仅管理员可以管理检查类型
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
@@ -13,74 +13,45 @@ from schemas import (
     SafetyCheckTypeResponse
 )
 from auth import get_current_admin_user
-import json
+from cache import reference_cache, build_check_type_response, not_modified_response, set_etag_headers
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[SafetyCheckTypeResponse])
 async def get_check_types(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    """获取所有检查类型列表（仅管理员）"""
-    check_types = db.query(SafetyCheckType).order_by(SafetyCheckType.created_at.desc()).all()
-    result = []
-    for ct in check_types:
-        # 手动构建字典，避免Pydantic验证时check_items是字符串的问题
-        ct_dict = {
-            "id": ct.id,
-            "name": ct.name,
-            "description": ct.description,
-            "is_active": ct.is_active,
-            "created_at": ct.created_at,
-            "updated_at": ct.updated_at,
-            "created_by_id": ct.created_by_id,
-            "created_by": ct.created_by
-        }
-        # 解析check_items JSON
-        if ct.check_items:
-            try:
-                ct_dict["check_items"] = json.loads(ct.check_items)
-            except:
-                ct_dict["check_items"] = []
-        else:
-            ct_dict["check_items"] = []
-        result.append(SafetyCheckTypeResponse(**ct_dict))
-    return result
+    """获取所有检查类型列表（仅管理员，进程内缓存，支持ETag协商缓存）"""
+    etag = reference_cache.etag(reference_cache.CHECK_TYPES)
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    set_etag_headers(response, etag)
+    return reference_cache.get_check_types(db)
 
 
 @router.get("/{check_type_id}", response_model=SafetyCheckTypeResponse)
 async def get_check_type(
     check_type_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """获取指定检查类型"""
-    check_type = db.query(SafetyCheckType).filter(SafetyCheckType.id == check_type_id).first()
+    etag = reference_cache.etag(reference_cache.CHECK_TYPES)
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    check_type = reference_cache.get_check_type(db, check_type_id)
     if not check_type:
         raise HTTPException(status_code=404, detail="检查类型不存在")
-    
-    # 手动构建字典，避免Pydantic验证时check_items是字符串的问题
-    ct_dict = {
-        "id": check_type.id,
-        "name": check_type.name,
-        "description": check_type.description,
-        "is_active": check_type.is_active,
-        "created_at": check_type.created_at,
-        "updated_at": check_type.updated_at,
-        "created_by_id": check_type.created_by_id,
-        "created_by": check_type.created_by
-    }
-    # 解析check_items JSON
-    if check_type.check_items:
-        try:
-            ct_dict["check_items"] = json.loads(check_type.check_items)
-        except:
-            ct_dict["check_items"] = []
-    else:
-        ct_dict["check_items"] = []
-    return SafetyCheckTypeResponse(**ct_dict)
+    set_etag_headers(response, etag)
+    return check_type
 
 
 @router.post("/", response_model=SafetyCheckTypeResponse)
@@ -110,31 +81,10 @@ async def create_check_type(
     
     db.add(db_check_type)
     db.commit()
+    reference_cache.invalidate(reference_cache.CHECK_TYPES, reference_cache.CHECK_TYPE_VALIDATORS)
     db.refresh(db_check_type)
     
-    # 返回结果 - 需要先解析JSON字符串
-    # 手动构建字典，避免Pydantic验证时check_items是字符串的问题
-    ct_dict = {
-        "id": db_check_type.id,
-        "name": db_check_type.name,
-        "description": db_check_type.description,
-        "is_active": db_check_type.is_active,
-        "created_at": db_check_type.created_at,
-        "updated_at": db_check_type.updated_at,
-        "created_by_id": db_check_type.created_by_id,
-        "created_by": db_check_type.created_by
-    }
-    
-    # 解析check_items JSON字符串
-    if db_check_type.check_items:
-        try:
-            ct_dict["check_items"] = json.loads(db_check_type.check_items)
-        except:
-            ct_dict["check_items"] = []
-    else:
-        ct_dict["check_items"] = []
-    
-    return SafetyCheckTypeResponse(**ct_dict)
+    return build_check_type_response(db_check_type)
 
 
 @router.put("/{check_type_id}", response_model=SafetyCheckTypeResponse)
@@ -168,29 +118,10 @@ async def update_check_type(
         check_type.set_check_items(items_list)
     
     db.commit()
+    reference_cache.invalidate(reference_cache.CHECK_TYPES, reference_cache.CHECK_TYPE_VALIDATORS)
     db.refresh(check_type)
     
-    # 返回结果 - 需要先解析JSON字符串
-    # 手动构建字典，避免Pydantic验证时check_items是字符串的问题
-    ct_dict = {
-        "id": check_type.id,
-        "name": check_type.name,
-        "description": check_type.description,
-        "is_active": check_type.is_active,
-        "created_at": check_type.created_at,
-        "updated_at": check_type.updated_at,
-        "created_by_id": check_type.created_by_id,
-        "created_by": check_type.created_by
-    }
-    
-    if check_type.check_items:
-        try:
-            ct_dict["check_items"] = json.loads(check_type.check_items)
-        except:
-            ct_dict["check_items"] = []
-    else:
-        ct_dict["check_items"] = []
-    return SafetyCheckTypeResponse(**ct_dict)
+    return build_check_type_response(check_type)
 
 
 @router.delete("/{check_type_id}")
@@ -213,6 +144,6 @@ async def delete_check_type(
     # 软删除：设置为停用
     check_type.is_active = False
     db.commit()
+    reference_cache.invalidate(reference_cache.CHECK_TYPES, reference_cache.CHECK_TYPE_VALIDATORS)
     
     return {"message": "检查类型已停用"}
-
@@ -2,44 +2,321 @@
 统计信息路由
 提供系统统计数据
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import select, func, literal, cast, String, union_all, case
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+import threading
 from database import get_db
-from models import User, Asset, TransferRequest, ReturnRequest
-from auth import get_current_user
+from models import Asset, InventorySnapshot, SafetyCheckItemResult
+from schemas import (
+    StatsBreakdownItem, StatsBreakdownResponse, InventorySnapshotResponse,
+    ComplianceReportRow, ComplianceReportResponse
+)
+from auth import get_current_user, get_current_admin_user
+from cache import reference_cache, table_versions, table_etag, not_modified_response, set_etag_headers
+from counters import (
+    read_counters, TOTAL_USERS, TOTAL_ASSETS, IN_USE_ASSETS,
+    PENDING_TRANSFERS, PENDING_RETURNS, PENDING_EDITS
+)
 
 router = APIRouter()
 
 
+# 首页统计依赖的表（计数器由这些表的写入维护）
+STATS_TABLES = ("users", "assets", "transfer_requests", "return_requests", "asset_edit_requests")
+
+
 @router.get("/")
 async def get_stats(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """获取系统统计数据"""
-    # 用户总数
-    total_users = db.query(func.count(User.id)).scalar()
-    
-    # 资产总数
-    total_assets = db.query(func.count(Asset.id)).scalar()
-    
-    # 在用资产数
-    in_use_assets = db.query(func.count(Asset.id)).filter(Asset.status == "在用").scalar()
-    
-    # 待审批的交接申请数
-    pending_transfers = db.query(func.count(TransferRequest.id)).filter(
-        TransferRequest.status == "pending"
-    ).scalar()
-    
-    # 待审批的退回申请数
-    pending_returns = db.query(func.count(ReturnRequest.id)).filter(
-        ReturnRequest.status == "pending"
-    ).scalar()
+    """获取系统统计数据（读取写入时维护的计数器，不再逐项COUNT），支持ETag协商缓存"""
+    etag = table_etag("stats", STATS_TABLES, request, current_user)
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    set_etag_headers(response, etag)
+
+    counters = read_counters(db)
     
     return {
-        "total_users": total_users or 0,
-        "total_assets": total_assets or 0,
-        "in_use_assets": in_use_assets or 0,
-        "pending_approvals": (pending_transfers or 0) + (pending_returns or 0)
+        # 用户总数
+        "total_users": counters[TOTAL_USERS],
+        # 资产总数（不含已删除资产）
+        "total_assets": counters[TOTAL_ASSETS],
+        # 在用资产数
+        "in_use_assets": counters[IN_USE_ASSETS],
+        # 待审批的交接、退回、编辑申请数
+        "pending_approvals": counters[PENDING_TRANSFERS] + counters[PENDING_RETURNS] + counters[PENDING_EDITS]
     }
+
+
+# 资产分组统计支持的维度
+BREAKDOWN_DIMENSIONS = {
+    "category": Asset.category_id,
+    "status": Asset.status,
+    "user_group": Asset.user_group,
+    "office_location": Asset.office_location,
+    "floor": Asset.floor,
+}
+
+# 支持GROUPING SETS的数据库
+GROUPING_SETS_DIALECTS = {"postgresql", "mssql", "oracle"}
+
+# 分组统计结果缓存：维度组合 -> (数据版本号, 结果)，资产或资产大类变化后自动失效
+_breakdown_cache: Dict[Tuple[str, ...], Tuple[int, StatsBreakdownResponse]] = {}
+_breakdown_cache_lock = threading.Lock()
+
+
+def query_breakdown_rows(db: Session, dims: List[str]) -> List[Tuple[str, Optional[str], int]]:
+    """
+    一次查询统计所有维度，返回 (维度, 分组值, 数量) 列表
+    支持GROUPING SETS的数据库使用单次分组扫描，否则用UNION ALL合并各维度的GROUP BY
+    """
+    columns = [BREAKDOWN_DIMENSIONS[dim] for dim in dims]
+    active = Asset.deleted_at.is_(None)
+
+    if db.bind.dialect.name in GROUPING_SETS_DIALECTS:
+        stmt = select(
+            *columns,
+            *[func.grouping(column).label(f"grouping_{dim}") for dim, column in zip(dims, columns)],
+            func.count(Asset.id).label("count")
+        ).where(active).group_by(func.grouping_sets(*columns))
+        rows = []
+        for row in db.execute(stmt).mappings():
+            for dim, column in zip(dims, columns):
+                if row[f"grouping_{dim}"] == 0:
+                    value = row[column.key]
+                    rows.append((dim, str(value) if value is not None else None, row["count"]))
+                    break
+        return rows
+
+    stmt = union_all(*[
+        select(
+            literal(dim).label("dimension"),
+            cast(column, String).label("value"),
+            func.count(Asset.id).label("count")
+        ).where(active).group_by(column)
+        for dim, column in zip(dims, columns)
+    ])
+    return [(row.dimension, row.value, row.count) for row in db.execute(stmt)]
+
+
+def build_breakdown(db: Session, dims: List[str]) -> StatsBreakdownResponse:
+    """查询并组装分组统计结果"""
+    category_names = {str(cat.id): cat.name for cat in reference_cache.get_categories(db)}
+    dimensions: Dict[str, List[StatsBreakdownItem]] = {dim: [] for dim in dims}
+    for dim, value, count in query_breakdown_rows(db, dims):
+        if value is None:
+            label = "未填写"
+        elif dim == "category":
+            label = category_names.get(value, value)
+        else:
+            label = value
+        dimensions[dim].append(StatsBreakdownItem(value=value, label=label, count=count))
+
+    for items in dimensions.values():
+        items.sort(key=lambda item: item.count, reverse=True)
+    # 每项资产在每个维度中恰好属于一个分组，任一维度的数量之和即为资产总数
+    total_assets = sum(item.count for item in dimensions[dims[0]])
+    return StatsBreakdownResponse(total_assets=total_assets, dimensions=dimensions)
+
+
+@router.get("/breakdown", response_model=StatsBreakdownResponse)
+async def get_stats_breakdown(
+    dims: Optional[str] = Query(None, description="统计维度，逗号分隔：category,status,user_group,office_location,floor，默认全部"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """获取资产分组统计（不含已删除资产），结果按数据版本号缓存"""
+    if dims:
+        requested = list(dict.fromkeys(dim.strip() for dim in dims.split(",") if dim.strip()))
+    else:
+        requested = list(BREAKDOWN_DIMENSIONS)
+    invalid = [dim for dim in requested if dim not in BREAKDOWN_DIMENSIONS]
+    if invalid or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的统计维度: {', '.join(invalid)}，可选维度: {', '.join(BREAKDOWN_DIMENSIONS)}"
+        )
+
+    key = tuple(requested)
+    version = table_versions.version("assets", "asset_categories")
+    with _breakdown_cache_lock:
+        cached = _breakdown_cache.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    result = build_breakdown(db, requested)
+    with _breakdown_cache_lock:
+        _breakdown_cache[key] = (version, result)
+    return result
+
+
+@router.get("/timeseries", response_model=List[InventorySnapshotResponse])
+async def get_stats_timeseries(
+    start_date: Optional[date] = Query(None, description="开始日期，默认为结束日期前29天"),
+    end_date: Optional[date] = Query(None, description="结束日期，默认为今天（UTC）"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """获取每日资产盘点快照（按日期升序），用于趋势图"""
+    end_date = end_date or datetime.utcnow().date()
+    start_date = start_date or end_date - timedelta(days=29)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="开始日期不能晚于结束日期")
+    if (end_date - start_date).days > 366:
+        raise HTTPException(status_code=400, detail="查询范围不能超过366天")
+
+    snapshots = db.query(InventorySnapshot).filter(
+        InventorySnapshot.snapshot_date >= start_date,
+        InventorySnapshot.snapshot_date <= end_date
+    ).order_by(InventorySnapshot.snapshot_date).all()
+
+    category_names = {str(cat.id): cat.name for cat in reference_cache.get_categories(db)}
+    result = []
+    for snapshot in snapshots:
+        category_counts: Dict[str, int] = {}
+        for category_id, count in snapshot.get_counts("category_counts").items():
+            name = category_names.get(category_id, category_id)
+            category_counts[name] = category_counts.get(name, 0) + count
+        result.append(InventorySnapshotResponse(
+            snapshot_date=snapshot.snapshot_date,
+            total_assets=snapshot.total_assets,
+            in_use_assets=snapshot.in_use_assets,
+            in_use_ratio=round(snapshot.in_use_assets / snapshot.total_assets, 4) if snapshot.total_assets else 0.0,
+            status_counts=snapshot.get_counts("status_counts"),
+            category_counts=category_counts,
+            group_counts=snapshot.get_counts("group_counts"),
+            pending_transfers=snapshot.pending_transfers,
+            pending_returns=snapshot.pending_returns,
+            pending_edits=snapshot.pending_edits,
+            pending_approvals=snapshot.pending_transfers + snapshot.pending_returns + snapshot.pending_edits,
+            source=snapshot.source
+        ))
+    return result
+
+
+# 合规统计支持的分组维度（period 按检查日期分组后再归并到统计周期）
+COMPLIANCE_DIMENSIONS = {
+    "item": SafetyCheckItemResult.item,
+    "check_type": SafetyCheckItemResult.check_type_id,
+    "user_group": SafetyCheckItemResult.user_group,
+    "period": SafetyCheckItemResult.check_date,
+}
+
+COMPLIANCE_PERIODS = ("day", "week", "month", "quarter")
+
+
+def period_label(day: date, period: str) -> str:
+    """日期所属统计周期的标签"""
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return f"{day.year}-{day.month:02d}"
+    if period == "quarter":
+        return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+    return day.isoformat()
+
+
+@router.get("/compliance", response_model=ComplianceReportResponse)
+async def get_compliance_report(
+    group_by: Optional[str] = Query(None, description="分组维度，逗号分隔：item,check_type,user_group,period，默认 item,check_type"),
+    period: str = Query("month", description="统计周期：day/week/month/quarter（分组维度包含period时生效）"),
+    start_date: Optional[date] = Query(None, description="开始日期，默认为结束日期前89天"),
+    end_date: Optional[date] = Query(None, description="结束日期，默认为今天"),
+    check_type_id: Optional[int] = Query(None, description="检查类型筛选"),
+    user_group: Optional[str] = Query(None, description="检查人组别筛选"),
+    item: Optional[str] = Query(None, description="检查项筛选"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_admin_user)
+):
+    """
+    安全检查合规统计（仅管理员）
+    对规范化的检查项结果表按日期范围做一次带索引的 GROUP BY，按检查项、检查类型、组别、周期统计合格/不合格数
+    """
+    if group_by:
+        requested = list(dict.fromkeys(dim.strip() for dim in group_by.split(",") if dim.strip()))
+    else:
+        requested = ["item", "check_type"]
+    invalid = [dim for dim in requested if dim not in COMPLIANCE_DIMENSIONS]
+    if invalid or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的分组维度: {', '.join(invalid)}，可选维度: {', '.join(COMPLIANCE_DIMENSIONS)}"
+        )
+    if period not in COMPLIANCE_PERIODS:
+        raise HTTPException(status_code=400, detail=f"不支持的统计周期: {period}，可选周期: {', '.join(COMPLIANCE_PERIODS)}")
+
+    end_date = end_date or datetime.now().date()
+    start_date = start_date or end_date - timedelta(days=89)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="开始日期不能晚于结束日期")
+    if (end_date - start_date).days > 366:
+        raise HTTPException(status_code=400, detail="查询范围不能超过366天")
+
+    conditions = [
+        SafetyCheckItemResult.check_date >= start_date,
+        SafetyCheckItemResult.check_date <= end_date,
+    ]
+    if check_type_id is not None:
+        conditions.append(SafetyCheckItemResult.check_type_id == check_type_id)
+    if user_group:
+        conditions.append(SafetyCheckItemResult.user_group == user_group)
+    if item:
+        conditions.append(SafetyCheckItemResult.item == item)
+
+    columns = [COMPLIANCE_DIMENSIONS[dim].label(dim) for dim in requested]
+    stmt = select(
+        *columns,
+        func.count(SafetyCheckItemResult.id).label("total"),
+        func.sum(case((SafetyCheckItemResult.result == "yes", 1), else_=0)).label("passed"),
+        func.sum(case((SafetyCheckItemResult.result == "no", 1), else_=0)).label("failed")
+    ).where(*conditions).group_by(*columns)
+
+    # 按日期分组的结果归并到统计周期
+    groups: Dict[Tuple, List[int]] = {}
+    for row in db.execute(stmt).mappings():
+        key = tuple(
+            period_label(row[dim], period) if dim == "period" else row[dim]
+            for dim in requested
+        )
+        counts = groups.setdefault(key, [0, 0, 0])
+        counts[0] += row["total"]
+        counts[1] += row["passed"] or 0
+        counts[2] += row["failed"] or 0
+
+    check_types = {check_type.id: check_type.name for check_type in reference_cache.get_check_types(db)}
+    rows = []
+    for key, (total, passed, failed) in groups.items():
+        values = dict(zip(requested, key))
+        rows.append(ComplianceReportRow(
+            item=values.get("item"),
+            check_type_id=values.get("check_type"),
+            check_type_name=check_types.get(values["check_type"]) if "check_type" in values else None,
+            user_group=values.get("user_group"),
+            period=values.get("period"),
+            total=total,
+            passed=passed,
+            failed=failed,
+            failure_rate=round(failed / total, 4) if total else 0.0
+        ))
+    # 周期升序，其余按不合格率倒序
+    rows.sort(key=lambda row: (row.period or "", -row.failure_rate, -row.total))
+
+    return ComplianceReportResponse(
+        start_date=start_date,
+        end_date=end_date,
+        group_by=requested,
+        period=period,
+        total=sum(row.total for row in rows),
+        passed=sum(row.passed for row in rows),
+        failed=sum(row.failed for row in rows),
+        rows=rows
+    )
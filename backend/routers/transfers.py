@@ -2,22 +2,41 @@
 资产交接路由
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import or_, insert, exists
 from typing import List, Optional
 from database import get_db
 from models import TransferRequest, Asset, User
-from schemas import TransferRequestCreate, TransferRequestResponse, TransferConfirmationRequest
+from schemas import (
+    TransferRequestCreate, TransferRequestResponse, TransferConfirmationRequest,
+    TransferBatchCreate, TransferBatchResponse
+)
 from auth import get_current_user
+from cache import WAREHOUSE_EHR_NUMBER
+from serialization import list_response
 from logger import logger
 from datetime import datetime
+import uuid
 # 延迟导入避免循环依赖
 def get_create_history_record():
     from routers import asset_history
     return asset_history.create_history_record
 
+def get_create_history_records():
+    from routers import asset_history
+    return asset_history.create_history_records
+
 router = APIRouter()
 
+# 交接申请响应中嵌套对象（资产及其大类、使用人，转出/转入人，创建人）的预加载策略
+TRANSFER_LOAD_OPTIONS = (
+    selectinload(TransferRequest.asset).selectinload(Asset.category),
+    selectinload(TransferRequest.asset).selectinload(Asset.user),
+    selectinload(TransferRequest.from_user),
+    selectinload(TransferRequest.to_user),
+    selectinload(TransferRequest.created_by),
+)
+
 
 @router.get("/", response_model=List[TransferRequestResponse])
 async def get_transfer_requests(
@@ -25,6 +44,7 @@ async def get_transfer_requests(
     limit: int = 100,
     status: Optional[str] = None,
     search: Optional[str] = Query(None, description="搜索关键词,支持模糊搜索所有字段"),
+    batch_id: Optional[str] = Query(None, description="批量交接批次号"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -40,51 +60,37 @@ async def get_transfer_requests(
     
     if status:
         query = query.filter(TransferRequest.status == status)
+    if batch_id:
+        query = query.filter(TransferRequest.batch_id == batch_id)
     
-    # 支持模糊搜索所有字段
+    # 支持模糊搜索所有字段（资产、用户条件为EXISTS子查询，与申请列表在同一条SQL中完成）
     if search:
-        # 先获取所有相关的资产ID
-        asset_results = db.query(Asset.id).filter(
-            or_(
-                Asset.asset_number.contains(search),
-                Asset.name.contains(search),
-                Asset.specification.contains(search),
-                Asset.mac_address.contains(search),
-                Asset.ip_address.contains(search),
-                Asset.office_location.contains(search),
-                Asset.floor.contains(search)
-            )
-        ).all()
-        asset_ids = [row[0] for row in asset_results]
-        
-        # 获取匹配的用户ID
-        user_results = db.query(User.id).filter(
+        asset_matches = or_(
+            Asset.asset_number.contains(search),
+            Asset.name.contains(search),
+            Asset.specification.contains(search),
+            Asset.mac_address.contains(search),
+            Asset.ip_address.contains(search),
+            Asset.office_location.contains(search),
+            Asset.floor.contains(search)
+        )
+        user_matches = or_(
+            User.real_name.contains(search),
+            User.ehr_number.contains(search),
+            User.group.contains(search)
+        )
+        query = query.filter(
             or_(
-                User.real_name.contains(search),
-                User.ehr_number.contains(search),
-                User.group.contains(search)
-            )
-        ).all()
-        user_ids = [row[0] for row in user_results]
-        
-        # 构建搜索条件
-        search_conditions = [TransferRequest.reason.contains(search)]
-        
-        if asset_ids:
-            search_conditions.append(TransferRequest.asset_id.in_(asset_ids))
-        if user_ids:
-            search_conditions.append(
-                or_(
-                    TransferRequest.from_user_id.in_(user_ids),
-                    TransferRequest.to_user_id.in_(user_ids)
-                )
+                TransferRequest.reason.contains(search),
+                TransferRequest.asset.has(asset_matches),
+                TransferRequest.from_user.has(user_matches),
+                TransferRequest.to_user.has(user_matches)
             )
-        
-        if search_conditions:
-            query = query.filter(or_(*search_conditions))
+        )
     
-    requests = query.order_by(TransferRequest.created_at.desc()).offset(skip).limit(limit).all()
-    return [TransferRequestResponse.model_validate(req) for req in requests]
+    # 预加载嵌套的关联数据
+    requests = query.options(*TRANSFER_LOAD_OPTIONS).order_by(TransferRequest.created_at.desc()).offset(skip).limit(limit).all()
+    return list_response(TransferRequestResponse, requests)
 
 
 @router.get("/{request_id}", response_model=TransferRequestResponse)
@@ -94,7 +100,7 @@ async def get_transfer_request(
     current_user: User = Depends(get_current_user)
 ):
     """获取指定交接申请"""
-    request = db.query(TransferRequest).filter(TransferRequest.id == request_id).first()
+    request = db.query(TransferRequest).options(*TRANSFER_LOAD_OPTIONS).filter(TransferRequest.id == request_id).first()
     if not request:
         raise HTTPException(status_code=404, detail="交接申请不存在")
     
@@ -181,10 +187,188 @@ async def create_transfer_request(
         logger.error(f"记录交接历史失败: {e}", exc_info=True)
     
     db.commit()
-    db.refresh(db_request)
+    # 重新加载关联数据
+    db_request = db.query(TransferRequest).options(*TRANSFER_LOAD_OPTIONS).filter(TransferRequest.id == db_request.id).first()
     return TransferRequestResponse.model_validate(db_request)
 
 
+@router.post("/batch", response_model=TransferBatchResponse)
+async def create_transfer_batch(
+    batch_data: TransferBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量创建资产交接申请（多项资产交接给同一转入人，同一批次号）
+    资产、用户各用一条查询校验，任一资产不符合条件时整批不创建；
+    申请和流转记录批量插入，转入人可按批次号一次确认整批申请
+    """
+    asset_ids = list(dict.fromkeys(batch_data.asset_ids))
+    
+    # 一条查询加载所有资产，并标记是否已有进行中的交接申请
+    open_transfer = exists().where(
+        TransferRequest.asset_id == Asset.id,
+        TransferRequest.status.in_(["waiting_confirmation", "pending"])
+    )
+    rows = db.query(Asset, open_transfer.label("has_open_transfer")).filter(
+        Asset.id.in_(asset_ids),
+        Asset.deleted_at.is_(None)
+    ).all()
+    assets = {asset.id: (asset, has_open_transfer) for asset, has_open_transfer in rows}
+    
+    missing = [asset_id for asset_id in asset_ids if asset_id not in assets]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"资产不存在: {', '.join(map(str, missing))}")
+    
+    # 一条查询加载转入人和所有转出人
+    from_user_ids = {asset.user_id or current_user.id for asset, _ in assets.values()}
+    users = {
+        user.id: user
+        for user in db.query(User).filter(User.id.in_(from_user_ids | {batch_data.to_user_id})).all()
+    }
+    to_user = users.get(batch_data.to_user_id)
+    if not to_user:
+        raise HTTPException(status_code=404, detail="转入用户不存在")
+    if to_user.ehr_number == WAREHOUSE_EHR_NUMBER:
+        raise HTTPException(status_code=400, detail="不能将资产交接给仓库用户")
+    
+    errors = []
+    for asset_id in asset_ids:
+        asset, has_open_transfer = assets[asset_id]
+        if asset.status != "在用":
+            errors.append(f"{asset.asset_number}: 只能交接在用状态的资产")
+        elif current_user.role != "admin" and asset.user_id != current_user.id:
+            errors.append(f"{asset.asset_number}: 只能交接自己名下的资产")
+        elif (asset.user_id or current_user.id) == batch_data.to_user_id:
+            errors.append(f"{asset.asset_number}: 不能将资产转给自己")
+        elif has_open_transfer:
+            errors.append(f"{asset.asset_number}: 已有进行中的交接申请")
+    if errors:
+        raise HTTPException(status_code=400, detail="；".join(errors))
+    
+    # 批量插入交接申请，初始状态为待转入人确认
+    batch_id = uuid.uuid4().hex
+    request_rows = []
+    for asset_id in asset_ids:
+        asset, _ = assets[asset_id]
+        request_rows.append({
+            "asset_id": asset_id,
+            "from_user_id": asset.user_id or current_user.id,
+            "to_user_id": batch_data.to_user_id,
+            "created_by_id": current_user.id,
+            "reason": batch_data.reason,
+            "status": "waiting_confirmation",
+            "batch_id": batch_id
+        })
+    # 每项资产在批次中只有一条申请，按资产ID对应返回的申请ID
+    request_ids = dict(db.execute(
+        insert(TransferRequest).returning(TransferRequest.asset_id, TransferRequest.id),
+        request_rows
+    ).all())
+    
+    logger.info(f"用户 {current_user.ehr_number}({current_user.real_name}) 批量创建资产交接申请: {len(request_ids)} 项资产转给 {to_user.real_name}, 批次号 {batch_id}")
+    
+    # 批量记录交接申请历史
+    try:
+        history_records = []
+        for row in request_rows:
+            from_user = users.get(row["from_user_id"])
+            from_user_name = from_user.real_name if from_user else ""
+            history_records.append({
+                "asset_id": row["asset_id"],
+                "action_type": "transfer",
+                "action_description": f"申请资产交接：从 {from_user_name} 转给 {to_user.real_name}",
+                "operator_id": current_user.id,
+                "old_value": {"user_id": row["from_user_id"], "user_name": from_user_name},
+                "new_value": {"user_id": to_user.id, "user_name": to_user.real_name},
+                "related_request_id": request_ids[row["asset_id"]],
+                "related_request_type": "transfer"
+            })
+        get_create_history_records()(db, history_records)
+    except Exception as e:
+        logger.error(f"记录交接历史失败: {e}", exc_info=True)
+    
+    db.commit()
+    
+    requests = db.query(TransferRequest).options(*TRANSFER_LOAD_OPTIONS).filter(
+        TransferRequest.batch_id == batch_id
+    ).order_by(TransferRequest.id).all()
+    return TransferBatchResponse(
+        batch_id=batch_id,
+        count=len(requests),
+        requests=[TransferRequestResponse.model_validate(req) for req in requests]
+    )
+
+
+@router.post("/batch/{batch_id}/confirm", response_model=TransferBatchResponse)
+async def confirm_transfer_batch(
+    batch_id: str,
+    confirmation_data: TransferConfirmationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """转入人一次确认或拒绝整批交接申请（只处理批次中待确认的申请）"""
+    requests = db.query(TransferRequest).options(*TRANSFER_LOAD_OPTIONS).filter(
+        TransferRequest.batch_id == batch_id
+    ).order_by(TransferRequest.id).all()
+    if not requests:
+        raise HTTPException(status_code=404, detail="交接批次不存在")
+    
+    # 检查权限：只有转入人可以确认
+    if requests[0].to_user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="只有转入人可以确认此申请")
+    
+    waiting = [request for request in requests if request.status == "waiting_confirmation"]
+    if not waiting:
+        raise HTTPException(status_code=400, detail="该批次没有待确认状态的申请")
+    
+    confirmed_at = datetime.utcnow()
+    if confirmation_data.confirmed:
+        # 转入人确认，状态改为待审批
+        new_status = "pending"
+        action_description = "转入人确认资产交接申请"
+    else:
+        # 转入人拒绝，状态改为确认拒绝
+        new_status = "confirmation_rejected"
+        action_description = "转入人拒绝资产交接申请"
+    
+    history_records = []
+    for request in waiting:
+        request.to_user_confirmed = 1 if confirmation_data.confirmed else 0
+        request.to_user_confirm_comment = confirmation_data.comment
+        request.to_user_confirmed_at = confirmed_at
+        request.status = new_status
+        history_records.append({
+            "asset_id": request.asset_id,
+            "action_type": "transfer",
+            "action_description": action_description,
+            "operator_id": current_user.id,
+            "old_value": {"user_id": request.from_user_id, "user_name": request.from_user.real_name if request.from_user else ""},
+            "new_value": {"user_id": request.to_user_id, "user_name": request.to_user.real_name if request.to_user else ""},
+            "related_request_id": request.id,
+            "related_request_type": "transfer"
+        })
+    
+    logger.info(f"用户 {current_user.ehr_number}({current_user.real_name}) {'确认' if confirmation_data.confirmed else '拒绝'}批量资产交接申请: 批次号 {batch_id}, {len(waiting)} 项")
+    
+    # 批量记录确认历史
+    try:
+        get_create_history_records()(db, history_records)
+    except Exception as e:
+        logger.error(f"记录确认历史失败: {e}", exc_info=True)
+    
+    db.commit()
+    
+    requests = db.query(TransferRequest).options(*TRANSFER_LOAD_OPTIONS).filter(
+        TransferRequest.batch_id == batch_id
+    ).order_by(TransferRequest.id).all()
+    return TransferBatchResponse(
+        batch_id=batch_id,
+        count=len(requests),
+        requests=[TransferRequestResponse.model_validate(req) for req in requests]
+    )
+
+
 @router.delete("/{request_id}")
 async def cancel_transfer_request(
     request_id: int,
@@ -291,5 +475,6 @@ async def confirm_transfer_request(
         logger.error(f"记录确认历史失败: {e}", exc_info=True)
     
     db.commit()
-    db.refresh(request)
+    # 重新加载关联数据
+    request = db.query(TransferRequest).options(*TRANSFER_LOAD_OPTIONS).filter(TransferRequest.id == request.id).first()
     return TransferRequestResponse.model_validate(request)
@@ -2,7 +2,7 @@
 用户管理路由
 包括用户的增删改查、批量导入等
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional
@@ -10,6 +10,8 @@ from database import get_db
 from models import User
 from schemas import UserCreate, UserUpdate, UserResponse, ImportResponse
 from auth import get_current_user, get_current_admin_user, get_password_hash
+from cache import reference_cache, table_etag, not_modified_response, set_etag_headers
+from serialization import list_response
 import pandas as pd
 import io
 
@@ -26,6 +28,8 @@ async def get_current_user_info(
 
 @router.get("/", response_model=List[UserResponse])
 async def get_users(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = Query(None, description="搜索关键词，支持模糊搜索所有字段"),
@@ -33,7 +37,13 @@ async def get_users(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取用户列表（所有已登录用户可访问，用于选择转入用户等场景），支持搜索"""
+    """获取用户列表（所有已登录用户可访问，用于选择转入用户等场景），支持搜索和ETag协商缓存"""
+    etag = table_etag("users", ("users",), request, current_user)
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    set_etag_headers(response, etag)
+
     query = db.query(User)
     
     # 支持模糊搜索所有字段
@@ -51,7 +61,7 @@ async def get_users(
         query = query.filter(User.role == role)
     
     users = query.offset(skip).limit(limit).all()
-    return [UserResponse.model_validate(user) for user in users]
+    return list_response(UserResponse, users, response)
 
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -117,6 +127,8 @@ async def update_user(
         user.password_hash = get_password_hash(user_data.password)
     
     db.commit()
+    # 仓库用户和检查类型创建人的快照可能包含该用户信息
+    reference_cache.invalidate(reference_cache.WAREHOUSE_USER, reference_cache.CHECK_TYPES)
     db.refresh(user)
     return UserResponse.model_validate(user)
 
@@ -138,6 +150,7 @@ async def delete_user(
     
     db.delete(user)
     db.commit()
+    reference_cache.invalidate(reference_cache.WAREHOUSE_USER, reference_cache.CHECK_TYPES)
     return {"message": "用户已删除"}
 
 
@@ -0,0 +1,96 @@
+"""
+进程内定时任务调度
+每个任务运行在独立的守护线程中，按固定间隔执行，执行间隔可通过环境变量配置
+（间隔为0表示禁用该任务）。应用启动时调用 start，关闭时调用 stop
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+from logger import logger
+
+
+def get_interval_setting(env_name: str, default_seconds: int) -> int:
+    """读取任务执行间隔（秒），未配置或配置非法时使用默认值"""
+    value = os.getenv(env_name)
+    if value is None or value.strip() == "":
+        return default_seconds
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        logger.warning(f"环境变量 {env_name}={value} 不是有效的秒数，使用默认值 {default_seconds}")
+        return default_seconds
+
+
+@dataclass
+class ScheduledJob:
+    """定时任务"""
+    name: str
+    func: Callable[[], Optional[dict]]
+    interval_seconds: int
+    run_on_start: bool = False
+    thread: Optional[threading.Thread] = field(default=None, repr=False)
+
+
+class Scheduler:
+    """简单的进程内定时任务调度器"""
+
+    def __init__(self):
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def register(self, name: str, func: Callable[[], Optional[dict]], interval_seconds: int, run_on_start: bool = False):
+        """注册定时任务，func 返回的字典会写入执行日志"""
+        with self._lock:
+            self._jobs[name] = ScheduledJob(name=name, func=func, interval_seconds=interval_seconds, run_on_start=run_on_start)
+
+    def run_job(self, name: str) -> Optional[dict]:
+        """立即执行一次任务（也供手动触发使用），返回任务结果"""
+        job = self._jobs[name]
+        started = time.monotonic()
+        try:
+            result = job.func()
+        except Exception as e:
+            logger.error(f"定时任务 {name} 执行失败: {e}", exc_info=True)
+            return None
+        duration_ms = int((time.monotonic() - started) * 1000)
+        logger.info(f"定时任务 {name} 执行完成，耗时 {duration_ms}ms，结果: {result}")
+        return result
+
+    def _loop(self, job: ScheduledJob):
+        if job.run_on_start:
+            self.run_job(job.name)
+        while not self._stop_event.wait(job.interval_seconds):
+            self.run_job(job.name)
+
+    def start(self):
+        """启动所有间隔大于0的任务"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._stop_event.clear()
+            for job in self._jobs.values():
+                if job.interval_seconds <= 0:
+                    logger.info(f"定时任务 {job.name} 已禁用")
+                    continue
+                job.thread = threading.Thread(target=self._loop, args=(job,), name=f"job-{job.name}", daemon=True)
+                job.thread.start()
+                logger.info(f"定时任务 {job.name} 已启动，执行间隔 {job.interval_seconds} 秒")
+
+    def stop(self):
+        """停止所有任务"""
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+            self._stop_event.set()
+            threads = [job.thread for job in self._jobs.values() if job.thread]
+        for thread in threads:
+            thread.join(timeout=5)
+
+
+scheduler = Scheduler()
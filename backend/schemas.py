@@ -3,8 +3,8 @@ Pydantic模式定义
 用于API请求和响应的数据验证
 """
 from pydantic import BaseModel, Field, validator, field_validator
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Dict
+from datetime import datetime, date
 from enum import Enum
 import json
 
@@ -134,6 +134,32 @@ class AssetResponse(AssetBase):
         from_attributes = True
 
 
+class AssetListItem(BaseModel):
+    """资产列表精简行：大类和使用人只返回名称，由一条联表查询直接生成"""
+    id: int
+    asset_number: str
+    category_id: int
+    category_name: Optional[str] = None
+    name: str
+    specification: Optional[str] = None
+    status: str
+    mac_address: Optional[str] = None
+    ip_address: Optional[str] = None
+    office_location: Optional[str] = None
+    floor: Optional[str] = None
+    seat_number: Optional[str] = None
+    user_id: Optional[int] = None
+    user_name: Optional[str] = None
+    user_ehr: Optional[str] = None
+    user_group: Optional[str] = None
+    remark: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
 # 交接申请模式
 class TransferRequestCreate(BaseModel):
     asset_id: int = Field(..., description="资产ID")
@@ -163,6 +189,7 @@ class TransferRequestResponse(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime] = None
     approved_at: Optional[datetime] = None
+    batch_id: Optional[str] = None
     asset: Optional[AssetResponse] = None
     from_user: Optional[UserResponse] = None
     to_user: Optional[UserResponse] = None
@@ -172,6 +199,19 @@ class TransferRequestResponse(BaseModel):
         from_attributes = True
 
 
+class TransferBatchCreate(BaseModel):
+    """批量交接申请：多项资产交接给同一转入人"""
+    asset_ids: List[int] = Field(..., min_length=1, max_length=500, description="资产ID列表")
+    to_user_id: int = Field(..., description="转入用户ID")
+    reason: Optional[str] = Field(None, description="交接原因")
+
+
+class TransferBatchResponse(BaseModel):
+    batch_id: str
+    count: int
+    requests: List[TransferRequestResponse] = Field(default_factory=list)
+
+
 # 退回申请模式
 class ReturnRequestCreate(BaseModel):
     asset_id: int = Field(..., description="资产ID")
@@ -205,6 +245,7 @@ class ReturnRequestResponse(BaseModel):
     seat_number: Optional[str] = None
     new_user_id: Optional[int] = None
     remark: Optional[str] = None
+    batch_id: Optional[str] = None
     asset: Optional[AssetResponse] = None
     user: Optional[UserResponse] = None
     new_user: Optional[UserResponse] = None
@@ -213,6 +254,18 @@ class ReturnRequestResponse(BaseModel):
         from_attributes = True
 
 
+class ReturnBatchCreate(BaseModel):
+    """批量退回申请：多项资产整批退回仓库"""
+    asset_ids: List[int] = Field(..., min_length=1, max_length=500, description="资产ID列表")
+    reason: Optional[str] = Field(None, description="退回原因")
+
+
+class ReturnBatchResponse(BaseModel):
+    batch_id: str
+    count: int
+    requests: List[ReturnRequestResponse] = Field(default_factory=list)
+
+
 # 审批模式
 class ApprovalRequest(BaseModel):
     request_id: int = Field(..., description="申请ID")
@@ -221,6 +274,31 @@ class ApprovalRequest(BaseModel):
     comment: Optional[str] = Field(None, description="审批意见")
 
 
+class BatchApprovalRequest(BaseModel):
+    """批量审批请求，可混合不同类型的申请"""
+    items: List[ApprovalRequest] = Field(..., min_length=1, max_length=500, description="审批项列表")
+
+
+class ReturnBatchApprovalRequest(BaseModel):
+    """整批审批批量退回申请"""
+    approved: bool = Field(..., description="是否批准")
+    comment: Optional[str] = Field(None, description="审批意见")
+
+
+class BatchApprovalItemResult(BaseModel):
+    """单条审批结果"""
+    request_id: int
+    request_type: str
+    success: bool
+    message: str
+
+
+class BatchApprovalResponse(BaseModel):
+    success_count: int
+    error_count: int
+    results: List[BatchApprovalItemResult] = Field(default_factory=list, description="逐条审批结果")
+
+
 # 批量导入响应
 class ImportErrorDetail(BaseModel):
     """导入错误详情"""
@@ -260,6 +338,77 @@ class AssetEditRequestResponse(BaseModel):
         from_attributes = True
 
 
+# 审批收件箱模式
+class ApprovalInboxItem(BaseModel):
+    """审批收件箱条目，按request_type填充对应的申请详情"""
+    request_type: str = Field(..., description="申请类型：transfer、return或edit")
+    request_id: int
+    created_at: datetime
+    transfer: Optional[TransferRequestResponse] = None
+    return_request: Optional[ReturnRequestResponse] = None
+    edit_request: Optional[AssetEditRequestResponse] = None
+
+
+class ApprovalInboxResponse(BaseModel):
+    counts: dict = Field(..., description="各类型待审批数量")
+    total: int
+    items: List[ApprovalInboxItem] = Field(default_factory=list)
+    next_cursor: Optional[str] = Field(None, description="下一页游标，为空表示没有更多数据")
+
+
+# 统计模式
+class StatsBreakdownItem(BaseModel):
+    """某一维度下的一个分组"""
+    value: Optional[str] = Field(None, description="分组值，为空表示未填写")
+    label: str = Field(..., description="分组显示名称")
+    count: int
+
+
+class StatsBreakdownResponse(BaseModel):
+    total_assets: int = Field(..., description="资产总数（不含已删除资产）")
+    dimensions: Dict[str, List[StatsBreakdownItem]] = Field(default_factory=dict, description="各维度的分组统计，按数量倒序")
+
+
+class ComplianceReportRow(BaseModel):
+    """合规统计的一个分组"""
+    item: Optional[str] = Field(None, description="检查项")
+    check_type_id: Optional[int] = Field(None, description="检查类型ID")
+    check_type_name: Optional[str] = Field(None, description="检查类型名称")
+    user_group: Optional[str] = Field(None, description="检查人组别")
+    period: Optional[str] = Field(None, description="统计周期，如 2026-10-19、2026-W42、2026-10、2026-Q4")
+    total: int
+    passed: int
+    failed: int
+    failure_rate: float = Field(..., description="不合格率（0-1）")
+
+
+class ComplianceReportResponse(BaseModel):
+    start_date: date
+    end_date: date
+    group_by: List[str]
+    period: str
+    total: int
+    passed: int
+    failed: int
+    rows: List[ComplianceReportRow] = Field(default_factory=list)
+
+
+class InventorySnapshotResponse(BaseModel):
+    """每日资产盘点快照"""
+    snapshot_date: date
+    total_assets: int
+    in_use_assets: int
+    in_use_ratio: float = Field(..., description="在用率（0-1）")
+    status_counts: Dict[str, int] = Field(default_factory=dict, description="按状态统计")
+    category_counts: Dict[str, int] = Field(default_factory=dict, description="按资产大类名称统计")
+    group_counts: Dict[str, int] = Field(default_factory=dict, description="按使用人组别统计，空字符串表示未填写")
+    pending_transfers: int
+    pending_returns: int
+    pending_edits: int
+    pending_approvals: int
+    source: str = Field(..., description="数据来源：live-实时统计，backfill-根据流转记录补算")
+
+
 # 安全检查相关模式
 class CheckItem(BaseModel):
     """检查项"""
@@ -308,11 +457,21 @@ class SafetyCheckTypeResponse(SafetyCheckTypeBase):
         from_attributes = True
 
 
+class TaskAssetCriteria(BaseModel):
+    """按条件选择任务资产（各条件同时满足，只包含未删除的资产）"""
+    category_id: Optional[int] = Field(None, description="资产大类ID")
+    status: Optional[str] = Field(None, description="资产状态")
+    user_group: Optional[str] = Field(None, description="使用人组别")
+    office_location: Optional[str] = Field(None, description="存放办公地点")
+    all_in_use: bool = Field(False, description="全部在用资产")
+
+
 class SafetyCheckTaskCreate(BaseModel):
     check_type_id: int = Field(..., description="检查类型ID")
     title: str = Field(..., description="任务标题")
     description: Optional[str] = Field(None, description="任务描述")
-    asset_ids: List[int] = Field(..., description="资产ID列表")
+    asset_ids: Optional[List[int]] = Field(None, description="资产ID列表（与criteria二选一）")
+    criteria: Optional[TaskAssetCriteria] = Field(None, description="资产筛选条件（与asset_ids二选一），由服务端一次性选取资产")
     deadline: Optional[datetime] = Field(None, description="截止时间")
 
     @field_validator("deadline", mode="before")
@@ -354,13 +513,57 @@ class SafetyCheckTaskResponse(BaseModel):
     total_assets: Optional[int] = None  # 总资产数
     completed_assets: Optional[int] = None  # 已完成资产数
     pending_assets: Optional[int] = None  # 待检查资产数
+    overdue_assets: Optional[int] = None  # 已逾期资产数（包含在待检查资产数中）
     my_assets_count: Optional[int] = None  # 当前用户的资产数（普通用户）
     my_completed_count: Optional[int] = None  # 当前用户已完成的资产数
+    skipped_assets: Optional[int] = None  # 创建任务时因没有使用人而跳过的资产数
     
     class Config:
         from_attributes = True
 
 
+class SafetyCheckScheduleCreate(BaseModel):
+    name: str = Field(..., description="计划名称")
+    check_type_id: int = Field(..., description="检查类型ID")
+    title: str = Field(..., description="任务标题（生成任务时追加周期）")
+    description: Optional[str] = Field(None, description="任务描述")
+    criteria: TaskAssetCriteria = Field(..., description="资产筛选条件，每个周期按当时的资产数据选取")
+    cadence: str = Field(..., description="周期：daily/weekly/monthly/quarterly/yearly")
+    run_day: int = Field(1, description="周期内的生成日：每周第几天(1-7)或每月/季/年首月第几天(1-28)")
+    deadline_days: Optional[int] = Field(None, ge=0, description="截止时间为生成日之后的天数，为空表示不设截止时间")
+    is_active: bool = Field(True, description="是否启用")
+
+
+class SafetyCheckScheduleUpdate(BaseModel):
+    name: Optional[str] = None
+    check_type_id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    criteria: Optional[TaskAssetCriteria] = None
+    cadence: Optional[str] = None
+    run_day: Optional[int] = None
+    deadline_days: Optional[int] = Field(None, ge=0)
+    is_active: Optional[bool] = None
+
+
+class SafetyCheckScheduleResponse(BaseModel):
+    id: int
+    name: str
+    check_type_id: int
+    title: str
+    description: Optional[str] = None
+    criteria: TaskAssetCriteria
+    cadence: str
+    run_day: int
+    deadline_days: Optional[int] = None
+    is_active: bool
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    created_by_id: Optional[int] = None
+    last_period: Optional[str] = None  # 最近一次执行的周期
+    last_task_id: Optional[int] = None  # 最近一次生成的任务ID
+
+
 class TaskAssetResponse(BaseModel):
     id: int
     task_id: int
@@ -395,6 +598,25 @@ class SafetyCheckResultSubmit(BaseModel):
     check_items_result: List[CheckItemResult] = Field(..., description="检查项结果列表")
 
 
+class BatchSafetyCheckResultSubmit(BaseModel):
+    """批量提交检查结果"""
+    items: List[SafetyCheckResultSubmit] = Field(..., min_length=1, max_length=500, description="检查结果列表")
+
+
+class BatchSafetyCheckResultItem(BaseModel):
+    """单条检查结果的提交结果"""
+    task_asset_id: int
+    success: bool
+    message: str
+
+
+class BatchSafetyCheckResultResponse(BaseModel):
+    success_count: int
+    error_count: int
+    completed_task_ids: List[int] = Field(default_factory=list, description="本批提交后完成的任务ID")
+    results: List[BatchSafetyCheckResultItem] = Field(default_factory=list, description="逐条提交结果")
+
+
 class SafetyCheckHistoryResponse(BaseModel):
     id: int
     task_id: int
@@ -414,3 +636,13 @@ class SafetyCheckHistoryResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class AssetComplianceSummary(BaseModel):
+    """资产安全检查合规汇总"""
+    total_checks: int = 0  # 检查次数
+    passed_checks: int = 0  # 检查结果为yes的次数
+    pass_rate: Optional[float] = None  # 合格率（0~1），没有检查记录时为空
+    last_checked_at: Optional[datetime] = None  # 最近一次检查时间
+    last_result: Optional[str] = None  # 最近一次检查结果
+    failed_items_count: int = 0  # 最近一次检查中结果为no的检查项数
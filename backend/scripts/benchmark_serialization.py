@@ -0,0 +1,114 @@
+"""
+资产列表序列化基准测试
+在内存数据库中生成资产（含大类和使用人），对比各序列化方式处理一页资产列表的耗时，
+分别测试带嵌套大类/使用人对象和不带嵌套对象两种情况，不访问正式数据库
+用法（在 backend 目录运行）：python scripts/benchmark_serialization.py [每页行数，默认500]
+"""
+import json
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import orjson
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker, selectinload
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import Base  # noqa: E402
+from models import Asset, AssetCategory, User  # noqa: E402
+from schemas import AssetBase, AssetResponse  # noqa: E402
+from serialization import list_adapter  # noqa: E402
+
+REPEAT = 5
+
+
+class FlatAssetResponse(AssetBase):
+    """不带嵌套大类和使用人对象的资产响应（对照组）"""
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+def load_assets(rows: int):
+    """在内存数据库中生成资产并按列表接口的方式加载（预加载大类和使用人）"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    now = datetime.now()
+    db.execute(insert(AssetCategory), [{"name": f"大类{i}", "created_at": now} for i in range(10)])
+    db.execute(insert(User), [
+        {"ehr_number": f"{i:07d}", "real_name": f"用户{i}", "group": f"组{i % 8}", "role": "user",
+         "password_hash": "x", "created_at": now}
+        for i in range(1, 101)
+    ])
+    db.execute(insert(Asset), [
+        {"asset_number": f"ZC{i:06d}", "category_id": i % 10 + 1, "name": "台式电脑", "specification": "ThinkCentre M920",
+         "status": "在用", "mac_address": "00:11:22:33:44:55", "ip_address": "10.0.0.1", "office_location": "总部大楼",
+         "floor": "5F", "seat_number": f"A{i}", "user_id": i % 100 + 1, "user_group": f"组{i % 8}", "created_at": now}
+        for i in range(rows)
+    ])
+    db.commit()
+    return db.query(Asset).options(selectinload(Asset.category), selectinload(Asset.user)).limit(rows).all()
+
+
+def per_row_fastapi(model, assets) -> bytes:
+    """逐行 model_validate，FastAPI 按 response_model 再校验后用 Pydantic 直接序列化（当前默认路径）"""
+    adapter = list_adapter(model)
+    return adapter.dump_json(adapter.validate_python([model.model_validate(asset) for asset in assets]))
+
+
+def per_row_json(model, assets) -> bytes:
+    """逐行 model_validate，jsonable_encoder + json.dumps（未声明 response_model 或旧版 FastAPI 的路径）"""
+    content = jsonable_encoder([model.model_validate(asset) for asset in assets])
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def per_row_json_orjson(model, assets) -> bytes:
+    """逐行 model_validate，jsonable_encoder + orjson（未声明 response_model 的接口使用 ORJSONResponse 后的路径）"""
+    return orjson.dumps(jsonable_encoder([model.model_validate(asset) for asset in assets]))
+
+
+def per_row_orjson(model, assets) -> bytes:
+    """逐行 model_validate，FastAPI 再校验后转为字典交给 orjson（把 ORJSONResponse 直接设为默认响应类的路径）"""
+    adapter = list_adapter(model)
+    value = adapter.validate_python([model.model_validate(asset) for asset in assets])
+    return orjson.dumps(adapter.dump_python(value, mode="json"))
+
+
+def type_adapter(model, assets) -> bytes:
+    """缓存的 TypeAdapter 一次校验整个列表并直接序列化（list_response 的路径）"""
+    adapter = list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(assets, from_attributes=True))
+
+
+STRATEGIES = [
+    ("逐行校验 + Pydantic序列化（当前）", per_row_fastapi),
+    ("逐行校验 + jsonable_encoder + json", per_row_json),
+    ("逐行校验 + jsonable_encoder + orjson", per_row_json_orjson),
+    ("逐行校验 + 转字典 + orjson", per_row_orjson),
+    ("TypeAdapter 整表校验并序列化", type_adapter),
+]
+
+
+def run_benchmark(rows: int):
+    assets = load_assets(rows)
+    print(f"资产列表序列化基准测试：每页 {len(assets)} 行，每项取 {REPEAT} 轮中的最快一轮")
+    for label, model in [("带嵌套对象 AssetResponse", AssetResponse), ("不带嵌套对象", FlatAssetResponse)]:
+        print(f"\n[{label}]")
+        baseline = None
+        for name, func in STRATEGIES:
+            size = len(func(model, assets))
+            number = max(1, 2000 // len(assets))
+            elapsed = min(timeit.repeat(lambda: func(model, assets), repeat=REPEAT, number=number)) / number * 1000
+            baseline = baseline or elapsed
+            print(f"  {elapsed:8.2f} ms  {baseline / elapsed:5.2f}x  {size / 1024:7.1f} KB  {name}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,51 @@
+"""
+JSON响应序列化
+- ORJSONResponse：用 orjson 渲染JSON，作为应用的默认响应类。
+  以 Default(...) 注册，声明了 response_model 的接口仍由 FastAPI 直接用 Pydantic 序列化为JSON字节（需要 requirements.txt 中的 FastAPI 版本），
+  只有返回字典等未声明响应模型的接口才由 orjson 渲染
+- list_response：大列表接口用缓存的 TypeAdapter 一次校验整个ORM对象列表并直接序列化为JSON字节，
+  省去逐行 model_validate 以及 FastAPI 按 response_model 再校验一遍的开销
+- partial_model：列表接口按 fields 参数只返回部分字段时使用的精简模型
+"""
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple, Type
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+from starlette.responses import Response
+
+
+class ORJSONResponse(JSONResponse):
+    """使用 orjson 渲染的JSON响应（支持datetime、非字符串键）"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=256)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """模型列表的 TypeAdapter（每个模型只构建一次，缓存容量同时覆盖按字段生成的精简模型）"""
+    return TypeAdapter(List[model])
+
+
+@lru_cache(maxsize=128)
+def partial_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """只包含 fields 中字段的模型（用于列表接口的 fields 参数，每组字段只构建一次）"""
+    return create_model(
+        f"{model.__name__}Partial",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    )
+
+
+def list_response(model: Type[BaseModel], rows: Iterable[Any], response: Optional[Response] = None) -> Response:
+    """
+    把ORM对象列表按 model 校验并序列化为JSON响应
+    response 为接口注入的 Response 时，沿用其中设置的响应头（如ETag）
+    """
+    adapter = list_adapter(model)
+    content = adapter.dump_json(adapter.validate_python(list(rows), from_attributes=True))
+    result = Response(content=content, media_type="application/json")
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
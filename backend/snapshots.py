@@ -0,0 +1,192 @@
+"""
+每日资产盘点快照
+定时任务每次运行时更新当天（UTC日期）的快照：按状态、资产大类、使用人组别统计资产数，
+并记录各类待审批申请数；如果上次快照之后有遗漏的日期，则从当前数据出发，
+按时间倒序回放期间的资产流转记录补算这些日期的快照（只读取遗漏期间的记录）
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import json
+from sqlalchemy import select, func, literal, cast, String, union_all, or_
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import (
+    Asset, AssetHistory, User, TransferRequest, ReturnRequest, AssetEditRequest, InventorySnapshot
+)
+from counters import read_counters, PENDING_TRANSFERS, PENDING_RETURNS, PENDING_EDITS
+from logger import logger
+
+# 最多补算的天数，避免长时间停机后一次回放过多记录
+MAX_BACKFILL_DAYS = 90
+
+# 快照中的分组字段：快照列 -> 资产字段
+SNAPSHOT_GROUPINGS = {
+    "status_counts": "status",
+    "category_counts": "category_id",
+    "group_counts": "user_group",
+}
+
+
+def _group_key(value) -> str:
+    """分组值转换为JSON键，空值记为空字符串"""
+    return "" if value is None else str(value)
+
+
+def _day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day)
+
+
+def _fill_snapshot(snapshot: InventorySnapshot, grouped: Dict[str, Dict[str, int]], pending: Dict[str, int], source: str):
+    status_counts = grouped["status_counts"]
+    snapshot.total_assets = sum(status_counts.values())
+    snapshot.in_use_assets = status_counts.get("在用", 0)
+    for column in SNAPSHOT_GROUPINGS:
+        snapshot.set_counts(column, grouped[column])
+    snapshot.pending_transfers = pending[PENDING_TRANSFERS]
+    snapshot.pending_returns = pending[PENDING_RETURNS]
+    snapshot.pending_edits = pending[PENDING_EDITS]
+    snapshot.source = source
+
+
+def _get_or_create_snapshot(db: Session, day: date) -> InventorySnapshot:
+    snapshot = db.query(InventorySnapshot).filter(InventorySnapshot.snapshot_date == day).first()
+    if not snapshot:
+        snapshot = InventorySnapshot(snapshot_date=day)
+        db.add(snapshot)
+    return snapshot
+
+
+def take_live_snapshot(db: Session, day: date) -> InventorySnapshot:
+    """按当前数据生成（或更新）指定日期的快照，资产分组用一条UNION ALL查询完成"""
+    stmt = union_all(*[
+        select(
+            literal(column).label("grouping"),
+            cast(getattr(Asset, field), String).label("value"),
+            func.count(Asset.id).label("count")
+        ).where(Asset.deleted_at.is_(None)).group_by(getattr(Asset, field))
+        for column, field in SNAPSHOT_GROUPINGS.items()
+    ])
+    grouped: Dict[str, Dict[str, int]] = {column: {} for column in SNAPSHOT_GROUPINGS}
+    for row in db.execute(stmt):
+        grouped[row.grouping][_group_key(row.value)] = row.count
+
+    snapshot = _get_or_create_snapshot(db, day)
+    _fill_snapshot(snapshot, grouped, read_counters(db), "live")
+    return snapshot
+
+
+def _pending_counts_at(moment: datetime, transfers, returns, edits) -> Dict[str, int]:
+    """计算某一时刻各类申请的待审批数量（待审批期间：提交/转入人确认 至 审批）"""
+    def is_pending(started_at: Optional[datetime], decided_at: Optional[datetime]) -> bool:
+        return started_at is not None and started_at < moment and (decided_at is None or decided_at >= moment)
+
+    return {
+        PENDING_TRANSFERS: sum(1 for started, decided in transfers if is_pending(started, decided)),
+        PENDING_RETURNS: sum(1 for started, decided in returns if is_pending(started, decided)),
+        PENDING_EDITS: sum(1 for started, decided in edits if is_pending(started, decided)),
+    }
+
+
+def backfill_snapshots(db: Session, days: List[date]) -> int:
+    """
+    补算遗漏日期的快照
+    从资产当前状态出发，按时间倒序撤销各日期之后的流转记录，得到每天结束时的资产状态；
+    流转记录中没有组别时按使用人当前组别推算，因此补算结果为近似值
+    """
+    if not days:
+        return 0
+    days = sorted(days)
+    since = _day_start(days[0] + timedelta(days=1))
+
+    # 资产当前状态（含已删除资产）
+    states = {
+        row.id: {
+            "status": row.status,
+            "category_id": row.category_id,
+            "user_group": row.user_group,
+            "created_at": row.created_at,
+            "deleted_at": row.deleted_at,
+        }
+        for row in db.query(
+            Asset.id, Asset.status, Asset.category_id, Asset.user_group, Asset.created_at, Asset.deleted_at
+        ).all()
+    }
+    user_groups = dict(db.query(User.id, User.group).all())
+
+    # 遗漏期间之后的流转记录，按时间倒序撤销
+    history = db.query(
+        AssetHistory.asset_id, AssetHistory.old_value, AssetHistory.created_at
+    ).filter(AssetHistory.created_at >= since).order_by(AssetHistory.id.desc()).all()
+
+    # 遗漏期间仍可能处于待审批状态的申请
+    transfers = db.query(TransferRequest.to_user_confirmed_at, TransferRequest.approved_at).filter(
+        TransferRequest.to_user_confirmed == 1,
+        or_(TransferRequest.approved_at.is_(None), TransferRequest.approved_at >= _day_start(days[0]))
+    ).all()
+    returns = db.query(ReturnRequest.created_at, ReturnRequest.approved_at).filter(
+        or_(ReturnRequest.approved_at.is_(None), ReturnRequest.approved_at >= _day_start(days[0]))
+    ).all()
+    edits = db.query(AssetEditRequest.created_at, AssetEditRequest.approved_at).filter(
+        or_(AssetEditRequest.approved_at.is_(None), AssetEditRequest.approved_at >= _day_start(days[0]))
+    ).all()
+
+    position = 0
+    for day in reversed(days):
+        day_end = _day_start(day + timedelta(days=1))
+        # 撤销当天结束之后发生的变更
+        while position < len(history) and history[position].created_at >= day_end:
+            record = history[position]
+            position += 1
+            state = states.get(record.asset_id)
+            if not state or not record.old_value:
+                continue
+            try:
+                old_value = json.loads(record.old_value)
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(old_value, dict):
+                continue
+            for field in ("status", "category_id", "user_group"):
+                if field in old_value:
+                    state[field] = old_value[field]
+            if "user_id" in old_value and "user_group" not in old_value:
+                state["user_group"] = user_groups.get(old_value["user_id"], state["user_group"])
+
+        grouped: Dict[str, Dict[str, int]] = {column: {} for column in SNAPSHOT_GROUPINGS}
+        for state in states.values():
+            if state["created_at"] is not None and state["created_at"] >= day_end:
+                continue
+            if state["deleted_at"] is not None and state["deleted_at"] < day_end:
+                continue
+            for column, field in SNAPSHOT_GROUPINGS.items():
+                key = _group_key(state[field])
+                grouped[column][key] = grouped[column].get(key, 0) + 1
+
+        snapshot = _get_or_create_snapshot(db, day)
+        _fill_snapshot(snapshot, grouped, _pending_counts_at(day_end, transfers, returns, edits), "backfill")
+
+    return len(days)
+
+
+def run_snapshot_job() -> dict:
+    """定时任务：补算遗漏日期并更新当天快照"""
+    db = SessionLocal()
+    try:
+        today = datetime.utcnow().date()
+        last_date = db.query(func.max(InventorySnapshot.snapshot_date)).filter(
+            InventorySnapshot.snapshot_date < today
+        ).scalar()
+
+        missing_days: List[date] = []
+        if last_date:
+            first_missing = max(last_date + timedelta(days=1), today - timedelta(days=MAX_BACKFILL_DAYS))
+            missing_days = [first_missing + timedelta(days=i) for i in range((today - first_missing).days)]
+
+        backfilled = backfill_snapshots(db, missing_days)
+        take_live_snapshot(db, today)
+        db.commit()
+        if backfilled:
+            logger.info(f"资产盘点快照：已补算 {backfilled} 天（{missing_days[0]} 至 {missing_days[-1]}）")
+        return {"date": str(today), "backfilled_days": backfilled}
+    finally:
+        db.close()
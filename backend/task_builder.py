@@ -0,0 +1,65 @@
+"""
+安全检查任务资产生成
+按资产ID列表或筛选条件选择资产，用一条 INSERT ... SELECT 生成任务资产关联
+（跳过没有使用人的资产），并初始化任务进度计数器
+"""
+from typing import List, Optional, Tuple
+from sqlalchemy import select, insert, func, literal
+from sqlalchemy.orm import Session
+from models import Asset, SafetyCheckTask, TaskAsset
+from schemas import TaskAssetCriteria
+
+
+def asset_selection_conditions(asset_ids: Optional[List[int]] = None, criteria: Optional[TaskAssetCriteria] = None) -> list:
+    """构造资产选择条件（始终排除已删除的资产）"""
+    conditions = [Asset.deleted_at.is_(None)]
+    if asset_ids is not None:
+        conditions.append(Asset.id.in_(asset_ids))
+    if criteria is not None:
+        if criteria.category_id is not None:
+            conditions.append(Asset.category_id == criteria.category_id)
+        if criteria.status:
+            conditions.append(Asset.status == criteria.status)
+        if criteria.user_group:
+            conditions.append(Asset.user_group == criteria.user_group)
+        if criteria.office_location:
+            conditions.append(Asset.office_location == criteria.office_location)
+        if criteria.all_in_use:
+            conditions.append(Asset.status == "在用")
+    return conditions
+
+
+def criteria_is_empty(criteria: TaskAssetCriteria) -> bool:
+    """筛选条件是否一个都没有指定"""
+    return not (
+        criteria.category_id is not None or criteria.status or criteria.user_group
+        or criteria.office_location or criteria.all_in_use
+    )
+
+
+def count_selected_assets(db: Session, conditions: list) -> Tuple[int, int]:
+    """统计满足条件的资产数和其中有使用人的资产数（一条查询）"""
+    matched, with_user = db.execute(
+        select(func.count(Asset.id), func.count(Asset.user_id)).where(*conditions)
+    ).one()
+    return matched or 0, with_user or 0
+
+
+def materialize_task_assets(db: Session, task: SafetyCheckTask, conditions: list) -> int:
+    """
+    为任务生成任务资产关联（一条 INSERT ... SELECT，分配给资产当前使用人），
+    返回生成的数量并初始化任务进度计数器；调用前任务需已flush获得ID
+    """
+    selected = select(
+        literal(task.id), Asset.id, Asset.user_id, literal("pending")
+    ).where(*conditions, Asset.user_id.isnot(None))
+    result = db.execute(
+        insert(TaskAsset).from_select(
+            [TaskAsset.task_id, TaskAsset.asset_id, TaskAsset.assigned_user_id, TaskAsset.status],
+            selected
+        )
+    )
+    created_count = result.rowcount or 0
+    task.total_count = created_count
+    task.pending_count = created_count
+    return created_count
@@ -0,0 +1,91 @@
+"""
+安全检查任务进度计数器
+SafetyCheckTask 上的 total_count/checked_count/pending_count/returned_count/overdue_count
+在任务资产状态变化时于同一事务内用集合式UPDATE原子更新，读取进度无需再统计任务资产
+"""
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import SafetyCheckTask, TaskAsset
+from logger import logger
+
+# 任务资产状态 -> 任务上的计数器字段
+STATUS_COUNTER_COLUMNS = {
+    "pending": "pending_count",
+    "checked": "checked_count",
+    "returned": "returned_count",
+    "overdue": "overdue_count",
+}
+
+# 尚未检查的任务资产状态（逾期的任务资产仍需检查，可改派或退库）
+OPEN_TASK_ASSET_STATUSES = ("pending", "overdue")
+
+
+def _counter(status: str):
+    return getattr(SafetyCheckTask, STATUS_COUNTER_COLUMNS[status])
+
+
+def shift_task_counters(db: Session, from_status: str, to_status: str, *criteria) -> int:
+    """
+    任务资产将从 from_status 批量变为 to_status 之前调用：
+    按任务统计满足条件（criteria）且当前为 from_status 的任务资产数，
+    一条UPDATE把这部分数量从旧状态计数器移到新状态计数器，返回受影响的任务数
+    """
+    if from_status == to_status:
+        return 0
+    conditions = (TaskAsset.status == from_status, *criteria)
+    moved = select(func.count(TaskAsset.id)).where(
+        TaskAsset.task_id == SafetyCheckTask.id, *conditions
+    ).scalar_subquery()
+
+    values = {}
+    if from_status in STATUS_COUNTER_COLUMNS:
+        values[STATUS_COUNTER_COLUMNS[from_status]] = _counter(from_status) - moved
+    if to_status in STATUS_COUNTER_COLUMNS:
+        values[STATUS_COUNTER_COLUMNS[to_status]] = _counter(to_status) + moved
+    if not values:
+        return 0
+
+    result = db.execute(
+        update(SafetyCheckTask)
+        .where(SafetyCheckTask.id.in_(select(TaskAsset.task_id).where(*conditions)))
+        .values(**values)
+        .execution_options(synchronize_session="fetch")
+    )
+    return result.rowcount or 0
+
+
+def rebuild_task_counters(db: Session, task_ids: Optional[Iterable[int]] = None) -> int:
+    """按任务资产实际状态重建计数器（一条UPDATE），返回更新的任务数"""
+    def count_where(*criteria):
+        return select(func.count(TaskAsset.id)).where(
+            TaskAsset.task_id == SafetyCheckTask.id, *criteria
+        ).scalar_subquery()
+
+    values = {"total_count": count_where()}
+    for status, column in STATUS_COUNTER_COLUMNS.items():
+        values[column] = count_where(TaskAsset.status == status)
+
+    stmt = update(SafetyCheckTask).values(**values).execution_options(synchronize_session="fetch")
+    if task_ids is not None:
+        stmt = stmt.where(SafetyCheckTask.id.in_(list(task_ids)))
+    return db.execute(stmt).rowcount or 0
+
+
+def rebuild_added_task_counters(added_columns: Iterable[Tuple[str, str]]) -> int:
+    """
+    启动时旧数据库刚补充了计数器字段（默认值为0）时，按任务资产实际状态重建一次所有任务的计数器
+    added_columns 为 add_missing_columns 返回的新增字段，返回重建的任务数
+    """
+    counter_columns = {"total_count", *STATUS_COUNTER_COLUMNS.values()}
+    if not any(table == SafetyCheckTask.__tablename__ and column in counter_columns for table, column in added_columns):
+        return 0
+    db = SessionLocal()
+    try:
+        updated = rebuild_task_counters(db)
+        db.commit()
+        logger.info(f"已为旧数据库补充任务进度计数器字段，并重建 {updated} 个任务的计数器")
+        return updated
+    finally:
+        db.close()
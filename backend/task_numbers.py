@@ -0,0 +1,75 @@
+"""
+安全检查任务编号分配
+任务编号格式为 SAFETY-YYYY-NNN，按年份在 task_number_sequences 表中维护序号，
+每次分配用一条原子 UPDATE ... RETURNING 取号，并发创建任务不会拿到重复编号；
+批量创建任务时可一次预留一段连续编号
+"""
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import SafetyCheckTask, TaskNumberSequence
+
+TASK_NUMBER_PREFIX = "SAFETY"
+
+
+def format_task_number(year: int, number: int) -> str:
+    return f"{TASK_NUMBER_PREFIX}-{year}-{str(number).zfill(3)}"
+
+
+def _existing_max_number(db: Session, year: int) -> int:
+    """序列创建前该年份已使用的最大序号（兼容引入序列表之前生成的编号，每年只执行一次）"""
+    prefix = f"{TASK_NUMBER_PREFIX}-{year}-"
+    max_number = 0
+    for task_number in db.execute(
+        select(SafetyCheckTask.task_number).where(SafetyCheckTask.task_number.like(f"{prefix}%"))
+    ).scalars():
+        suffix = task_number[len(prefix):]
+        if suffix.isdigit():
+            max_number = max(max_number, int(suffix))
+    return max_number
+
+
+def _advance(db: Session, year: int, count: int) -> Optional[int]:
+    """原子递增序号，返回递增后的值；该年份序列不存在时返回None"""
+    stmt = (
+        update(TaskNumberSequence)
+        .where(TaskNumberSequence.year == year)
+        .values(last_number=TaskNumberSequence.last_number + count)
+        .execution_options(synchronize_session=False)
+    )
+    if db.bind.dialect.update_returning:
+        return db.execute(stmt.returning(TaskNumberSequence.last_number)).scalar()
+    # 不支持RETURNING的数据库：UPDATE已锁定该行，同一事务内再读取
+    if not db.execute(stmt).rowcount:
+        return None
+    return db.execute(
+        select(TaskNumberSequence.last_number).where(TaskNumberSequence.year == year)
+    ).scalar()
+
+
+def reserve_task_numbers(db: Session, count: int = 1, year: Optional[int] = None) -> List[str]:
+    """预留 count 个连续的任务编号（随调用方事务提交，回滚时序号也随之回滚）"""
+    if count < 1:
+        return []
+    year = year or datetime.now().year
+
+    last_number = _advance(db, year, count)
+    if last_number is None:
+        # 该年份第一次分配：创建序列行，并发创建冲突时改为递增
+        start = _existing_max_number(db, year)
+        try:
+            with db.begin_nested():
+                db.execute(insert(TaskNumberSequence).values(year=year, last_number=start + count))
+            last_number = start + count
+        except IntegrityError:
+            last_number = _advance(db, year, count)
+
+    first_number = last_number - count + 1
+    return [format_task_number(year, number) for number in range(first_number, last_number + 1)]
+
+
+def next_task_number(db: Session) -> str:
+    """分配一个任务编号"""
+    return reserve_task_numbers(db, 1)[0]
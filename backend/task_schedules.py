@@ -0,0 +1,141 @@
+"""
+周期性安全检查任务生成
+定时任务找出当前周期已到生成日、且本周期尚未执行的计划，逐个计划在保存点内先占用本周期的执行记录，
+再预留任务编号、创建任务并用一条 INSERT ... SELECT 生成任务资产，每个计划成功后立即提交；
+每个计划每个周期在 safety_check_schedule_runs 中占一行（唯一约束），
+重启或多进程同时运行都不会重复生成同一周期的任务，执行记录冲突时也不会消耗任务编号
+"""
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import SafetyCheckSchedule, SafetyCheckScheduleRun, SafetyCheckTask
+from schemas import TaskAssetCriteria
+from cache import reference_cache
+from task_builder import asset_selection_conditions, count_selected_assets, materialize_task_assets
+from task_numbers import reserve_task_numbers
+from logger import logger
+
+# 支持的周期
+SCHEDULE_CADENCES = ("daily", "weekly", "monthly", "quarterly", "yearly")
+
+
+def run_day_range(cadence: str) -> Tuple[int, int]:
+    """生成日的取值范围：每周第1-7天，每月/季/年首月第1-28天（每天执行时不使用）"""
+    if cadence == "weekly":
+        return 1, 7
+    return 1, 28
+
+
+def current_period(cadence: str, run_day: int, today: date) -> Tuple[str, date]:
+    """计算 today 所在周期的标签和该周期的生成日"""
+    if cadence == "daily":
+        return today.isoformat(), today
+    if cadence == "weekly":
+        year, week, weekday = today.isocalendar()
+        return f"{year}-W{week:02d}", today - timedelta(days=weekday - 1) + timedelta(days=run_day - 1)
+    if cadence == "monthly":
+        return f"{today.year}-{today.month:02d}", date(today.year, today.month, run_day)
+    if cadence == "quarterly":
+        quarter = (today.month - 1) // 3 + 1
+        return f"{today.year}-Q{quarter}", date(today.year, (quarter - 1) * 3 + 1, run_day)
+    if cadence == "yearly":
+        return str(today.year), date(today.year, 1, run_day)
+    raise ValueError(f"不支持的周期: {cadence}")
+
+
+def task_deadline(start: date, deadline_days: Optional[int]) -> Optional[datetime]:
+    """任务截止时间：生成日之后第 deadline_days 天结束时"""
+    if deadline_days is None:
+        return None
+    return datetime.combine(start + timedelta(days=deadline_days), time(23, 59, 59))
+
+
+def generate_due_tasks(db: Session, today: date) -> dict:
+    """为本周期已到生成日且尚未执行的计划生成任务（每个计划成功后独立提交），返回生成统计"""
+    schedules = db.query(SafetyCheckSchedule).filter(SafetyCheckSchedule.is_active == True).all()
+    candidates = []
+    for schedule in schedules:
+        period, start = current_period(schedule.cadence, schedule.run_day, today)
+        if start <= today:
+            candidates.append((schedule, period, start))
+    if not candidates:
+        return {"tasks": 0, "task_assets": 0, "empty": 0}
+
+    # 已执行过的周期（一条查询）
+    executed = {
+        (schedule_id, period)
+        for schedule_id, period in db.execute(
+            select(SafetyCheckScheduleRun.schedule_id, SafetyCheckScheduleRun.period).where(
+                tuple_(SafetyCheckScheduleRun.schedule_id, SafetyCheckScheduleRun.period).in_(
+                    [(schedule.id, period) for schedule, period, _ in candidates]
+                )
+            )
+        )
+    }
+
+    due = []
+    empty = 0
+    for schedule, period, start in candidates:
+        if (schedule.id, period) in executed:
+            continue
+        check_type = reference_cache.get_check_type(db, schedule.check_type_id)
+        if not check_type or not check_type.is_active:
+            continue
+        conditions = asset_selection_conditions(criteria=TaskAssetCriteria(**schedule.get_criteria()))
+        _, with_user_count = count_selected_assets(db, conditions)
+        if with_user_count == 0:
+            # 没有可检查的资产：只记录本周期已执行，不生成任务
+            try:
+                with db.begin_nested():
+                    db.add(SafetyCheckScheduleRun(schedule_id=schedule.id, period=period, asset_count=0))
+                db.commit()
+                empty += 1
+            except IntegrityError:
+                pass
+            continue
+        due.append((schedule, period, start, conditions))
+
+    tasks = 0
+    task_assets = 0
+    for schedule, period, start, conditions in due:
+        try:
+            with db.begin_nested():
+                # 先占用本周期的执行记录，其他进程已生成时唯一约束冲突，整个计划回滚（此时尚未预留任务编号）
+                run = SafetyCheckScheduleRun(schedule_id=schedule.id, period=period)
+                db.add(run)
+                db.flush()
+                task = SafetyCheckTask(
+                    task_number=reserve_task_numbers(db, 1)[0],
+                    check_type_id=schedule.check_type_id,
+                    title=f"{schedule.title}（{period}）",
+                    description=schedule.description,
+                    deadline=task_deadline(start, schedule.deadline_days),
+                    created_by_id=schedule.created_by_id,
+                    status="pending"
+                )
+                db.add(task)
+                db.flush()  # 获取任务ID
+                run.task_id = task.id
+                run.asset_count = materialize_task_assets(db, task, conditions)
+        except IntegrityError:
+            logger.info(f"检查计划 {schedule.name} 的周期 {period} 已由其他进程生成，跳过")
+            continue
+        # 本计划的执行记录、任务和任务资产一起提交，后续计划失败不影响已生成的任务
+        asset_count = run.asset_count
+        db.commit()
+        tasks += 1
+        task_assets += asset_count
+    db.commit()
+    return {"tasks": tasks, "task_assets": task_assets, "empty": empty}
+
+
+def run_schedule_job() -> dict:
+    """定时任务：生成到期的周期性安全检查任务"""
+    db = SessionLocal()
+    try:
+        return generate_due_tasks(db, datetime.now().date())
+    finally:
+        db.close()
@@ -0,0 +1,128 @@
+"""
+测试公共夹具
+每个测试使用独立的内存SQLite数据库（SessionLocal 临时绑定到该数据库，会话事件监听器照常生效），
+并提供统计SQL语句数量的计数器、构造测试数据的辅助函数和只注册被测路由的测试客户端
+"""
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import Base, SessionLocal  # noqa: E402
+from models import Asset, AssetCategory, User  # noqa: E402
+from auth import create_access_token, get_password_hash  # noqa: E402
+from cache import reference_cache  # noqa: E402
+
+
+class QueryCounter:
+    """统计引擎上执行的SQL语句数"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements: List[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+@pytest.fixture
+def engine():
+    """内存数据库（所有连接共享同一个数据库），测试期间 SessionLocal 绑定到该数据库"""
+    test_engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=test_engine)
+    original_bind = SessionLocal.kw.get("bind")
+    SessionLocal.configure(bind=test_engine)
+    reference_cache.invalidate(
+        reference_cache.CATEGORIES,
+        reference_cache.WAREHOUSE_USER,
+        reference_cache.CHECK_TYPES,
+        reference_cache.CHECK_TYPE_VALIDATORS
+    )
+    try:
+        yield test_engine
+    finally:
+        SessionLocal.configure(bind=original_bind)
+        test_engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def count_queries(engine):
+    """返回上下文管理器：统计 with 代码块内执行的SQL语句数"""
+    @contextmanager
+    def counting() -> Iterator[QueryCounter]:
+        counter = QueryCounter()
+        event.listen(engine, "before_cursor_execute", counter)
+        try:
+            yield counter
+        finally:
+            event.remove(engine, "before_cursor_execute", counter)
+    return counting
+
+
+def make_client(*routes) -> TestClient:
+    """只注册指定路由的测试客户端，routes 为 (router, prefix) 对"""
+    app = FastAPI()
+    for router, prefix in routes:
+        app.include_router(router, prefix=prefix)
+    return TestClient(app)
+
+
+def auth_headers(user: User) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': user.ehr_number})}"}
+
+
+def create_users(db, count: int, role: str = "user", start: int = 1) -> List[User]:
+    """批量创建用户，EHR号从 start 开始编号"""
+    password_hash = get_password_hash("123456")
+    ehr_numbers = [f"{number:07d}" for number in range(start, start + count)]
+    db.execute(insert(User), [
+        {"ehr_number": ehr, "real_name": f"用户{ehr}", "group": f"组{index % 5}", "role": role, "password_hash": password_hash}
+        for index, ehr in enumerate(ehr_numbers)
+    ])
+    db.commit()
+    return db.query(User).filter(User.ehr_number.in_(ehr_numbers)).order_by(User.id).all()
+
+
+def create_assets(db, users: List[User], count: int, prefix: str = "ZC") -> List[Asset]:
+    """批量创建在用资产，依次分配给 users 并分属不同大类"""
+    categories = db.query(AssetCategory).all()
+    if not categories:
+        db.execute(insert(AssetCategory), [{"name": f"大类{index}"} for index in range(5)])
+        categories = db.query(AssetCategory).all()
+    db.execute(insert(Asset), [
+        {
+            "asset_number": f"{prefix}{index:05d}",
+            "category_id": categories[index % len(categories)].id,
+            "name": "台式电脑",
+            "status": "在用",
+            "user_id": users[index % len(users)].id,
+            "user_group": users[index % len(users)].group,
+            "created_at": datetime.now()
+        }
+        for index in range(count)
+    ])
+    db.commit()
+    return db.query(Asset).filter(Asset.asset_number.like(f"{prefix}%")).order_by(Asset.id).all()
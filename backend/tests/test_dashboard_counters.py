@@ -0,0 +1,49 @@
+"""
+首页统计计数器的回归测试
+提交后对象已过期（expire_on_commit），直接修改或删除时属性历史中没有旧值，计数器仍需保持准确
+"""
+from sqlalchemy import insert
+
+from counters import IN_USE_ASSETS, PENDING_TRANSFERS, count_all, read_counters
+from models import TransferRequest
+from conftest import create_assets, create_users
+
+
+def test_counters_follow_changes_to_expired_objects(db):
+    users = create_users(db, 2)
+    assets = create_assets(db, users, 3)
+    db.execute(insert(TransferRequest), [
+        {"asset_id": asset.id, "from_user_id": users[0].id, "to_user_id": users[1].id,
+         "created_by_id": users[0].id, "status": "pending", "to_user_confirmed": 1}
+        for asset in assets
+    ])
+    db.commit()
+    assert read_counters(db)[IN_USE_ASSETS] == 3
+    transfers = db.query(TransferRequest).order_by(TransferRequest.id).all()
+
+    # 提交使对象过期，随后直接赋值、删除都不会加载旧值
+    db.commit()
+    assets[0].status = "库存备用"
+    transfers[0].status = "approved"
+    db.commit()
+    db.delete(transfers[1])
+    db.commit()
+
+    counters = read_counters(db)
+    assert counters[IN_USE_ASSETS] == 2
+    assert counters[PENDING_TRANSFERS] == 1
+    assert counters == count_all(db.connection())
+
+
+def test_loaded_changes_use_incremental_deltas(db, count_queries):
+    users = create_users(db, 1)
+    asset = create_assets(db, users, 1)[0]
+    read_counters(db)
+    asset.status  # 加载属性，旧值可从属性历史中取得
+
+    with count_queries() as counter:
+        asset.status = "库存备用"
+        db.commit()
+    assert read_counters(db)[IN_USE_ASSETS] == 0
+    # 只有资产UPDATE和计数器增量UPDATE，没有全量重算
+    assert counter.count == 2, "\n".join(counter.statements)
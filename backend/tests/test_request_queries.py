@@ -0,0 +1,111 @@
+"""
+交接、退回、编辑申请列表/详情的查询次数回归测试
+嵌套对象（资产及其大类、使用人，申请涉及的各个用户）全部由 *_LOAD_OPTIONS 预加载，
+整页100条与1条申请的查询次数必须相同，详情与1条申请的列表查询次数相同
+"""
+import json
+
+import pytest
+from sqlalchemy import insert
+
+from models import AssetEditRequest, ReturnRequest, TransferRequest
+from routers import edit_requests, returns, transfers
+from conftest import auth_headers, create_assets, create_users, make_client
+
+REQUEST_COUNT = 100
+
+
+def transfer_rows(assets, users):
+    return [
+        {
+            "asset_id": asset.id,
+            "from_user_id": users["from"][index].id,
+            "to_user_id": users["to"][index].id,
+            "created_by_id": users["creator"][index].id,
+            "status": "pending",
+            "to_user_confirmed": 1
+        }
+        for index, asset in enumerate(assets)
+    ]
+
+
+def return_rows(assets, users):
+    return [
+        {
+            "asset_id": asset.id,
+            "user_id": users["from"][index].id,
+            "new_user_id": users["to"][index].id,
+            "status": "pending"
+        }
+        for index, asset in enumerate(assets)
+    ]
+
+
+def edit_request_rows(assets, users):
+    return [
+        {
+            "asset_id": asset.id,
+            "user_id": users["from"][index].id,
+            "approver_id": users["to"][index].id,
+            "status": "approved",
+            "edit_data": json.dumps({"remark": f"备注{index}"})
+        }
+        for index, asset in enumerate(assets)
+    ]
+
+
+REQUEST_TYPES = {
+    "transfer": (TransferRequest, transfers.router, "/api/transfers", transfer_rows),
+    "return": (ReturnRequest, returns.router, "/api/returns", return_rows),
+    "edit": (AssetEditRequest, edit_requests.router, "/api/edit-requests", edit_request_rows),
+}
+
+
+@pytest.fixture
+def admin(db):
+    return create_users(db, 1, role="admin", start=9000001)[0]
+
+
+def seed_requests(db, request_type: str):
+    """
+    100条申请：资产使用人、申请涉及的各个用户互不相同，资产分属多个大类，
+    任一嵌套关系改为延迟加载都会使查询次数随行数增长（不会被身份映射掩盖）
+    """
+    model, _, _, build_rows = REQUEST_TYPES[request_type]
+    holders = create_users(db, REQUEST_COUNT, start=1000001)
+    users = {
+        "from": create_users(db, REQUEST_COUNT, start=2000001),
+        "to": create_users(db, REQUEST_COUNT, start=3000001),
+        "creator": create_users(db, REQUEST_COUNT, start=4000001),
+    }
+    assets = create_assets(db, holders, REQUEST_COUNT)
+    db.execute(insert(model), build_rows(assets, users))
+    db.commit()
+    return [request_id for (request_id,) in db.query(model.id).order_by(model.id).all()]
+
+
+@pytest.mark.parametrize("request_type", REQUEST_TYPES)
+def test_request_list_and_detail_query_count_is_constant(db, engine, admin, count_queries, request_type):
+    _, router, prefix, _ = REQUEST_TYPES[request_type]
+    request_ids = seed_requests(db, request_type)
+    client = make_client((router, prefix))
+    headers = auth_headers(admin)
+
+    with count_queries() as single_page:
+        response = client.get(f"{prefix}/", params={"limit": 1}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+    with count_queries() as full_page:
+        response = client.get(f"{prefix}/", params={"limit": REQUEST_COUNT}, headers=headers)
+    assert response.status_code == 200
+    items = response.json()
+    assert len(items) == REQUEST_COUNT
+    assert all(item["asset"]["category"] and item["asset"]["user"] for item in items)
+    assert full_page.count == single_page.count, "\n".join(full_page.statements)
+
+    with count_queries() as detail:
+        response = client.get(f"{prefix}/{request_ids[-1]}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["asset"]["category"] is not None
+    assert detail.count == single_page.count, "\n".join(detail.statements)
@@ -0,0 +1,101 @@
+"""
+安全检查任务列表/详情的查询次数回归测试
+任务列表整页的进度统计和嵌套对象必须用固定次数的查询完成，不能随任务数或资产数增长
+"""
+import pytest
+from sqlalchemy import insert
+
+from models import SafetyCheckType, SafetyCheckTask, TaskAsset
+from routers import safety_check_tasks
+from task_counters import rebuild_task_counters
+from conftest import auth_headers, create_assets, create_users, make_client
+
+TASK_COUNT = 100
+
+
+@pytest.fixture
+def seeded(db):
+    """
+    100个任务：各自使用不同的检查类型，检查类型和任务的创建人互不相同（避免身份映射掩盖延迟加载），
+    每个任务两项资产分配给同一个普通用户，其中一项已检查
+    """
+    admins = create_users(db, TASK_COUNT * 2, role="admin", start=1000001)
+    user = create_users(db, 1, start=2000001)[0]
+    assets = create_assets(db, [user], TASK_COUNT * 2)
+
+    db.execute(insert(SafetyCheckType), [
+        {"name": f"检查类型{index}", "check_items": "[]", "is_active": True, "created_by_id": admins[index].id}
+        for index in range(TASK_COUNT)
+    ])
+    check_types = db.query(SafetyCheckType).order_by(SafetyCheckType.id).all()
+    db.execute(insert(SafetyCheckTask), [
+        {
+            "task_number": f"TASK-{index:05d}",
+            "check_type_id": check_types[index].id,
+            "title": f"任务{index}",
+            "status": "pending",
+            "created_by_id": admins[TASK_COUNT + index].id
+        }
+        for index in range(TASK_COUNT)
+    ])
+    tasks = db.query(SafetyCheckTask).order_by(SafetyCheckTask.id).all()
+    db.execute(insert(TaskAsset), [
+        {
+            "task_id": task.id,
+            "asset_id": asset.id,
+            "assigned_user_id": user.id,
+            "status": "checked" if offset else "pending"
+        }
+        for index, task in enumerate(tasks)
+        for offset, asset in enumerate(assets[index * 2:index * 2 + 2])
+    ])
+    rebuild_task_counters(db)
+    db.commit()
+    return {"admin": admins[0], "user": user, "tasks": tasks}
+
+
+# 管理员看全部资产进度，普通用户看自己名下的资产进度
+EXPECTED_PROGRESS = {
+    "admin": {"total_assets": 2, "completed_assets": 1, "pending_assets": 1},
+    "user": {"my_assets_count": 2, "my_completed_count": 1},
+}
+
+
+@pytest.fixture
+def client(engine):
+    return make_client((safety_check_tasks.router, "/api/safety-check-tasks"))
+
+
+@pytest.mark.parametrize("role", ["admin", "user"])
+def test_task_list_query_count_is_constant(seeded, client, count_queries, role):
+    headers = auth_headers(seeded[role])
+
+    with count_queries() as single_page:
+        response = client.get("/api/safety-check-tasks/", params={"limit": 1}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 1
+
+    with count_queries() as full_page:
+        response = client.get("/api/safety-check-tasks/", params={"limit": TASK_COUNT}, headers=headers)
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert len(items) == TASK_COUNT
+    assert all(item["check_type"]["created_by"] is not None for item in items)
+    assert all(item["created_by"] is not None for item in items)
+    assert all({key: item[key] for key in EXPECTED_PROGRESS[role]} == EXPECTED_PROGRESS[role] for item in items)
+
+    assert full_page.count == single_page.count, "\n".join(full_page.statements)
+
+
+@pytest.mark.parametrize("role", ["admin", "user"])
+def test_task_detail_query_count(seeded, client, count_queries, role):
+    headers = auth_headers(seeded[role])
+    task_id = seeded["tasks"][0].id
+
+    with count_queries() as counter:
+        response = client.get(f"/api/safety-check-tasks/{task_id}", headers=headers)
+    assert response.status_code == 200
+    detail = response.json()
+    assert {key: detail[key] for key in EXPECTED_PROGRESS[role]} == EXPECTED_PROGRESS[role]
+    # 认证、任务及其预加载的检查类型/创建人，普通用户另有权限检查和进度统计各一条
+    assert counter.count <= 7, "\n".join(counter.statements)
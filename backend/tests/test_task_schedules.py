@@ -0,0 +1,83 @@
+"""
+周期性任务生成的回归测试
+执行记录冲突的计划不消耗任务编号，某个计划失败时之前已生成的任务仍然保留
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import insert
+
+import task_schedules
+from models import SafetyCheckSchedule, SafetyCheckScheduleRun, SafetyCheckTask, SafetyCheckType, TaskNumberSequence
+from conftest import create_assets, create_users
+
+TODAY = date(2026, 10, 19)
+
+
+@pytest.fixture
+def schedules(db):
+    """三个每天执行的计划，选择全部在用资产"""
+    admin = create_users(db, 1, role="admin", start=9000001)[0]
+    create_assets(db, create_users(db, 3, start=1000001), 3)
+    check_type = SafetyCheckType(name="日常检查", check_items="[]", is_active=True, created_by_id=admin.id)
+    db.add(check_type)
+    db.flush()
+    db.execute(insert(SafetyCheckSchedule), [
+        {
+            "name": f"计划{index}",
+            "check_type_id": check_type.id,
+            "title": f"日常检查{index}",
+            "criteria": '{"all_in_use": true}',
+            "cadence": "daily",
+            "run_day": 1,
+            "created_by_id": admin.id
+        }
+        for index in range(3)
+    ])
+    db.commit()
+    return db.query(SafetyCheckSchedule).order_by(SafetyCheckSchedule.id).all()
+
+
+def task_numbers(db):
+    return [number for (number,) in db.query(SafetyCheckTask.task_number).order_by(SafetyCheckTask.id)]
+
+
+def test_conflicting_run_does_not_consume_task_number(db, schedules, monkeypatch):
+    count_selected_assets = task_schedules.count_selected_assets
+
+    def count_and_claim(session, conditions):
+        # 模拟其他进程在本进程读取执行记录之后抢先占用了第二个计划本周期的执行记录
+        if not session.query(SafetyCheckScheduleRun).count():
+            session.execute(insert(SafetyCheckScheduleRun), [
+                {"schedule_id": schedules[1].id, "period": TODAY.isoformat(), "asset_count": 0}
+            ])
+        return count_selected_assets(session, conditions)
+
+    monkeypatch.setattr(task_schedules, "count_selected_assets", count_and_claim)
+    result = task_schedules.generate_due_tasks(db, TODAY)
+
+    assert result == {"tasks": 2, "task_assets": 6, "empty": 0}
+    assert task_numbers(db) == ["SAFETY-2026-001", "SAFETY-2026-002"]
+    assert db.query(TaskNumberSequence.last_number).scalar() == 2
+
+
+def test_failed_schedule_keeps_earlier_tasks(db, schedules, monkeypatch):
+    materialize_task_assets = task_schedules.materialize_task_assets
+
+    def materialize_or_fail(session, task, conditions):
+        if session.query(SafetyCheckTask).count() > 1:
+            raise RuntimeError("生成任务资产失败")
+        return materialize_task_assets(session, task, conditions)
+
+    monkeypatch.setattr(task_schedules, "materialize_task_assets", materialize_or_fail)
+    with pytest.raises(RuntimeError):
+        task_schedules.generate_due_tasks(db, TODAY)
+    db.rollback()
+
+    assert task_numbers(db) == ["SAFETY-2026-001"]
+    assert [run.schedule_id for run in db.query(SafetyCheckScheduleRun)] == [schedules[0].id]
+
+    # 重新执行时只补生成失败及未执行的计划
+    monkeypatch.setattr(task_schedules, "materialize_task_assets", materialize_task_assets)
+    assert task_schedules.generate_due_tasks(db, TODAY) == {"tasks": 2, "task_assets": 6, "empty": 0}
+    assert task_numbers(db) == ["SAFETY-2026-001", "SAFETY-2026-002", "SAFETY-2026-003"]
@@ -63,13 +63,10 @@ export const TransferProvider = ({ children }) => {
     try {
       // 获取待检查的安全检查任务
       const response = await api.get('/safety-check-results/my-tasks', {
-        params: { status: 'pending' }
+        params: { status: 'pending', limit: 1 }
       })
-      // 计算所有任务中待检查资产的总数
-      const totalPendingCount = response.data.items?.reduce((sum, task) => {
-        return sum + (task.pending_count || 0)
-      }, 0) || 0
-      setPendingSafetyCheckCount(totalPendingCount)
+      // 所有任务中待检查资产的总数
+      setPendingSafetyCheckCount(response.data.pending_total || 0)
     } catch (error) {
       console.error('获取待检查任务数量失败:', error)
       setPendingSafetyCheckCount(0)
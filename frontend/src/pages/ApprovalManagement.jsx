@@ -4,11 +4,16 @@ import { CheckCircleOutlined, CloseCircleOutlined } from '@ant-design/icons'
 import api from '../utils/api'
 import { useTransfer } from '../contexts/TransferContext'
 
+// 审批收件箱每页条数（三类申请合计）
+const INBOX_PAGE_SIZE = 50
+
 const ApprovalManagement = () => {
   const { refreshPendingApprovals } = useTransfer()
   const [transfers, setTransfers] = useState([])
   const [returns, setReturns] = useState([])
   const [edits, setEdits] = useState([])
+  const [counts, setCounts] = useState({ transfer: 0, return: 0, edit: 0 })
+  const [nextCursor, setNextCursor] = useState(null)
   const [categories, setCategories] = useState([])
   const [users, setUsers] = useState([])
   const [loading, setLoading] = useState(false)
@@ -18,44 +23,37 @@ const ApprovalManagement = () => {
   const [form] = Form.useForm()
 
   useEffect(() => {
-    fetchTransfers()
-    fetchReturns()
-    fetchEdits()
+    fetchInbox()
     fetchCategories()
     fetchUsers()
   }, [])
 
-  const fetchTransfers = async () => {
-    setLoading(true)
-    try {
-      const response = await api.get('/transfers/', { params: { status: 'pending' } })
-      setTransfers(response.data)
-    } catch (error) {
-      message.error('获取交接申请列表失败')
-    } finally {
-      setLoading(false)
-    }
-  }
-
-  const fetchReturns = async () => {
-    setLoading(true)
-    try {
-      const response = await api.get('/returns/', { params: { status: 'pending' } })
-      setReturns(response.data)
-    } catch (error) {
-      message.error('获取退回申请列表失败')
-    } finally {
-      setLoading(false)
-    }
-  }
-
-  const fetchEdits = async () => {
+  const fetchInbox = async (cursor = null) => {
     setLoading(true)
     try {
-      const response = await api.get('/edit-requests/', { params: { status: 'pending' } })
-      setEdits(response.data)
+      // 一次请求获取一页三类待审批申请，更多数据按游标点击"加载更多"获取
+      const response = await api.get('/approvals/inbox', { params: { limit: INBOX_PAGE_SIZE, cursor } })
+      const transferItems = []
+      const returnItems = []
+      const editItems = []
+      response.data.items.forEach(item => {
+        if (item.request_type === 'transfer') transferItems.push(item.transfer)
+        else if (item.request_type === 'return') returnItems.push(item.return_request)
+        else if (item.request_type === 'edit') editItems.push(item.edit_request)
+      })
+      if (cursor) {
+        setTransfers(prev => [...prev, ...transferItems])
+        setReturns(prev => [...prev, ...returnItems])
+        setEdits(prev => [...prev, ...editItems])
+      } else {
+        setTransfers(transferItems)
+        setReturns(returnItems)
+        setEdits(editItems)
+      }
+      setCounts(response.data.counts)
+      setNextCursor(response.data.next_cursor)
     } catch (error) {
-      message.error('获取编辑申请列表失败')
+      message.error('获取待审批申请失败')
     } finally {
       setLoading(false)
     }
@@ -96,9 +94,7 @@ const ApprovalManagement = () => {
       })
       message.success('审批完成')
       setApprovalModalVisible(false)
-      fetchTransfers()
-      fetchReturns()
-      fetchEdits()
+      fetchInbox()
       // 刷新侧边栏的待审批数量
       refreshPendingApprovals()
     } catch (error) {
@@ -262,7 +258,7 @@ const ApprovalManagement = () => {
   const tabItems = [
     {
       key: 'transfers',
-      label: `交接申请 (${transfers.length})`,
+      label: `交接申请 (${counts.transfer})`,
       children: (
         <Table
           columns={transferColumns}
@@ -274,7 +270,7 @@ const ApprovalManagement = () => {
     },
     {
       key: 'returns',
-      label: `退回申请 (${returns.length})`,
+      label: `退回申请 (${counts.return})`,
       children: (
         <Table
           columns={returnColumns}
@@ -286,7 +282,7 @@ const ApprovalManagement = () => {
     },
     {
       key: 'edits',
-      label: `编辑申请 (${edits.length})`,
+      label: `编辑申请 (${counts.edit})`,
       children: (
         <Table
           columns={editColumns}
@@ -302,6 +298,13 @@ const ApprovalManagement = () => {
     <div>
       <h1>审批管理</h1>
       <Tabs items={tabItems} />
+      {nextCursor && (
+        <div style={{ textAlign: 'center', marginTop: 16 }}>
+          <Button onClick={() => fetchInbox(nextCursor)} loading={loading}>
+            加载更多
+          </Button>
+        </div>
+      )}
 
       <Modal
         title={`审批${currentRequest?.type === 'transfer' ? '交接' : currentRequest?.type === 'return' ? '退回' : '编辑'}申请`}
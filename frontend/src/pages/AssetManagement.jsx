@@ -45,7 +45,7 @@ const AssetManagement = () => {
     setLoading(true)
     try {
       const params = { ...filters, ...(extraFilters || {}) }
-      const response = await api.get('/assets/', { params })
+      const response = await api.get('/assets/list', { params })
       setAssets(response.data)
       if (isAdmin) {
         setSelectedRowKeys([])
@@ -113,7 +113,7 @@ const AssetManagement = () => {
 
   const handleEdit = (record) => {
     // 普通用户只能编辑自己名下的资产
-    if (!isAdmin && record.user?.id !== currentUser?.id) {
+    if (!isAdmin && record.user_id !== currentUser?.id) {
       message.error('只能编辑自己名下的资产')
       return
     }
@@ -128,8 +128,8 @@ const AssetManagement = () => {
     setEditingAsset(record)
     form.setFieldsValue({
       ...record,
-      category_id: record.category?.id,
-      user_id: record.user?.id
+      category_id: record.category_id,
+      user_id: record.user_id
     })
     setModalVisible(true)
   }
@@ -326,7 +326,7 @@ const AssetManagement = () => {
     },
     {
       title: '所属大类',
-      dataIndex: ['category', 'name'],
+      dataIndex: 'category_name',
       key: 'category',
       width: 80
     },
@@ -352,7 +352,7 @@ const AssetManagement = () => {
     },
     {
       title: '使用人',
-      dataIndex: ['user', 'real_name'],
+      dataIndex: 'user_name',
       key: 'user',
       width: 80
     },
@@ -428,7 +428,7 @@ const AssetManagement = () => {
       resizable: false, // 操作列不需要调整宽度
       render: (_, record) => {
         // 普通用户只能编辑自己名下的资产，不能删除
-        const canEdit = isAdmin || record.user?.id === currentUser?.id
+        const canEdit = isAdmin || record.user_id === currentUser?.id
         const canDelete = isAdmin
         // 检查是否有待审批的编辑申请（仅普通用户）
         const hasPendingRequest = !isAdmin && getAssetEditRequest(record.id)?.status === 'pending'
@@ -719,7 +719,7 @@ const AssetManagement = () => {
               {currentAssetDetail.asset_number || '-'}
             </Descriptions.Item>
             <Descriptions.Item label="所属大类" span={2}>
-              {currentAssetDetail.category?.name || '-'}
+              {currentAssetDetail.category_name || '-'}
             </Descriptions.Item>
             <Descriptions.Item label="实物名称" span={2}>
               {currentAssetDetail.name || '-'}
@@ -737,7 +737,7 @@ const AssetManagement = () => {
               {currentAssetDetail.ip_address || '-'}
             </Descriptions.Item>
             <Descriptions.Item label="使用人">
-              {currentAssetDetail.user?.real_name ? `${currentAssetDetail.user.real_name} (${currentAssetDetail.user.ehr_number})` : '-'}
+              {currentAssetDetail.user_name ? `${currentAssetDetail.user_name} (${currentAssetDetail.user_ehr})` : '-'}
             </Descriptions.Item>
             <Descriptions.Item label="组别">
               {currentAssetDetail.user_group || '-'}
@@ -8,10 +8,15 @@ import dayjs from 'dayjs'
 
 const { TextArea } = Input
 
+// 任务列表每页条数
+const TASK_PAGE_SIZE = 50
+
 const MySafetyCheckTasks = () => {
   const { user } = useAuth()
   const { refreshPendingSafetyChecks } = useTransfer()
   const [tasks, setTasks] = useState([])
+  const [counts, setCounts] = useState({ pending: 0, checked: 0 })
+  const [nextCursor, setNextCursor] = useState(null)
   const [loading, setLoading] = useState(false)
   const [activeTab, setActiveTab] = useState('pending')
   const [checkModalVisible, setCheckModalVisible] = useState(false)
@@ -24,12 +29,16 @@ const MySafetyCheckTasks = () => {
     fetchMyTasks()
   }, [activeTab])
 
-  const fetchMyTasks = async () => {
+  const fetchMyTasks = async (cursor = null) => {
     setLoading(true)
     try {
       const params = activeTab === 'all' ? {} : { status: activeTab }
-      const response = await api.get('/safety-check-results/my-tasks', { params })
-      setTasks(response.data.items || [])
+      // 每次只取一页，更多任务按游标点击"加载更多"获取
+      const response = await api.get('/safety-check-results/my-tasks', { params: { ...params, limit: TASK_PAGE_SIZE, cursor } })
+      const items = response.data.items || []
+      setTasks(prev => (cursor ? [...prev, ...items] : items))
+      setCounts(response.data.counts)
+      setNextCursor(response.data.next_cursor)
     } catch (error) {
       message.error('获取任务列表失败')
     } finally {
@@ -179,7 +188,7 @@ const MySafetyCheckTasks = () => {
       label: (
         <span>
           <ClockCircleOutlined />
-          待检查 ({tasks.filter(t => t.pending_count > 0).length})
+          待检查 ({counts.pending})
         </span>
       )
     },
@@ -188,7 +197,7 @@ const MySafetyCheckTasks = () => {
       label: (
         <span>
           <CheckCircleOutlined />
-          已完成 ({tasks.filter(t => t.pending_count === 0).length})
+          已完成 ({counts.checked})
         </span>
       )
     },
@@ -273,6 +282,13 @@ const MySafetyCheckTasks = () => {
         ) : (
           tasks.map(task => renderTaskCard(task))
         )}
+        {nextCursor && (
+          <div style={{ textAlign: 'center' }}>
+            <Button onClick={() => fetchMyTasks(nextCursor)} loading={loading}>
+              加载更多
+            </Button>
+          </div>
+        )}
       </div>
 
       <Modal